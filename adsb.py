@@ -21,9 +21,10 @@ class ADSBDecoder:
         self._aircraft_lock = threading.Lock()
         self._poll_thread = None
         self._http_port = None
+        self.device_index = None
         self._has_dump1090 = shutil.which("dump1090") is not None
 
-    def start(self, gain="auto", http_port=8888):
+    def start(self, gain="auto", http_port=8888, device_index=0):
         if self.active:
             self.stop()
 
@@ -35,9 +36,11 @@ class ADSBDecoder:
         )
         os.makedirs(self._json_dir, exist_ok=True)
         self._http_port = http_port
+        self.device_index = device_index
 
         cmd = [
             "dump1090",
+            "--device-index", str(device_index),
             "--net",
             "--net-http-port", str(http_port),
             "--write-json", self._json_dir,
@@ -91,6 +94,7 @@ class ADSBDecoder:
         with self._aircraft_lock:
             self._aircraft = []
         self._http_port = None
+        self.device_index = None
 
     def get_status(self):
         alive = self.process is not None and self.process.poll() is None
@@ -99,6 +103,7 @@ class ADSBDecoder:
             "has_dump1090": self._has_dump1090,
             "frequency_mhz": 1090.0 if self.active else None,
             "http_port": self._http_port if self.active else None,
+            "device_index": self.device_index,
             "pid": self.process.pid if self.process and alive else None,
             "aircraft_count": len(self._aircraft),
         }
@@ -19,13 +19,14 @@ class APRSDecoder:
         self.dw_process = None
         self.active = False
         self.frequency = None
+        self.device_index = None
         self._packets = []
         self._packets_lock = threading.Lock()
         self._stdout_thread = None
         self._has_direwolf = shutil.which("direwolf") is not None
         self._has_rtl_fm = shutil.which("rtl_fm") is not None
 
-    def start(self, frequency_hz=APRS_FREQUENCY, gain="auto"):
+    def start(self, frequency_hz=APRS_FREQUENCY, gain="auto", device_index=0):
         if self.active:
             self.stop()
 
@@ -35,9 +36,11 @@ class APRSDecoder:
             raise RuntimeError("direwolf not found. Install with: brew install direwolf")
 
         self.frequency = frequency_hz
+        self.device_index = device_index
 
         rtl_cmd = [
             "rtl_fm",
+            "-d", str(device_index),
             "-f", str(int(frequency_hz)),
             "-M", "fm",
             "-s", "22050",
@@ -116,6 +119,7 @@ class APRSDecoder:
         self.dw_process = None
         self.rtl_process = None
         self.frequency = None
+        self.device_index = None
 
     def get_status(self):
         dw_alive = self.dw_process is not None and self.dw_process.poll() is None
@@ -125,6 +129,7 @@ class APRSDecoder:
             "has_rtl_fm": self._has_rtl_fm,
             "frequency_hz": self.frequency,
             "frequency_mhz": round(self.frequency / 1e6, 4) if self.frequency else None,
+            "device_index": self.device_index,
             "pid": self.dw_process.pid if self.dw_process and dw_alive else None,
             "packet_count": len(self._packets),
         }
@@ -0,0 +1,181 @@
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from scipy import fft, signal
+
+import filters
+from bands import FREQUENCY_DB
+from demod import USABLE_SPAN, NFMDemodulator
+
+# Up to this many channels, a DFT matrix for just their bins beats a full FFT
+DFT_MAX_CHANNELS = 24
+
+
+class Channelizer:
+    """2x oversampled polyphase filter bank.
+
+    Splits a wideband capture into M bins spaced sample_rate / M apart and
+    outputs each at 2 * sample_rate / M, so a requested channel can sit
+    anywhere inside its bin and still be fully inside the output band. One
+    polyphase fold plus one FFT per output sample serves every channel; the
+    residual offset from the bin center is removed with a per-channel
+    phase-continuous mixer at the low output rate.
+    """
+
+    def __init__(self, sample_rate, center_freq, frequencies, spacing=32e3, taps_per_branch=8):
+        self.sample_rate = sample_rate
+        self.center_freq = center_freq
+        self.num_bins = 1 << round(np.log2(sample_rate / spacing))
+        self.decimation = self.num_bins // 2
+        self.output_rate = sample_rate / self.decimation
+        self.bin_spacing = sample_rate / self.num_bins
+
+        self.frequencies = list(frequencies)
+        offsets = np.array([f - center_freq for f in self.frequencies])
+        edge = USABLE_SPAN * sample_rate / 2
+        outside = [f for f, off in zip(self.frequencies, offsets) if abs(off) > edge]
+        if outside:
+            raise ValueError(
+                f"Channels outside the {sample_rate / 1e6:.3f} MHz capture span around "
+                f"{center_freq / 1e6:.4f} MHz: {[round(f / 1e6, 4) for f in outside]}"
+            )
+        self.bins = np.round(offsets / self.bin_spacing).astype(int) % self.num_bins
+        signed_bins = np.where(self.bins >= self.num_bins // 2, self.bins - self.num_bins, self.bins)
+        residual = offsets - signed_bins * self.bin_spacing
+        # Per-output phase step in cycles: the FFT bin phase term
+        # e^{-j 2 pi k p / M} for the newest sample p (advancing by
+        # `decimation` per output) plus the residual offset inside the bin.
+        self._step = -(self.bins * self.decimation / self.num_bins + residual / self.output_rate) % 1
+        self._cycles = -(self.bins * (self.decimation - 1) / self.num_bins) % 1
+
+        self.taps = filters.channelizer_taps(self.num_bins, sample_rate, taps_per_branch)
+        # Reversed prototype as rows of M samples, each tap twice to line up
+        # with the I/Q lanes of the input viewed as float32
+        self._fold_taps = np.repeat(self.taps[::-1].reshape(-1, self.num_bins), 2, axis=1).astype(np.float32)
+        # Only the channels' bins of the IFFT of each (reversed) folded row,
+        # times M, when there are few enough of them
+        self._dft = None
+        if len(self.bins) <= DFT_MAX_CHANNELS:
+            i = np.arange(self.num_bins - 1, -1, -1)
+            self._dft = np.exp(2j * np.pi * np.outer(i, self.bins) / self.num_bins).astype(np.complex64)
+        self._history = np.zeros(len(self.taps) - self.decimation, dtype=np.complex64)
+        self._pending = np.zeros(0, dtype=np.complex64)
+
+    def process(self, iq_samples):
+        """Channelize one IQ block. Returns a list of complex streams, one per frequency."""
+        d = self.decimation
+        m = self.num_bins
+        branches = len(self._fold_taps)
+
+        iq_samples = np.asarray(iq_samples, dtype=np.complex64)
+        total = len(self._pending) + len(iq_samples)
+        if total < d:
+            self._pending = np.concatenate((self._pending, iq_samples))
+            return [np.zeros(0, dtype=np.complex64) for _ in self.frequencies]
+        # Whole rows of d samples go through; the remainder waits for the next block
+        take = total - total % d - len(self._pending)
+        buf = np.concatenate((self._history, self._pending, iq_samples[:take]))
+        self._pending = iq_samples[take:].copy()
+        n_out = len(buf) // d - 2 * branches + 1
+
+        # Polyphase fold: output n sums the `branches` M-sample segments
+        # starting at n * d, each weighted by its slice of the prototype.
+        # The segments are a strided view of buf (no copy), and real taps on
+        # the float32 I/Q lanes keep it one real einsum.
+        lanes = buf.view(np.float32)
+        step = lanes.itemsize
+        segments = as_strided(
+            lanes, shape=(n_out, branches, 2 * m), strides=(2 * d * step, 2 * m * step, step), writeable=False
+        )
+        folded = np.einsum("nbi,bi->ni", segments, self._fold_taps).view(np.complex64)
+
+        if self._dft is not None:
+            spectra = folded @ self._dft
+        else:
+            spectra = fft.ifft(folded[:, ::-1], axis=1, workers=-1)[:, self.bins] * np.float32(m)
+
+        # Mixer phase in float64 cycles for precision, then cos/sin in float32
+        # (far cheaper than a complex exp)
+        phase = ((self._cycles + np.outer(np.arange(n_out), self._step)) % 1).astype(np.float32)
+        phase *= np.float32(2 * np.pi)
+        mixer = np.empty(phase.shape, dtype=np.complex64)
+        np.cos(phase, out=mixer.real)
+        np.sin(phase, out=mixer.imag)
+        spectra *= mixer
+        self._cycles = (self._cycles + n_out * self._step) % 1
+
+        self._history = buf[-(len(self.taps) - d):]
+        return [np.ascontiguousarray(spectra[:, i]) for i in range(len(self.frequencies))]
+
+
+class ChannelMonitor:
+    """Channelizer followed by a streaming NFM demodulator per channel."""
+
+    # Two-sided channel filter applied at the channelizer output rate
+    channel_bandwidth = 16e3
+
+    def __init__(self, sample_rate, center_freq, frequencies, audio_rate=48000):
+        self.channelizer = Channelizer(sample_rate, center_freq, frequencies)
+        self.frequencies = self.channelizer.frequencies
+        self.audio_rate = audio_rate
+        rate = self.channelizer.output_rate
+        self._sos = filters.lowpass_sos(self.channel_bandwidth / 2, rate, order=8)
+        self._zi = [np.zeros((len(self._sos), 2), dtype=np.complex128) for _ in self.frequencies]
+        self.demods = [NFMDemodulator(rate, audio_rate) for _ in self.frequencies]
+
+    def process(self, iq_samples):
+        """Returns a list of (channel_power_db, audio) tuples, one per frequency."""
+        results = []
+        streams = self.channelizer.process(iq_samples)
+        for i, stream in enumerate(streams):
+            filtered, self._zi[i] = signal.sosfilt(self._sos, stream, zi=self._zi[i])
+            power = float(np.mean(np.abs(filtered) ** 2)) if len(filtered) else 0.0
+            power_db = 10 * np.log10(power + 1e-10)
+            results.append((power_db, self.demods[i].process(filtered)))
+        return results
+
+
+def channels_in_span(center_freq, sample_rate, protocol="analog_nfm"):
+    """Phonebook channels of a protocol that fit inside one capture."""
+    edge = USABLE_SPAN * sample_rate / 2
+    return {
+        name: ch["freq"]
+        for name, ch in FREQUENCY_DB.items()
+        if ch["protocol"] == protocol and abs(ch["freq"] - center_freq) <= edge
+    }
+
+
+def resolve_channels(spec):
+    """Parse 'name,154.295,...' into {label: freq_hz} using FREQUENCY_DB names or MHz values.
+
+    Raises ValueError naming the first item that is neither.
+    """
+    channels = {}
+    for item in spec:
+        item = str(item).strip()
+        if not item:
+            continue
+        if item in FREQUENCY_DB:
+            channels[item] = FREQUENCY_DB[item]["freq"]
+            continue
+        try:
+            mhz = float(item)
+        except ValueError:
+            raise ValueError(f"Unknown channel {item!r}: not a phonebook name or a frequency in MHz") from None
+        channels[f"{mhz:.4f}"] = mhz * 1e6
+    return channels
+
+
+def monitor_capture(iq_samples, sample_rate, center_freq, channels, audio_rate=48000):
+    """Channelize one capture and return per-channel power and audio stats."""
+    monitor = ChannelMonitor(sample_rate, center_freq, channels.values(), audio_rate)
+    results = []
+    for (name, freq), (power_db, audio) in zip(channels.items(), monitor.process(iq_samples)):
+        rms = float(np.sqrt(np.mean(audio**2))) if len(audio) else 0.0
+        results.append({
+            "name": name,
+            "frequency_mhz": round(freq / 1e6, 4),
+            "power_db": round(float(power_db), 1),
+            "audio_rms": round(rms, 4),
+            "audio_samples": len(audio),
+        })
+    return results
@@ -0,0 +1,252 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from bands import FREQUENCY_DB
+from demod import create_demodulator
+from scanner import (
+    CHANNEL_BW,
+    NARROW_BW,
+    SETTLE_SAMPLES,
+    measure_channels,
+    plan_hops,
+    scan_fft_size,
+    scan_plan,
+)
+
+log = logging.getLogger("sdr.conventional")
+
+
+def analog_channels():
+    """Phonebook channels an analog demodulator can play, as {name: freq_hz}."""
+    return {name: ch["freq"] for name, ch in FREQUENCY_DB.items() if ch["decoder"] == "analog"}
+
+
+class ConventionalScanner:
+    """Conventional scanner: sweep a channel list, stop on activity, resume.
+
+    Channels are grouped into tuning windows (the same grouping as scanner
+    hops) and each window is measured from one capture. On activity (SNR
+    over snr_db against the CFAR floor) the scanner locks onto the
+    strongest active channel and keeps re-measuring it at the same tuning;
+    squelch stays open while its SNR is within hysteresis_db of snr_db.
+    After hang_time seconds closed it releases and carries on with the next
+    window. Each channel is measured over the bandwidth of its phonebook
+    protocol (scanner.CHANNEL_BW, else NARROW_BW) unless channel_bw sets
+    one for all.
+
+    Audio goes out through callbacks: on_lock(name, freq, mode, center, iq)
+    with the capture that tripped the squelch and on_release(transmission)
+    let a caller steer its own demodulator (the web UI's audio path), and
+    on_audio(audio) gets this scanner's own demodulated audio of every
+    locked capture. Whoever plays the audio calls audio_started() as the
+    first of it leaves; the time from detection to that call is kept as
+    the lock's latency.
+    """
+
+    def __init__(self, radio, channels=None, snr_db=10.0, hang_time=2.0, dwell_ms=30, hysteresis_db=3.0,
+                 channel_bw=None, audio_rate=48000, settle_samples=SETTLE_SAMPLES,
+                 on_tune=None, on_lock=None, on_release=None, on_audio=None):
+        channels = sorted((channels or analog_channels()).items(), key=lambda kv: kv[1])
+        if not channels:
+            raise ValueError("No channels to scan")
+        self.radio = radio
+        self.names = [name for name, _ in channels]
+        self.freqs = np.array([freq for _, freq in channels], dtype=np.float64)
+        self.modes = [FREQUENCY_DB[name]["mode"] if name in FREQUENCY_DB else "nfm" for name in self.names]
+        self.snr_db = snr_db
+        self.hang_time = hang_time
+        self.hysteresis_db = hysteresis_db
+        self.channel_bws = np.array([
+            channel_bw or CHANNEL_BW.get(FREQUENCY_DB.get(name, {}).get("protocol"), NARROW_BW)
+            for name in self.names
+        ])
+        self.channel_bw = float(self.channel_bws.max())
+        self.audio_rate = audio_rate
+        self.sample_rate = radio.sample_rate
+        # Bins fine enough for the narrowest channel, windows that fit the widest
+        self.fft_size = scan_fft_size(self.sample_rate, float(self.channel_bws.min()))
+        self.samples_per_dwell = max(int(self.sample_rate * dwell_ms / 1000), self.fft_size)
+        self.settle_samples = settle_samples
+        self.windows = plan_hops(self.freqs, self.channel_bw, self.sample_rate)
+        self.on_tune = on_tune
+        self.on_lock = on_lock
+        self.on_release = on_release
+        self.on_audio = on_audio
+
+        self.state = "idle"
+        self.current = None  # transmission being listened to
+        self.transmissions = deque(maxlen=100)
+        self.latencies = deque(maxlen=100)  # detect-to-audio, ms
+        self.sweeps = 0
+        self.error = None
+        self._window = 0
+        self._locked = None  # channel index
+        self._center = None
+        self._detected_at = None
+        self._last_open = None
+        self._demod = None
+        self._buf = np.empty(settle_samples + self.samples_per_dwell, dtype=np.complex64)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _capture(self, center):
+        """One dwell at center; returns (iq, the center actually tuned).
+
+        After a retune the settle samples come from the same read as the
+        dwell and are dropped, so a streaming radio serves both from one
+        ring block rather than waiting for a fresh block for each.
+        """
+        settle = 0
+        if self.radio.center_freq != center:
+            self.radio.center_freq = center
+            settle = self.settle_samples
+            if self.on_tune:
+                self.on_tune(self.radio.center_freq)
+        num_samples = settle + self.samples_per_dwell
+        iq = self.radio.read_samples(num_samples, out=self._buf[:num_samples])
+        # Sources that can't retune (IQ files) stay where they are
+        return iq[settle:], self.radio.center_freq
+
+    def _measure(self, iq, center, hop):
+        plan = scan_plan(self.fft_size, self.sample_rate)
+        return measure_channels(iq, plan, self.freqs[hop] - center, self.channel_bws[hop])
+
+    def scan_step(self):
+        """Measure the next window; lock onto its strongest active channel, if any."""
+        center, hop = self.windows[self._window]
+        self._window = (self._window + 1) % len(self.windows)
+        if not self._window:
+            self.sweeps += 1
+        iq, center = self._capture(center)
+        if len(iq) < self.fft_size:
+            return
+        detected_at = time.monotonic()
+        power_db, snr = self._measure(iq, center, hop)
+        active = snr > self.snr_db
+        if not active.any():
+            return
+        best = int(np.argmax(np.where(active, snr, -np.inf)))
+        self._lock(hop.start + best, center, detected_at, float(power_db[best]), float(snr[best]), iq)
+
+    def _lock(self, i, center, detected_at, power_db, snr, iq):
+        self._locked = i
+        self._center = center
+        self._detected_at = detected_at
+        self._last_open = detected_at
+        self.current = {
+            "name": self.names[i],
+            "freq_mhz": float(self.freqs[i]) / 1e6,
+            "mode": self.modes[i],
+            "started": time.time(),
+            "power_db": round(power_db, 1),
+            "snr_db": round(snr, 1),
+            "latency_ms": None,
+        }
+        self.state = "listening"
+        log.info(f"Locked {self.names[i]} ({self.freqs[i] / 1e6:.4f} MHz, SNR {snr:.1f} dB)")
+        if self.on_lock:
+            self.on_lock(self.names[i], float(self.freqs[i]), self.modes[i], center, iq)
+        if self.on_audio:
+            self._demod = create_demodulator(
+                self.modes[i], self.sample_rate, self.audio_rate, float(self.freqs[i]) - center
+            )
+            # The capture that tripped the squelch is the first audio
+            self._play(iq)
+
+    def _play(self, iq):
+        self.on_audio(self._demod.process(iq))
+        self.audio_started()
+
+    def audio_started(self):
+        """Note that the locked channel's audio is playing; the first call per lock sets its latency."""
+        current = self.current
+        if current is None or current["latency_ms"] is not None:
+            return
+        current["latency_ms"] = round((time.monotonic() - self._detected_at) * 1e3, 1)
+        self.latencies.append(current["latency_ms"])
+
+    def listen_step(self):
+        """Re-measure the locked channel; release it after hang_time with squelch closed."""
+        i = self._locked
+        iq, center = self._capture(self._center)
+        now = time.monotonic()
+        if len(iq) >= self.fft_size:
+            power_db, snr = self._measure(iq, center, slice(i, i + 1))
+            if snr[0] > self.snr_db - self.hysteresis_db:
+                self._last_open = now
+                self.state = "listening"
+                if snr[0] > self.current["snr_db"]:
+                    self.current["power_db"] = round(float(power_db[0]), 1)
+                    self.current["snr_db"] = round(float(snr[0]), 1)
+            else:
+                self.state = "hang"
+            if self.on_audio:
+                self._play(iq)
+        if now - self._last_open > self.hang_time:
+            self._release()
+
+    def _release(self):
+        transmission = self.current
+        transmission["duration_s"] = round(self._last_open - self._detected_at, 2)
+        self.transmissions.append(transmission)
+        self.current = None
+        self._locked = None
+        self._demod = None
+        self.state = "scanning"
+        log.info(f"Released {transmission['name']} after {transmission['duration_s']} s")
+        if self.on_release:
+            self.on_release(transmission)
+
+    def _run(self):
+        self.state = "scanning"
+        try:
+            while not self._stop.is_set():
+                if self._locked is None:
+                    self.scan_step()
+                else:
+                    self.listen_step()
+        except Exception as e:
+            # Whatever the error, the locked transmission is still released below
+            self.error = str(e)
+            log.exception(f"Scanner stopped: {e}")
+        if self._locked is not None:
+            self._release()
+        self.state = "idle"
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="conventional-scanner")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def status(self):
+        latencies = np.array(self.latencies)
+        return {
+            "running": self.running,
+            "state": self.state,
+            "channels": len(self.names),
+            "windows": len(self.windows),
+            "sweeps": self.sweeps,
+            "current": self.current,
+            "transmissions": list(self.transmissions)[-20:],
+            "latency_ms": {
+                "count": len(latencies),
+                "mean": round(float(latencies.mean()), 1) if len(latencies) else None,
+                "p95": round(float(np.percentile(latencies, 95)), 1) if len(latencies) else None,
+                "max": round(float(latencies.max()), 1) if len(latencies) else None,
+            },
+            "error": self.error,
+        }
@@ -3,73 +3,430 @@ from math import gcd
 import numpy as np
 from scipy import signal
 
+import filters
 
-def fm_demod(iq_samples, sample_rate=2.048e6, audio_rate=48000):
-    """Demodulate wideband FM from IQ samples. Returns audio at audio_rate."""
-    # Quadrature demodulation (polar discriminator)
-    discriminated = np.angle(iq_samples[1:] * np.conj(iq_samples[:-1]))
-
-    # Low-pass filter at 15 kHz (mono audio bandwidth)
-    nyq = sample_rate / 2
-    b, a = signal.butter(5, 15000 / nyq, btype="low")
-    filtered = signal.lfilter(b, a, discriminated)
 
-    # De-emphasis filter (75 us time constant, North America)
-    tau = 75e-6
-    d = sample_rate * tau
-    de_b = [1]
-    de_a = [1, -np.exp(-1 / d)]
-    filtered = signal.lfilter(de_b, de_a, filtered)
-
-    # Resample to audio rate
-    g = gcd(int(sample_rate), audio_rate)
-    up = audio_rate // g
-    down = int(sample_rate) // g
-    audio = signal.resample_poly(filtered, up, down)
-
-    # Normalize to [-1, 1]
-    peak = np.max(np.abs(audio))
+def _normalize(audio):
+    """Scale a one-shot capture to [-1, 1] and convert to float32."""
+    peak = np.max(np.abs(audio)) if len(audio) else 0
     if peak > 0:
         audio = audio / peak
-
     return audio.astype(np.float32)
 
 
-def am_demod(iq_samples, sample_rate=2.048e6, audio_rate=48000):
+class Resampler:
+    """Stateful rational polyphase resampler.
+
+    Equivalent to signal.resample_poly with the default Kaiser FIR, but keeps
+    its input history and output phase between calls so consecutive blocks
+    join without edge transients or dropped samples. Pass taps to use a
+    custom anti-aliasing filter (e.g. a decimation stage).
+    """
+
+    def __init__(self, up, down, taps=None):
+        g = gcd(up, down)
+        self.up = up // g
+        self.down = down // g
+        self.taps = filters.polyphase_taps(self.up, self.down) if taps is None else taps
+        self._history_len = -(-len(self.taps) // self.up) + 1
+        if self.up == 1:
+            # Pure decimation: reversed taps padded to whole blocks of `down`
+            blocks = -(-len(self.taps) // self.down)
+            padded = np.zeros(blocks * self.down)
+            padded[:len(self.taps)] = self.taps
+            self._rev_taps = padded[::-1].copy()
+            self._blocks = blocks
+            # Real block matrix so complex input runs as one real GEMM:
+            # column 2j (2j+1) applies tap block j to the I (Q) lanes.
+            self._tap_matrix = np.zeros((2 * self.down, 2 * blocks))
+            for j in range(blocks):
+                block = self._rev_taps[j * self.down:(j + 1) * self.down]
+                self._tap_matrix[0::2, 2 * j] = block
+                self._tap_matrix[1::2, 2 * j + 1] = block
+            self._history_len = max(self._history_len, len(padded))
+        self.reset()
+
+    def reset(self):
+        """Forget the input history, as if freshly constructed."""
+        self._history = None
+        # Up-rate index of the next output, relative to the start of the buffer
+        self._phase = self._history_len * self.up
+
+    def process(self, x):
+        if self.up == 1 and self.down == 1:
+            return x
+        if self._history is None:
+            self._history = np.zeros(self._history_len, dtype=x.dtype)
+        if self.up == 1 and len(x) >= self._history_len:
+            return self._process_decimate(x)
+        buf = np.concatenate((self._history, x))
+        last = (len(buf) - 1) * self.up
+        if self._phase > last:
+            n_out = 0
+        else:
+            n_out = (last - self._phase) // self.down + 1
+
+        if n_out and self.up == 1:
+            out = self._decimate(buf, self._phase - self._blocks * self.down + 1, n_out)
+        elif n_out:
+            # Delay the taps so output sample 0 of upfirdn lands on our phase
+            delay = -self._phase % self.down
+            taps = np.concatenate((np.zeros(delay), self.taps)) if delay else self.taps
+            start = (self._phase + delay) // self.down
+            out = signal.upfirdn(taps, buf, self.up, self.down)[start:start + n_out]
+        else:
+            out = np.zeros(0, dtype=x.dtype)
+
+        self._phase += n_out * self.down - (len(buf) - self._history_len) * self.up
+        self._history = buf[-self._history_len:]
+        return out
+
+    def _process_decimate(self, x):
+        """Decimate a block without copying it behind the history.
+
+        Only the few outputs whose filter span reaches back into the previous
+        block are computed from a short history + head buffer; the rest read
+        the new block in place.
+        """
+        m = self.down
+        n_hist = self._history_len
+        span = self._blocks * m
+        last = n_hist + len(x) - 1
+        n_out = (last - self._phase) // m + 1 if self._phase <= last else 0
+        first = self._phase - span + 1
+        # Outputs before n_seam need samples from the history
+        n_seam = min(n_out, max(0, -(-(n_hist - first) // m)))
+
+        parts = []
+        if n_seam:
+            head = np.concatenate((self._history, x[:first + n_seam * m + span - n_hist]))
+            parts.append(self._decimate(head, first, n_seam))
+        if n_out > n_seam:
+            parts.append(self._decimate(x, first + n_seam * m - n_hist, n_out - n_seam))
+        out = parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+        self._phase += n_out * m - len(x)
+        self._history = x[-n_hist:].copy()
+        return out
+
+    def _decimate(self, buf, start, n_out):
+        """Polyphase decimation as BLAS matrix products.
+
+        Viewing the input as rows of `down` samples turns each output into a
+        dot product over `blocks` consecutive rows, so the whole stage is one
+        matrix product plus a few shifted adds instead of upfirdn's
+        per-sample loop.
+        """
+        m = self.down
+        span = buf[start:start + (n_out + self._blocks - 1) * m]
+        if np.iscomplexobj(span):
+            real = span.real.dtype
+            rows = span.view(real).reshape(-1, 2 * m)
+            partial = (rows @ self._tap_matrix.astype(real, copy=False)).view(span.dtype)
+            out = partial[:n_out, 0].copy()
+            for j in range(1, self._blocks):
+                out += partial[j:j + n_out, j]
+            return out
+        taps = self._rev_taps.astype(span.dtype, copy=False)
+        rows = span.reshape(-1, m)
+        out = rows[:n_out] @ taps[:m]
+        for j in range(1, self._blocks):
+            out += rows[j:j + n_out] @ taps[j * m:(j + 1) * m]
+        return out
+
+
+def _smooth_factors(n, largest=7):
+    """Prime factors of n, or None if any factor exceeds largest."""
+    factors = []
+    for p in (2, 3, 5, 7):
+        while n % p == 0 and p <= largest:
+            factors.append(p)
+            n //= p
+    return factors if n == 1 else None
+
+
+def decimation_stages(sample_rate, min_rate, max_stage=8):
+    """Plan integer decimation stages from sample_rate down to at least min_rate.
+
+    Picks the largest total factor that divides the sample rate and splits
+    into stages of at most max_stage, largest first so the full-rate stage
+    gets the widest (cheapest) transition band.
+    """
+    rate = int(sample_rate)
+    for total in range(int(sample_rate // min_rate), 1, -1):
+        if rate % total:
+            continue
+        factors = _smooth_factors(total)
+        if factors is None:
+            continue
+        stages = []
+        for p in sorted(factors, reverse=True):
+            if stages and stages[-1] * p <= max_stage:
+                stages[-1] *= p
+            else:
+                stages.append(p)
+        return sorted(stages, reverse=True)
+    return []
+
+
+class Decimator:
+    """Multistage complex low-pass + decimation front end.
+
+    Brings a full-rate capture down to a narrow channel rate before any
+    per-sample nonlinear work (discriminator, envelope), so the expensive
+    part of the chain runs on a few tens of kHz instead of MS/s.
+    """
+
+    def __init__(self, sample_rate, min_rate, bandwidth):
+        self.input_rate = sample_rate
+        self.stages = []
+        passband = bandwidth / 2
+        rate = sample_rate
+        factors = decimation_stages(sample_rate, min_rate)
+        for i, factor in enumerate(factors):
+            out_rate = rate / factor
+            # Intermediate stages only need to keep aliases out of the final
+            # passband; the last stage defines the channel edge.
+            last = i == len(factors) - 1
+            stopband = out_rate / 2 if last else out_rate - passband
+            taps = filters.decimation_taps(factor, rate, passband, stopband)
+            self.stages.append(Resampler(1, factor, taps=taps))
+            rate = out_rate
+        self.output_rate = rate
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+    def process(self, iq_samples):
+        for stage in self.stages:
+            iq_samples = stage.process(iq_samples)
+        return iq_samples
+
+
+# Fraction of the capture span usable for channels (the RTL-SDR rolls off
+# near the edges); offsets beyond it need a hardware retune.
+USABLE_SPAN = 0.9
+
+
+class NCO:
+    """Phase-continuous numerically controlled oscillator.
+
+    Reads a cached table (see filters.nco_table) instead of evaluating exp()
+    per sample, and carries its table index across blocks.
+    """
+
+    def __init__(self, frequency, sample_rate):
+        self.sample_rate = sample_rate
+        self._table, self.frequency = filters.nco_table(frequency, sample_rate)
+        self._length = len(self._table) // 2
+        self._index = 0
+
+    def reset(self):
+        self._index = 0
+
+    def mix(self, x):
+        """Multiply x by the oscillator, continuing from the previous block."""
+        out = np.empty(len(x), dtype=np.result_type(x.dtype, np.complex64))
+        i = self._index
+        # Every chunk spans whole periods, so each one starts at index i
+        for start in range(0, len(x), self._length):
+            seg = x[start:start + self._length]
+            np.multiply(seg, self._table[i:i + len(seg)], out=out[start:start + len(seg)])
+        self._index = (i + len(x)) % self._length
+        return out
+
+
+class DDC:
+    """Digital down-converter: mix an in-span offset to baseband, then decimate."""
+
+    def __init__(self, sample_rate, offset, min_rate, bandwidth):
+        self.sample_rate = sample_rate
+        self.decimator = Decimator(sample_rate, min_rate, bandwidth)
+        self.output_rate = self.decimator.output_rate
+        self.set_offset(offset)
+
+    def set_offset(self, offset):
+        """Move the mixer; decimation filter state is kept."""
+        self.nco = NCO(-offset, self.sample_rate) if offset else None
+        self.offset = -self.nco.frequency if self.nco else 0.0
+
+    def reset(self):
+        """Restart the mixer phase and empty the decimation filters."""
+        if self.nco is not None:
+            self.nco.reset()
+        self.decimator.reset()
+
+    def process(self, iq_samples):
+        if self.nco is not None:
+            iq_samples = self.nco.mix(iq_samples)
+        return self.decimator.process(iq_samples)
+
+
+def in_span(offset, sample_rate):
+    """True if a tuning offset from the capture center can be served by the DDC."""
+    return abs(offset) <= USABLE_SPAN * sample_rate / 2
+
+
+class _Demodulator:
+    """Base class for streaming demodulators fed consecutive IQ blocks.
+
+    Subclasses design their filters in _design() and set up everything that
+    carries over between blocks in _reset_state(), which reset() reruns.
+    """
+
+    # Decimating front end: minimum channel rate and two-sided channel
+    # bandwidth. None runs the whole chain at the capture rate.
+    min_channel_rate = None
+    channel_bandwidth = None
+
+    def __init__(self, sample_rate=2.048e6, audio_rate=48000, offset=0.0):
+        self.sample_rate = sample_rate
+        self.audio_rate = audio_rate
+        self.ddc = None
+        self.channel_rate = sample_rate
+        if self.min_channel_rate:
+            self.ddc = DDC(sample_rate, offset, self.min_channel_rate, self.channel_bandwidth)
+            self.channel_rate = self.ddc.output_rate
+        elif offset:
+            raise ValueError(f"{type(self).__name__} has no channel filter for offset tuning")
+        self.resampler = Resampler(*filters.resample_ratio(self.channel_rate, audio_rate))
+        self._design()
+        self._reset_state()
+
+    def _design(self):
+        """Build the filters that depend on channel_rate (no state)."""
+
+    def _reset_state(self):
+        """Empty the history of every filter in the chain."""
+        if self.ddc is not None:
+            self.ddc.reset()
+        self.resampler.reset()
+
+    @property
+    def offset(self):
+        """Channel offset from the capture center in Hz (after NCO snapping)."""
+        return self.ddc.offset if self.ddc else 0.0
+
+    def set_offset(self, offset):
+        """Retune inside the capture span without resetting filter state."""
+        if self.ddc is None:
+            raise ValueError(f"{type(self).__name__} has no channel filter for offset tuning")
+        self.ddc.set_offset(offset)
+
+    def _front_end(self, iq_samples):
+        if self.ddc is None:
+            return iq_samples
+        return self.ddc.process(iq_samples)
+
+    def process(self, iq_samples):
+        """Demodulate one IQ block. Returns float32 audio at audio_rate."""
+        raise NotImplementedError
+
+    def reset(self):
+        """Drop all filter state, e.g. after a hardware retune."""
+        self._reset_state()
+
+
+class FMDemodulator(_Demodulator):
+    """Wideband FM with 75 us de-emphasis (North America)."""
+
+    deviation = 75e3
+    audio_cutoff = 15000
+    # De-emphasis time constant; None skips it
+    tau = 75e-6
+    min_channel_rate = 256000
+    channel_bandwidth = 180e3
+
+    def _design(self):
+        self._sos = filters.lowpass_sos(self.audio_cutoff, self.channel_rate)
+        self._de_sos = filters.deemphasis_sos(self.tau, self.channel_rate) if self.tau else None
+        # Full deviation maps to +/-1
+        self._gain = self.channel_rate / (2 * np.pi * self.deviation)
+
+    def _reset_state(self):
+        super()._reset_state()
+        self._zi = np.zeros((len(self._sos), 2))
+        self._de_zi = np.zeros((1, 2))
+        self._last = None
+
+    def _discriminate(self, iq_samples):
+        """Polar discriminator that carries the last sample across blocks."""
+        prev = iq_samples[0] if self._last is None else self._last
+        shifted = np.concatenate(([prev], iq_samples[:-1]))
+        self._last = iq_samples[-1]
+        return np.angle(iq_samples * np.conj(shifted)) * self._gain
+
+    def process(self, iq_samples):
+        iq_samples = self._front_end(iq_samples)
+        if len(iq_samples) == 0:
+            return np.zeros(0, dtype=np.float32)
+        discriminated = self._discriminate(iq_samples)
+        filtered, self._zi = signal.sosfilt(self._sos, discriminated, zi=self._zi)
+        if self._de_sos is not None:
+            filtered, self._de_zi = signal.sosfilt(self._de_sos, filtered, zi=self._de_zi)
+        return self.resampler.process(filtered).astype(np.float32)
+
+
+class NFMDemodulator(FMDemodulator):
+    """Narrowband FM. Used for NOAA weather, marine, public safety.
+
+    No de-emphasis: the 4 kHz audio low-pass is the only shaping, as in the
+    original one-shot nfm_demod.
+    """
+
+    deviation = 5e3
+    audio_cutoff = 4000
+    tau = None
+    min_channel_rate = 48000
+    channel_bandwidth = 16e3
+
+
+class AMDemodulator(_Demodulator):
     """AM envelope detection. Used for aviation, AM broadcast."""
-    envelope = np.abs(iq_samples)
-    envelope = envelope - np.mean(envelope)
 
-    # Low-pass filter at 5 kHz (AM audio bandwidth)
-    nyq = sample_rate / 2
-    b, a = signal.butter(5, 5000 / nyq, btype="low")
-    filtered = signal.lfilter(b, a, envelope)
+    audio_cutoff = 5000
+    min_channel_rate = 48000
+    channel_bandwidth = 12e3
+    # Carrier tracking time constant for DC removal and level normalization
+    carrier_tau = 0.1
 
-    g = gcd(int(sample_rate), audio_rate)
-    audio = signal.resample_poly(filtered, audio_rate // g, int(sample_rate) // g)
+    def _design(self):
+        self._sos = filters.lowpass_sos(self.audio_cutoff, self.channel_rate)
+        self._dc_sos = filters.one_pole_sos(np.exp(-1 / (self.channel_rate * self.carrier_tau)))
 
-    peak = np.max(np.abs(audio))
-    if peak > 0:
-        audio = audio / peak
-    return audio.astype(np.float32)
+    def _reset_state(self):
+        super()._reset_state()
+        self._zi = np.zeros((len(self._sos), 2))
+        self._dc_zi = None
 
+    def process(self, iq_samples):
+        iq_samples = self._front_end(iq_samples)
+        if len(iq_samples) == 0:
+            return np.zeros(0, dtype=np.float32)
+        envelope = np.abs(iq_samples).astype(np.float64)
+        if self._dc_zi is None:
+            self._dc_zi = signal.sosfilt_zi(self._dc_sos) * envelope.mean()
+        carrier, self._dc_zi = signal.sosfilt(self._dc_sos, envelope, zi=self._dc_zi)
+        # Modulation index: envelope relative to the tracked carrier level
+        audio = envelope / np.maximum(carrier, 1e-9) - 1
+        filtered, self._zi = signal.sosfilt(self._sos, audio, zi=self._zi)
+        return self.resampler.process(filtered).astype(np.float32)
 
-def nfm_demod(iq_samples, sample_rate=2.048e6, audio_rate=48000):
-    """Narrowband FM. Used for NOAA weather, marine, public safety."""
-    discriminated = np.angle(iq_samples[1:] * np.conj(iq_samples[:-1]))
 
-    # Narrower low-pass: 4 kHz for NFM
-    nyq = sample_rate / 2
-    b, a = signal.butter(5, 4000 / nyq, btype="low")
-    filtered = signal.lfilter(b, a, discriminated)
+def fm_demod(iq_samples, sample_rate=2.048e6, audio_rate=48000, offset=0.0):
+    """Demodulate wideband FM from IQ samples. Returns audio at audio_rate."""
+    return _normalize(FMDemodulator(sample_rate, audio_rate, offset).process(iq_samples))
 
-    g = gcd(int(sample_rate), audio_rate)
-    audio = signal.resample_poly(filtered, audio_rate // g, int(sample_rate) // g)
 
-    peak = np.max(np.abs(audio))
-    if peak > 0:
-        audio = audio / peak
-    return audio.astype(np.float32)
+def am_demod(iq_samples, sample_rate=2.048e6, audio_rate=48000, offset=0.0):
+    """AM envelope detection. Used for aviation, AM broadcast."""
+    return _normalize(AMDemodulator(sample_rate, audio_rate, offset).process(iq_samples))
+
+
+def nfm_demod(iq_samples, sample_rate=2.048e6, audio_rate=48000, offset=0.0):
+    """Narrowband FM. Used for NOAA weather, marine, public safety."""
+    return _normalize(NFMDemodulator(sample_rate, audio_rate, offset).process(iq_samples))
 
 
 DEMODS = {
@@ -79,9 +436,26 @@ DEMODS = {
     "nfm": nfm_demod,
 }
 
+DEMODULATORS = {
+    "wfm": FMDemodulator,
+    "fm": FMDemodulator,
+    "am": AMDemodulator,
+    "nfm": NFMDemodulator,
+}
+
+
+def create_demodulator(mode, sample_rate=2.048e6, audio_rate=48000, offset=0.0):
+    """Return a streaming demodulator for the given mode.
+
+    offset selects a channel that far from the capture center via the DDC.
+    """
+    if mode not in DEMODULATORS:
+        raise ValueError(f"Unknown mode: {mode}. Available: {list(DEMODULATORS.keys())}")
+    return DEMODULATORS[mode](sample_rate, audio_rate, offset)
+
 
-def demodulate(iq_samples, mode, sample_rate=2.048e6, audio_rate=48000):
-    """Demodulate IQ samples using the specified mode."""
+def demodulate(iq_samples, mode, sample_rate=2.048e6, audio_rate=48000, offset=0.0):
+    """Demodulate IQ samples using the specified mode, offset Hz from the capture center."""
     if mode not in DEMODS:
         raise ValueError(f"Unknown mode: {mode}. Available: {list(DEMODS.keys())}")
-    return DEMODS[mode](iq_samples, sample_rate, audio_rate)
+    return DEMODS[mode](iq_samples, sample_rate, audio_rate, offset)
@@ -0,0 +1,108 @@
+import numpy as np
+from scipy import ndimage
+
+
+def noise_floor_db(power_db, ref_bins=64, guard_bins=4):
+    """Ordered-statistic CFAR noise estimate for every bin.
+
+    The floor under each bin is the median of ref_bins reference cells on
+    either side, skipping guard_bins next to it so a signal's own skirts
+    don't raise its floor. Signals narrower than the reference window
+    barely move the median, unlike a mean.
+    """
+    footprint = np.ones(2 * (ref_bins + guard_bins) + 1, dtype=bool)
+    footprint[ref_bins:ref_bins + 2 * guard_bins + 1] = False
+    return ndimage.median_filter(np.asarray(power_db), footprint=footprint, mode="reflect")
+
+
+def find_detections(freqs_hz, power_db, floor_db, snr_db=10.0, min_bins=1, merge_bins=2):
+    """Runs of bins more than snr_db above floor_db, as detection dicts.
+
+    Runs separated by at most merge_bins quiet bins count as one signal
+    (FM sidebands, gaps in a digital carrier). Each detection has the
+    power-weighted center frequency, a bandwidth estimate (occupied bins x
+    bin width), peak power, the floor at the peak and the SNR there, and
+    the list is sorted strongest SNR first.
+    """
+    freqs_hz = np.asarray(freqs_hz, dtype=np.float64)
+    power_db = np.asarray(power_db)
+    floor_db = np.asarray(floor_db)
+    above = np.concatenate(([False], power_db - floor_db > snr_db, [False]))
+    edges = np.flatnonzero(np.diff(above.astype(np.int8)))
+    starts, stops = edges[::2], edges[1::2]
+    if not len(starts):
+        return []
+    keep = starts[1:] - stops[:-1] > merge_bins
+    starts = starts[np.concatenate(([True], keep))]
+    stops = stops[np.concatenate((keep, [True]))]
+
+    bin_hz = abs(freqs_hz[1] - freqs_hz[0]) if len(freqs_hz) > 1 else 0.0
+    detections = []
+    for start, stop in zip(starts, stops):
+        if stop - start < min_bins:
+            continue
+        linear = 10 ** (power_db[start:stop] / 10)
+        peak = start + int(np.argmax(power_db[start:stop]))
+        center = float(np.dot(linear, freqs_hz[start:stop]) / linear.sum())
+        detections.append(
+            {
+                "freq_hz": center,
+                "freq_mhz": round(center / 1e6, 5),
+                "bandwidth_hz": float((stop - start) * bin_hz),
+                "peak_db": round(float(power_db[peak]), 1),
+                "noise_db": round(float(floor_db[peak]), 1),
+                "snr_db": round(float(power_db[peak] - floor_db[peak]), 1),
+            }
+        )
+    return sorted(detections, key=lambda d: d["snr_db"], reverse=True)
+
+
+class CFARDetector:
+    """Constant-false-alarm-rate detector over successive spectrum frames.
+
+    Each frame's ordered-statistic floor is folded into a running per-bin
+    estimate (exponential average in linear power, weight alpha), so the
+    floor follows gain and band changes within a few frames without
+    chasing single bursts. Detections are relative to that floor, so one
+    snr_db works at any gain. A new frequency axis starts a fresh floor.
+    """
+
+    def __init__(self, snr_db=10.0, ref_bins=64, guard_bins=4, alpha=0.25, min_bins=1, merge_bins=2):
+        self.snr_db = snr_db
+        self.ref_bins = ref_bins
+        self.guard_bins = guard_bins
+        self.alpha = alpha
+        self.min_bins = min_bins
+        self.merge_bins = merge_bins
+        self.frames = 0
+        self._floor = None  # linear power
+        self._axis = None
+
+    def reset(self):
+        self.frames = 0
+        self._floor = self._axis = None
+
+    @property
+    def floor_db(self):
+        return None if self._floor is None else 10 * np.log10(self._floor + 1e-20)
+
+    def update(self, freqs_hz, power_db):
+        """Fold one frame into the running floor; returns the floor in dB."""
+        axis = (float(freqs_hz[0]), float(freqs_hz[-1]), len(freqs_hz))
+        if axis != self._axis:
+            self.reset()
+            self._axis = axis
+        estimate = 10 ** (noise_floor_db(power_db, self.ref_bins, self.guard_bins) / 10)
+        if self._floor is None:
+            self._floor = estimate
+        else:
+            self._floor += self.alpha * (estimate - self._floor)
+        self.frames += 1
+        return self.floor_db
+
+    def detect(self, freqs_hz, power_db):
+        """update() with this frame, then its detections against the running floor."""
+        floor_db = self.update(freqs_hz, power_db)
+        return find_detections(
+            freqs_hz, power_db, floor_db, self.snr_db, self.min_bins, self.merge_bins
+        )
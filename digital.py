@@ -39,6 +39,7 @@ class DigitalVoiceDecoder:
         self.process = None
         self.frequency = None
         self.mode = None
+        self.device_index = None
         self.active = False
         self._udp_port = None
         self._udp_sock = None
@@ -50,7 +51,7 @@ class DigitalVoiceDecoder:
         self._has_dsd = shutil.which("dsd-fme") is not None
         self._has_rtl_fm = shutil.which("rtl_fm") is not None
 
-    def start(self, frequency_hz, mode="nfm", gain="auto", squelch=0):
+    def start(self, frequency_hz, mode="nfm", gain="auto", squelch=0, device_index=0):
         """Launch subprocess to monitor a frequency.
 
         For digital modes (dmr, p25, nxdn, dstar, ysf, auto):
@@ -67,6 +68,7 @@ class DigitalVoiceDecoder:
 
         self.frequency = frequency_hz
         self.mode = mode
+        self.device_index = device_index
         freq_mhz = frequency_hz / 1e6
 
         is_digital = mode in DSD_MODES
@@ -93,7 +95,7 @@ class DigitalVoiceDecoder:
         cmd = [
             "dsd-fme",
             DSD_MODES[mode],
-            "-i", f"rtl:0:{freq_str}:{gain_val}:0:12:{squelch}:1",
+            "-i", f"rtl:{self.device_index}:{freq_str}:{gain_val}:0:12:{squelch}:1",
             "-o", f"udp:127.0.0.1:{self._udp_port}",
         ]
 
@@ -123,6 +125,7 @@ class DigitalVoiceDecoder:
 
         cmd = [
             "rtl_fm",
+            "-d", str(self.device_index),
             "-f", str(int(frequency_hz)),
             "-M", rtl_mode,
             "-s", sample_rate,
@@ -230,6 +233,7 @@ class DigitalVoiceDecoder:
 
         self.frequency = None
         self.mode = None
+        self.device_index = None
         self._udp_port = None
         log.info("Digital decoder stopped")
 
@@ -251,6 +255,7 @@ class DigitalVoiceDecoder:
             "frequency_hz": self.frequency,
             "frequency_mhz": round(self.frequency / 1e6, 4) if self.frequency else None,
             "mode": self.mode,
+            "device_index": self.device_index,
             "has_dsd": self._has_dsd,
             "has_rtl_fm": self._has_rtl_fm,
             "pid": self.process.pid if self.process and alive else None,
@@ -0,0 +1,167 @@
+import threading
+from math import gcd
+
+import numpy as np
+from scipy import signal
+
+
+class FilterCache:
+    """Memoizes filter designs keyed by their design parameters.
+
+    Cached arrays are shared between every demodulator, decoder and spectrum
+    consumer, so callers must treat them as read-only.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, factory):
+        """Return the cached value for key, building it with factory() on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = factory()
+        with self._lock:
+            return self._entries.setdefault(key, value)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Shared by demod.py, spectrum.py and any decoder that designs filters
+cache = FilterCache()
+
+
+def lowpass_sos(cutoff, sample_rate, order=5):
+    """Butterworth low-pass as second-order sections."""
+    key = ("lowpass", float(cutoff), float(sample_rate), order)
+    return cache.get(
+        key, lambda: signal.butter(order, cutoff / (sample_rate / 2), btype="low", output="sos")
+    )
+
+
+def one_pole_sos(alpha):
+    """Unity-gain one-pole low-pass y[n] = (1 - alpha) x[n] + alpha y[n-1] as SOS."""
+    key = ("one_pole", float(alpha))
+    return cache.get(key, lambda: np.array([[1 - alpha, 0.0, 0.0, 1.0, -alpha, 0.0]]))
+
+
+def deemphasis_sos(tau, sample_rate):
+    """FM de-emphasis network with time constant tau (75 us NA, 50 us EU)."""
+    return one_pole_sos(np.exp(-1 / (sample_rate * tau)))
+
+
+def resample_ratio(sample_rate, audio_rate):
+    """Reduced (up, down) pair for a rational rate change."""
+    key = ("ratio", int(sample_rate), int(audio_rate))
+
+    def build():
+        g = gcd(int(sample_rate), int(audio_rate))
+        return int(audio_rate) // g, int(sample_rate) // g
+
+    return cache.get(key, build)
+
+
+def polyphase_taps(up, down):
+    """Anti-aliasing FIR for an up/down resampler, matching signal.resample_poly."""
+    key = ("polyphase", up, down)
+
+    def build():
+        max_rate = max(up, down)
+        taps = signal.firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+        return taps * up
+
+    return cache.get(key, build)
+
+
+def decimation_taps(factor, sample_rate, passband, stopband, atten_db=60):
+    """Kaiser-window low-pass for one decimation stage.
+
+    passband and stopband are edge frequencies in Hz at the stage input rate.
+    """
+    key = ("decimation", factor, float(sample_rate), float(passband), float(stopband), atten_db)
+
+    def build():
+        nyq = sample_rate / 2
+        numtaps, beta = signal.kaiserord(atten_db, (stopband - passband) / nyq)
+        numtaps = max(numtaps | 1, factor * 2 + 1)
+        cutoff = (passband + stopband) / 2 / nyq
+        return signal.firwin(numtaps, cutoff, window=("kaiser", beta))
+
+    return cache.get(key, build)
+
+
+def channelizer_taps(num_bins, sample_rate, taps_per_branch=8, atten_db=60):
+    """Prototype low-pass for a 2x oversampled polyphase channelizer.
+
+    Passes 3/4 of a bin spacing either side of the bin center, so a channel
+    anywhere in its bin keeps its modulation, and stops by 5/4 spacing, where
+    components would alias back into that passband at the 2x output rate.
+    """
+    key = ("channelizer", num_bins, float(sample_rate), taps_per_branch, atten_db)
+
+    def build():
+        spacing = sample_rate / num_bins
+        nyq = sample_rate / 2
+        _, beta = signal.kaiserord(atten_db, 0.5 * spacing / nyq)
+        return signal.firwin(num_bins * taps_per_branch, spacing / nyq, window=("kaiser", beta))
+
+    return cache.get(key, build)
+
+
+# NCO frequency resolution is sample_rate / 2**NCO_BITS
+NCO_BITS = 16
+
+
+def nco_table(frequency, sample_rate, min_length=4096):
+    """Complex oscillator table covering a whole number of periods.
+
+    frequency is snapped to the NCO resolution, so the table length divides
+    2**NCO_BITS and indexing it modulo its length is phase-continuous.
+    Returns (table, snapped_frequency); the table is stored twice over so
+    any window of up to one period can be read as a contiguous slice.
+    """
+    steps = 1 << NCO_BITS
+    word = round(frequency / sample_rate * steps) % steps
+    key = ("nco", word, float(sample_rate), min_length)
+
+    def build():
+        period = steps // gcd(word, steps)
+        length = period * -(-min(min_length, steps) // period)
+        n = np.arange(2 * length)
+        return np.exp(2j * np.pi * (word * n % steps) / steps).astype(np.complex64)
+
+    table = cache.get(key, build)
+    snapped = (word if word < steps // 2 else word - steps) * sample_rate / steps
+    return table, snapped
+
+
+def window(name, size):
+    """Symmetric analysis window as float32 (name as accepted by signal.get_window)."""
+    key = ("window", name, size)
+    return cache.get(
+        key, lambda: signal.get_window(name, size, fftbins=False).astype(np.float32)
+    )
+
+
+def cache_stats():
+    """Hit/miss counters for the shared filter cache."""
+    return cache.stats()
@@ -0,0 +1,234 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from bands import FREQUENCY_DB
+
+log = logging.getLogger("sdr.hits")
+
+DEFAULT_PATH = os.environ.get(
+    "SDR_HITS_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "scan_hits.db")
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL NOT NULL,
+    start_hz INTEGER NOT NULL,
+    end_hz INTEGER NOT NULL,
+    step_hz REAL NOT NULL,
+    channel_bw REAL NOT NULL,
+    channels INTEGER NOT NULL,
+    sparse INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS scans_started ON scans (started);
+-- Channels covered by sparse scans (explicit channel lists), which the
+-- start/end range of the scans row would overstate
+CREATE TABLE IF NOT EXISTS scan_channels (
+    scan_id INTEGER NOT NULL REFERENCES scans (id),
+    freq_hz INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scan_channels_freq ON scan_channels (freq_hz);
+CREATE TABLE IF NOT EXISTS hits (
+    scan_id INTEGER NOT NULL REFERENCES scans (id),
+    time REAL NOT NULL,
+    freq_hz INTEGER NOT NULL,
+    power_db REAL NOT NULL,
+    snr_db REAL,
+    bandwidth_hz REAL,
+    name TEXT
+);
+CREATE INDEX IF NOT EXISTS hits_freq_time ON hits (freq_hz, time);
+CREATE INDEX IF NOT EXISTS hits_time ON hits (time);
+"""
+
+# Scans of each channel since `since`: full-range scans covering it plus
+# sparse scans that listed it
+_SCANS_OF_CHANNEL = """
+    (SELECT COUNT(*) FROM scans s
+        WHERE s.started >= :since AND NOT s.sparse AND s.start_hz <= h.freq_hz AND s.end_hz >= h.freq_hz)
+    + (SELECT COUNT(*) FROM scan_channels c JOIN scans s ON s.id = c.scan_id
+        WHERE s.started >= :since AND c.freq_hz = h.freq_hz)
+"""
+
+_names = sorted((ch["freq"], name) for name, ch in FREQUENCY_DB.items())
+_name_freqs = np.array([freq for freq, _ in _names])
+
+
+def match_name(freq_hz, tolerance):
+    """FREQUENCY_DB name of the entry closest to freq_hz within tolerance, or None."""
+    i = int(np.argmin(np.abs(_name_freqs - freq_hz)))
+    return _names[i][1] if abs(_name_freqs[i] - freq_hz) <= tolerance else None
+
+
+class HitStore:
+    """Scan results kept on disk in SQLite (WAL), for occupancy statistics.
+
+    Every scan is logged with the range it covered and all of its hits in
+    one transaction, so duty cycle (hits / scans that covered a channel),
+    time-of-day activity and last-heard times come from indexed queries.
+    WAL lets the web UI and the MCP server share the file. The file is
+    only opened on first use, so a module-level store costs nothing in
+    processes that never scan (e.g. spawned --shm workers).
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def _db(self):
+        # Callers hold self._lock
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def record_scan(self, channels, step, channel_bw, signals, started, finished=None, sparse=False):
+        """Log one scan over channels (Hz) and its signals; returns the scan id.
+
+        sparse marks a scan of an explicit channel list rather than a range.
+        Hits are named after the FREQUENCY_DB entry inside their channel.
+        """
+        channels = np.round(np.asarray(channels)).astype(np.int64)
+        finished = finished or time.time()
+        rows = [
+            (
+                started,
+                round(s["freq_hz"]),
+                s["power_db"],
+                s.get("snr_db"),
+                s.get("bandwidth_hz"),
+                match_name(s["freq_hz"], channel_bw / 2),
+            )
+            for s in signals
+        ]
+        with self._lock, self._db:
+            scan_id = self._db.execute(
+                "INSERT INTO scans (started, finished, start_hz, end_hz, step_hz, channel_bw, channels, sparse)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (started, finished, int(channels.min()), int(channels.max()), step, channel_bw,
+                 len(channels), int(sparse)),
+            ).lastrowid
+            if sparse:
+                self._db.executemany(
+                    "INSERT INTO scan_channels (scan_id, freq_hz) VALUES (?, ?)",
+                    ((scan_id, int(f)) for f in channels),
+                )
+            self._db.executemany(
+                "INSERT INTO hits (scan_id, time, freq_hz, power_db, snr_db, bandwidth_hz, name)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((scan_id, *row) for row in rows),
+            )
+        return scan_id
+
+    def _query(self, sql, params):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def channel_stats(self, hours=24.0, start_freq=None, end_freq=None, limit=50):
+        """Per-channel occupancy over the last hours, busiest first.
+
+        duty_cycle is the share of scans covering the channel that heard it.
+        """
+        rows = self._query(
+            f"""
+            SELECT h.freq_hz, MAX(h.name) AS name, COUNT(*) AS hits,
+                   MAX(h.time) AS last_heard, AVG(h.snr_db) AS mean_snr_db,
+                   MAX(h.power_db) AS max_power_db, {_SCANS_OF_CHANNEL} AS scans
+            FROM hits h
+            WHERE h.time >= :since AND h.freq_hz BETWEEN :lo AND :hi
+            GROUP BY h.freq_hz
+            ORDER BY CAST(hits AS REAL) / MAX(scans, 1) DESC, hits DESC
+            LIMIT :limit
+            """,
+            {
+                "since": time.time() - hours * 3600,
+                "lo": int(start_freq) if start_freq is not None else 0,
+                "hi": int(end_freq) if end_freq is not None else 1 << 62,
+                "limit": limit,
+            },
+        )
+        for row in rows:
+            row["freq_mhz"] = row["freq_hz"] / 1e6
+            row["duty_cycle"] = round(row["hits"] / max(row["scans"], 1), 3)
+            row["mean_snr_db"] = round(row["mean_snr_db"], 1) if row["mean_snr_db"] is not None else None
+        return rows
+
+    def activity_by_hour(self, start_freq=None, end_freq=None, days=7.0):
+        """Hits per local hour of day (0-23) over the last days."""
+        rows = self._query(
+            """
+            SELECT CAST(strftime('%H', time, 'unixepoch', 'localtime') AS INTEGER) AS hour,
+                   COUNT(*) AS hits
+            FROM hits
+            WHERE time >= :since AND freq_hz BETWEEN :lo AND :hi
+            GROUP BY hour
+            """,
+            {
+                "since": time.time() - days * 86400,
+                "lo": int(start_freq) if start_freq is not None else 0,
+                "hi": int(end_freq) if end_freq is not None else 1 << 62,
+            },
+        )
+        by_hour = {hour: 0 for hour in range(24)}
+        by_hour.update({row["hour"]: row["hits"] for row in rows})
+        return by_hour
+
+    def last_heard(self, limit=20):
+        """Most recently heard channels with their latest hit."""
+        rows = self._query(
+            """
+            SELECT h.freq_hz, h.name, h.time AS last_heard, h.power_db, h.snr_db
+            FROM hits h
+            JOIN (SELECT freq_hz, MAX(time) AS t FROM hits GROUP BY freq_hz) latest
+              ON latest.freq_hz = h.freq_hz AND latest.t = h.time
+            GROUP BY h.freq_hz
+            ORDER BY h.time DESC
+            LIMIT :limit
+            """,
+            {"limit": limit},
+        )
+        for row in rows:
+            row["freq_mhz"] = row["freq_hz"] / 1e6
+            row["ago_seconds"] = round(time.time() - row["last_heard"], 1)
+        return rows
+
+    def active_channels(self, start_freq, end_freq, hours=24.0, min_hits=1):
+        """Channel frequencies (Hz) in a range heard at least min_hits times lately."""
+        rows = self._query(
+            """
+            SELECT freq_hz FROM hits
+            WHERE time >= :since AND freq_hz BETWEEN :lo AND :hi
+            GROUP BY freq_hz HAVING COUNT(*) >= :min_hits
+            ORDER BY freq_hz
+            """,
+            {
+                "since": time.time() - hours * 3600,
+                "lo": int(start_freq),
+                "hi": int(end_freq),
+                "min_hits": min_hits,
+            },
+        )
+        return [float(row["freq_hz"]) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            scans, first = self._db.execute("SELECT COUNT(*), MIN(started) FROM scans").fetchone()
+            hits = self._db.execute("SELECT COUNT(*) FROM hits").fetchone()[0]
+        return {"path": self.path, "scans": scans, "hits": hits, "since": first}
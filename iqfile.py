@@ -0,0 +1,250 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from sdr import SDR, bytes_to_iq
+
+log = logging.getLogger("sdr.iqfile")
+
+# Sample format -> dtype of one I or Q lane
+FORMATS = {
+    "cu8": np.uint8,  # rtl_sdr's native output
+    "cs8": np.int8,
+    "cs16": np.int16,
+    "cf32": np.float32,
+}
+EXTENSIONS = {".cu8": "cu8", ".bin": "cu8", ".raw": "cu8", ".cs8": "cs8", ".cs16": "cs16", ".cf32": "cf32"}
+SIGMF_TYPES = {"cu8": "cu8", "ci8": "cs8", "ci16_le": "cs16", "cf32_le": "cf32"}
+
+
+def _sigmf_paths(path):
+    base = path
+    for ext in (".sigmf-meta", ".sigmf-data"):
+        if base.endswith(ext):
+            base = base[: -len(ext)]
+    meta, data = base + ".sigmf-meta", base + ".sigmf-data"
+    if os.path.exists(meta) and os.path.exists(data):
+        return meta, data
+    return None
+
+
+def read_metadata(path, fmt=None):
+    """(data_path, fmt, sample_rate, center_freq) for a capture file.
+
+    SigMF recordings (given as the .sigmf-meta, .sigmf-data or their common
+    base name) supply all of it; raw files only imply the format by
+    extension, and the rates come back as None.
+    """
+    sigmf = _sigmf_paths(path)
+    if sigmf:
+        meta_path, data_path = sigmf
+        with open(meta_path) as f:
+            meta = json.load(f)
+        datatype = meta["global"]["core:datatype"]
+        if datatype not in SIGMF_TYPES:
+            raise ValueError(f"Unsupported SigMF datatype {datatype} (have {list(SIGMF_TYPES)})")
+        captures = meta.get("captures") or [{}]
+        return (
+            data_path,
+            fmt or SIGMF_TYPES[datatype],
+            meta["global"].get("core:sample_rate"),
+            captures[0].get("core:frequency"),
+        )
+    if fmt is None:
+        fmt = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if fmt is None:
+            raise ValueError(f"Can't tell the sample format of {path}; pass fmt= one of {list(FORMATS)}")
+    return path, fmt, None, None
+
+
+class IQFileSource(SDR):
+    """SDR-compatible replay of a recorded capture, memory-mapped.
+
+    Serves read_samples, streaming and subscribers exactly like a live
+    dongle, so the demod/spectrum/scan pipeline runs unchanged without
+    hardware. cf32 captures are returned as zero-copy read-only views of
+    the map; other formats are converted into the caller's buffer. The
+    file's own sample rate and center frequency win over the values passed
+    to open(), and retunes are ignored.
+
+    loop restarts at the beginning at end of file (otherwise reads come up
+    short and streaming stops); realtime paces reads to the sample rate
+    instead of serving them as fast as possible.
+    """
+
+    def __init__(self, path, fmt=None, sample_rate=None, center_freq=None, loop=True, realtime=False):
+        super().__init__()
+        self.path = path
+        self.loop = loop
+        self.realtime = realtime
+        self.data_path, self.fmt, meta_rate, meta_freq = read_metadata(path, fmt)
+        if self.fmt not in FORMATS:
+            raise ValueError(f"Unknown sample format {self.fmt} (have {list(FORMATS)})")
+        self._file_rate = sample_rate or meta_rate
+        self._file_freq = center_freq or meta_freq
+        self._sample_rate = None
+        self._gain = None
+        self._data = None  # memory map of the I/Q lanes
+        self._samples = None  # complex64 view for cf32, else None
+        self.position = 0
+        self.num_samples = 0
+        self._served = 0
+        self._started = None
+        self._stop = threading.Event()
+
+    def open(self, sample_rate=2.048e6, center_freq=100e6, gain="auto", device_index=0):
+        lanes = np.memmap(self.data_path, dtype=FORMATS[self.fmt], mode="r")
+        self._data = lanes[: len(lanes) - len(lanes) % 2]
+        self._samples = self._data.view(np.complex64) if self.fmt == "cf32" else None
+        self.num_samples = len(self._data) // 2
+        self._sample_rate = self._file_rate or sample_rate
+        self._tuned_freq = self._file_freq or center_freq
+        self._gain = gain
+        self.position = 0
+        self._served = 0
+        self._started = None
+        # Truthy while open, like the RtlSdr handle
+        self.device = self.data_path
+        log.info(
+            f"Replaying {self.data_path}: {self.num_samples} {self.fmt} samples at "
+            f"{self._sample_rate / 1e6:.3f} MS/s, {self._tuned_freq / 1e6:.4f} MHz"
+        )
+
+    def close(self):
+        self.stop_stream()
+        self.ring = None
+        self._data = self._samples = None
+        self.device = None
+
+    @property
+    def duration(self):
+        return self.num_samples / self._sample_rate if self._sample_rate else 0.0
+
+    def seek(self, seconds=0.0):
+        self.position = min(int(seconds * self._sample_rate), self.num_samples)
+
+    # --- Streaming mode ---
+
+    def stop_stream(self):
+        if not self.streaming:
+            return
+        self._stop.set()
+        self._stream_thread.join(timeout=2)
+        self._stream_thread = None
+
+    def _stream_loop(self, ring):
+        self._stop.clear()
+        try:
+            while not self._stop.is_set():
+                slot = ring.next_slot()
+                if len(self._fill(slot)) < len(slot):
+                    break
+                ring.commit(self._tuned_freq)
+        finally:
+            ring.close()
+
+    # --- Reads ---
+
+    def _span(self, n):
+        """(start, stop) of the next contiguous run of up to n samples, or None at EOF."""
+        if self.position >= self.num_samples:
+            if not self.loop or self.num_samples == 0:
+                return None
+            self.position = 0
+        start = self.position
+        stop = min(start + n, self.num_samples)
+        self.position = stop
+        return start, stop
+
+    def _pace(self, n):
+        if not self.realtime:
+            return
+        if self._started is None:
+            self._started = time.monotonic()
+        self._served += n
+        delay = self._served / self._sample_rate - (time.monotonic() - self._started)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _convert(self, start, stop, out):
+        if self._samples is not None:
+            out[:] = self._samples[start:stop]
+            return
+        raw = self._data[2 * start:2 * stop]
+        if self.fmt == "cu8":
+            bytes_to_iq(raw, out)
+            return
+        scale = np.float32(1 / (1 << (8 * raw.itemsize - 1)))
+        np.multiply(raw, scale, out=out.view(np.float32), dtype=np.float32)
+
+    def _fill(self, out):
+        """Copy the next len(out) samples into out, wrapping if looping."""
+        filled = 0
+        while filled < len(out):
+            span = self._span(len(out) - filled)
+            if span is None:
+                break
+            start, stop = span
+            self._convert(start, stop, out[filled:filled + stop - start])
+            filled += stop - start
+        self._pace(filled)
+        return out[:filled]
+
+    def read_bytes(self, num_samples=256 * 1024):
+        """Raw interleaved uint8 I/Q; a view of the map for cu8 captures."""
+        if self.fmt == "cu8":
+            span = self._span(num_samples)
+            if span and span[1] - span[0] == num_samples:
+                self._pace(num_samples)
+                return self._data[2 * span[0]:2 * span[1]]
+            if span:
+                self.position = span[0]
+        iq = self._fill(np.empty(num_samples, dtype=np.complex64)).view(np.float32)
+        return np.clip(np.rint((iq + 1) * 127.5), 0, 255).astype(np.uint8)
+
+    def read_samples(self, num_samples=256 * 1024, out=None):
+        """Next num_samples as complex64; fewer only at end of a non-looping file.
+
+        cf32 captures come back as read-only views of the map unless out is
+        given or the read wraps around the end of the file.
+        """
+        if self.streaming:
+            return super().read_samples(num_samples, out)
+        if out is None and self._samples is not None:
+            span = self._span(num_samples)
+            if span and span[1] - span[0] == num_samples:
+                self._pace(num_samples)
+                return self._samples[span[0]:span[1]]
+            if span:
+                self.position = span[0]
+        if out is None:
+            out = np.empty(num_samples, dtype=np.complex64)
+        return self._fill(out[:num_samples])
+
+    @property
+    def center_freq(self):
+        return self._tuned_freq
+
+    @center_freq.setter
+    def center_freq(self, freq):
+        log.debug(f"Retune to {freq / 1e6:.4f} MHz ignored by file replay")
+
+    @property
+    def sample_rate(self):
+        return self._sample_rate
+
+    @sample_rate.setter
+    def sample_rate(self, rate):
+        log.debug(f"Sample rate change to {rate} ignored by file replay")
+
+    @property
+    def gain(self):
+        return self._gain
+
+    @gain.setter
+    def gain(self, value):
+        self._gain = value
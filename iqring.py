@@ -0,0 +1,144 @@
+import threading
+
+import numpy as np
+
+
+class IQRing:
+    """Fixed ring of preallocated complex64 blocks with one writer.
+
+    The capture thread fills next_slot() in place and commit()s it; any
+    number of Subscribers read the same gap-free stream at their own pace.
+    Blocks are handed out as views, valid until the writer laps them
+    (num_blocks - 1 blocks later).
+    """
+
+    def __init__(self, block_size=256 * 1024, num_blocks=32):
+        self.block_size = block_size
+        self.num_blocks = num_blocks
+        self.blocks = np.zeros((num_blocks, block_size), dtype=np.complex64)
+        # Tuning throughout each block's capture (NaN if it was retuned mid-block)
+        self.block_freq = np.zeros(num_blocks)
+        self.seq = 0  # blocks committed so far
+        self.closed = False
+        self._cond = threading.Condition()
+        self._subscribers = set()
+
+    def next_slot(self):
+        """Array the writer should fill next."""
+        return self.blocks[self.seq % self.num_blocks]
+
+    def commit(self, center_freq=0.0):
+        """Publish the block written into next_slot()."""
+        with self._cond:
+            self.block_freq[self.seq % self.num_blocks] = center_freq
+            self.seq += 1
+            self._cond.notify_all()
+
+    def close(self):
+        """Wake every reader; reads return None once they catch up."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def reopen(self):
+        """Accept writes again after close(), e.g. when streaming resumes."""
+        with self._cond:
+            self.closed = False
+
+    def subscribe(self, name=None):
+        """New reader starting at the next block to be committed."""
+        sub = Subscriber(self, name)
+        with self._cond:
+            self._subscribers.add(sub)
+        return sub
+
+    def _unsubscribe(self, sub):
+        with self._cond:
+            self._subscribers.discard(sub)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "block_size": self.block_size,
+                "num_blocks": self.num_blocks,
+                "blocks_written": self.seq,
+                "subscribers": [s.stats() for s in self._subscribers],
+            }
+
+
+class Subscriber:
+    """Independent read cursor into an IQRing."""
+
+    def __init__(self, ring, name=None):
+        self.ring = ring
+        self.name = name
+        self.cursor = ring.seq
+        self.overruns = 0
+        self.dropped_blocks = 0
+        self.center_freq = None  # tag of the last block returned
+        self._rest = None  # unread tail of the last block read_samples used
+
+    def read(self, timeout=1.0):
+        """Next block as a zero-copy view, or None on timeout or close.
+
+        If the writer lapped this reader, the backlog is skipped to the newest
+        block and counted as an overrun.
+        """
+        ring = self.ring
+        with ring._cond:
+            ready = ring._cond.wait_for(
+                lambda: ring.seq > self.cursor or ring.closed, timeout
+            )
+            if not ready or ring.seq <= self.cursor:
+                return None
+            behind = ring.seq - self.cursor
+            if behind >= ring.num_blocks:
+                self.overruns += 1
+                self.dropped_blocks += behind - 1
+                self.cursor = ring.seq - 1
+            slot = self.cursor % ring.num_blocks
+            self.center_freq = ring.block_freq[slot]
+            self.cursor += 1
+        return ring.blocks[slot]
+
+    def read_samples(self, num_samples, out=None, center_freq=None, timeout=1.0):
+        """Copy the next num_samples into one contiguous complex64 array.
+
+        With center_freq set, blocks captured at another tuning (still in
+        flight after a retune) are skipped. Returns fewer samples only if the
+        stream stops. Consecutive calls continue exactly where the last ended.
+        """
+        if out is None:
+            out = np.empty(num_samples, dtype=np.complex64)
+        filled = 0
+        while filled < num_samples:
+            block, self._rest = self._rest, None
+            if block is None:
+                block = self.read(timeout)
+                if block is None:
+                    break
+            if center_freq is not None and self.center_freq != center_freq:
+                continue
+            n = min(len(block), num_samples - filled)
+            out[filled:filled + n] = block[:n]
+            filled += n
+            if n < len(block):
+                self._rest = block[n:]
+        return out[:filled]
+
+    def close(self):
+        self.ring._unsubscribe(self)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "lag_blocks": self.ring.seq - self.cursor,
+            "overruns": self.overruns,
+            "dropped_blocks": self.dropped_blocks,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
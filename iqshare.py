@@ -0,0 +1,293 @@
+import logging
+import multiprocessing as mp
+import time
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from iqring import Subscriber
+
+log = logging.getLogger("sdr.iqshare")
+
+# Header slots (int64): num_blocks, block_size, committed sequence, closed flag
+_HEADER = 4
+# Readers poll the shared sequence number; a block lasts ~128 ms at 2 MS/s
+POLL_INTERVAL = 0.002
+
+
+class SharedIQRing:
+    """IQRing layout in a multiprocessing.shared_memory segment.
+
+    One process writes (same next_slot()/commit() interface as IQRing, so
+    SDR.start_stream can fill it directly); any process can attach by name
+    and read blocks in place. Each slot carries the sequence number of the
+    block it holds, so readers can tell when the writer has lapped them.
+    """
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.name = shm.name
+        self.owner = owner
+        self._header = np.ndarray((_HEADER,), dtype=np.int64, buffer=shm.buf)
+        self.num_blocks = int(self._header[0])
+        self.block_size = int(self._header[1])
+        offset = self._header.nbytes
+        self.slot_seq = np.ndarray((self.num_blocks,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += self.slot_seq.nbytes
+        self.block_freq = np.ndarray((self.num_blocks,), dtype=np.float64, buffer=shm.buf, offset=offset)
+        offset += self.block_freq.nbytes
+        self.blocks = np.ndarray(
+            (self.num_blocks, self.block_size), dtype=np.complex64, buffer=shm.buf, offset=offset
+        )
+
+    @classmethod
+    def create(cls, block_size=256 * 1024, num_blocks=32, name=None):
+        size = 8 * (_HEADER + 2 * num_blocks) + 8 * num_blocks * block_size
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        np.ndarray((_HEADER,), dtype=np.int64, buffer=shm.buf)[:] = (num_blocks, block_size, 0, 0)
+        ring = cls(shm, owner=True)
+        ring.slot_seq[:] = -1
+        return ring
+
+    @classmethod
+    def attach(cls, name):
+        # Only the creating process may unlink the segment
+        return cls(shared_memory.SharedMemory(name=name, track=False))
+
+    @property
+    def seq(self):
+        return int(self._header[2])
+
+    @property
+    def closed(self):
+        return bool(self._header[3])
+
+    # --- Writer side ---
+
+    def next_slot(self):
+        slot = self.seq % self.num_blocks
+        # Mark the slot torn until commit() so lapped readers notice
+        self.slot_seq[slot] = -1
+        return self.blocks[slot]
+
+    def commit(self, center_freq=0.0):
+        seq = self.seq
+        slot = seq % self.num_blocks
+        self.block_freq[slot] = center_freq
+        self.slot_seq[slot] = seq
+        self._header[2] = seq + 1
+
+    def close(self):
+        self._header[3] = 1
+
+    def reopen(self):
+        self._header[3] = 0
+
+    # --- Reader side ---
+
+    def subscribe(self, name=None):
+        return SharedSubscriber(self, name)
+
+    def _unsubscribe(self, sub):
+        pass
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "block_size": self.block_size,
+            "num_blocks": self.num_blocks,
+            "blocks_written": self.seq,
+        }
+
+    def release(self):
+        """Drop this process's mapping; the owner also unlinks the segment."""
+        self._header = self.slot_seq = self.block_freq = self.blocks = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # A subscriber still holds a block view; the mapping goes with it
+            log.warning(f"Shared ring {self.name} still referenced at release")
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedSubscriber(Subscriber):
+    """Subscriber over a SharedIQRing; polls instead of waiting on a condition."""
+
+    def __init__(self, ring, name=None):
+        super().__init__(ring, name)
+        self.last_seq = None
+
+    def read(self, timeout=1.0):
+        ring = self.ring
+        deadline = time.monotonic() + timeout
+        while ring.seq <= self.cursor:
+            if ring.closed or time.monotonic() > deadline:
+                return None
+            time.sleep(POLL_INTERVAL)
+        behind = ring.seq - self.cursor
+        if behind >= ring.num_blocks:
+            self.overruns += 1
+            self.dropped_blocks += behind - 1
+            self.cursor = ring.seq - 1
+        slot = self.cursor % ring.num_blocks
+        self.center_freq = ring.block_freq[slot]
+        self.last_seq = self.cursor
+        self.cursor += 1
+        return ring.blocks[slot]
+
+    def intact(self):
+        """True if the block last returned by read() hasn't been overwritten yet."""
+        slot = self.last_seq % self.ring.num_blocks
+        return int(self.ring.slot_seq[slot]) == self.last_seq
+
+    def read_samples(self, num_samples, out=None, center_freq=None, timeout=1.0):
+        """Subscriber.read_samples, dropping blocks the writer reused mid-copy.
+
+        Each copy is checked with intact() once it's done; a torn block (and
+        any unread tail of it) is discarded and counted as an overrun.
+        """
+        if out is None:
+            out = np.empty(num_samples, dtype=np.complex64)
+        filled = 0
+        while filled < num_samples:
+            block, self._rest = self._rest, None
+            if block is None:
+                block = self.read(timeout)
+                if block is None:
+                    break
+            if center_freq is not None and self.center_freq != center_freq:
+                continue
+            n = min(len(block), num_samples - filled)
+            out[filled:filled + n] = block[:n]
+            if not self.intact():
+                self.overruns += 1
+                self.dropped_blocks += 1
+                continue
+            filled += n
+            if n < len(block):
+                self._rest = block[n:]
+        return out[:filled]
+
+
+def _capture_main(ring_name, sample_rate, center_freq, gain, device_index, control):
+    """Capture process: owns the SDR and streams it into the shared ring."""
+    from sdr import SDR
+
+    ring = SharedIQRing.attach(ring_name)
+    radio = SDR()
+    try:
+        radio.open(
+            sample_rate=sample_rate, center_freq=center_freq, gain=gain, device_index=device_index
+        )
+        radio.start_stream(ring=ring)
+        while True:
+            cmd, value = control.get()
+            if cmd == "stop":
+                break
+            if cmd == "center_freq":
+                radio.center_freq = value
+            elif cmd == "gain":
+                radio.gain = value
+    except (OSError, RuntimeError) as e:
+        log.error(f"Capture process failed: {e}")
+    finally:
+        radio.close()
+        ring.close()
+        ring.release()
+
+
+class SharedSDR:
+    """SDR-compatible front for a capture process that owns the dongle.
+
+    open() creates a SharedIQRing and spawns the capture process streaming
+    into it; tuning and gain go to that process over a control queue.
+    Readers in any process attach with SharedIQRing.attach(radio.ring.name)
+    and read blocks in place, so DSP can run on other cores.
+    """
+
+    def __init__(self, block_size=256 * 1024, num_blocks=32):
+        # spawn: the parent runs asyncio/uvicorn threads that must not be forked
+        self.ctx = mp.get_context("spawn")
+        self.block_size = block_size
+        self.num_blocks = num_blocks
+        self.device = None  # the capture process while open
+        self.ring = None
+        self._control = None
+        self._center_freq = None
+        self._sample_rate = None
+        self._gain = None
+
+    def open(self, sample_rate=2.048e6, center_freq=100e6, gain="auto", device_index=0):
+        self.ring = SharedIQRing.create(self.block_size, self.num_blocks)
+        self._control = self.ctx.Queue()
+        self._sample_rate = sample_rate
+        self._center_freq = center_freq
+        self._gain = gain
+        self.device = self.ctx.Process(
+            target=_capture_main,
+            args=(self.ring.name, sample_rate, center_freq, gain, device_index, self._control),
+            daemon=True,
+            name="sdr-capture",
+        )
+        self.device.start()
+        log.info(f"Capture process {self.device.pid} streaming into {self.ring.name}")
+
+    def close(self):
+        if self.device is None:
+            return
+        if self.device.is_alive():
+            self._control.put(("stop", None))
+            self.device.join(timeout=3)
+            if self.device.is_alive():
+                self.device.terminate()
+        self.device = None
+        self.ring.close()
+        self.ring.release()
+        self.ring = None
+
+    @property
+    def streaming(self):
+        return self.device is not None and self.device.is_alive()
+
+    def start_stream(self, block_size=None, num_blocks=None):
+        """Always streaming while open; kept for SDR compatibility."""
+        return self.ring
+
+    def stop_stream(self):
+        pass
+
+    @contextmanager
+    def paused_stream(self):
+        # The capture process can't serve synchronous reads; scans read the ring
+        yield
+
+    def subscribe(self, name=None):
+        return self.ring.subscribe(name)
+
+    def read_samples(self, num_samples=256 * 1024, out=None):
+        with self.subscribe("read_samples") as sub:
+            return sub.read_samples(num_samples, out, center_freq=self._center_freq)
+
+    @property
+    def center_freq(self):
+        return self._center_freq
+
+    @center_freq.setter
+    def center_freq(self, freq):
+        self._center_freq = freq
+        self._control.put(("center_freq", freq))
+
+    @property
+    def sample_rate(self):
+        return self._sample_rate
+
+    @property
+    def gain(self):
+        return self._gain
+
+    @gain.setter
+    def gain(self, value):
+        self._gain = value
+        self._control.put(("gain", value))
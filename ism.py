@@ -17,12 +17,13 @@ class ISMDecoder:
         self.process = None
         self.active = False
         self.frequency = None
+        self.device_index = None
         self._events = []
         self._events_lock = threading.Lock()
         self._stdout_thread = None
         self._has_rtl_433 = shutil.which("rtl_433") is not None
 
-    def start(self, frequency_hz=433.92e6, gain="auto"):
+    def start(self, frequency_hz=433.92e6, gain="auto", device_index=0):
         if self.active:
             self.stop()
 
@@ -30,9 +31,11 @@ class ISMDecoder:
             raise RuntimeError("rtl_433 not found. Install with: brew install rtl_433")
 
         self.frequency = frequency_hz
+        self.device_index = device_index
 
         cmd = [
             "rtl_433",
+            "-d", str(device_index),
             "-f", str(int(frequency_hz)),
             "-F", "json",
         ]
@@ -89,6 +92,7 @@ class ISMDecoder:
                     pass
             self.process = None
         self.frequency = None
+        self.device_index = None
 
     def get_status(self):
         alive = self.process is not None and self.process.poll() is None
@@ -97,6 +101,7 @@ class ISMDecoder:
             "has_rtl_433": self._has_rtl_433,
             "frequency_hz": self.frequency,
             "frequency_mhz": round(self.frequency / 1e6, 4) if self.frequency else None,
+            "device_index": self.device_index,
             "pid": self.process.pid if self.process and alive else None,
             "event_count": len(self._events),
         }
@@ -20,13 +20,14 @@ class PagerDecoder:
         self.active = False
         self.frequency = None
         self.decoders = None
+        self.device_index = None
         self._messages = []
         self._messages_lock = threading.Lock()
         self._stdout_thread = None
         self._has_multimon = shutil.which("multimon-ng") is not None
         self._has_rtl_fm = shutil.which("rtl_fm") is not None
 
-    def start(self, frequency_hz, decoders=None, gain="auto", squelch=0):
+    def start(self, frequency_hz, decoders=None, gain="auto", squelch=0, device_index=0):
         if self.active:
             self.stop()
 
@@ -37,9 +38,11 @@ class PagerDecoder:
 
         self.frequency = frequency_hz
         self.decoders = decoders or DEFAULT_DECODERS
+        self.device_index = device_index
 
         rtl_cmd = [
             "rtl_fm",
+            "-d", str(device_index),
             "-f", str(int(frequency_hz)),
             "-M", "fm",
             "-s", "22050",
@@ -119,6 +122,7 @@ class PagerDecoder:
         self.mm_process = None
         self.frequency = None
         self.decoders = None
+        self.device_index = None
 
     def get_status(self):
         mm_alive = self.mm_process is not None and self.mm_process.poll() is None
@@ -130,6 +134,7 @@ class PagerDecoder:
             "frequency_hz": self.frequency,
             "frequency_mhz": round(self.frequency / 1e6, 4) if self.frequency else None,
             "decoders": self.decoders,
+            "device_index": self.device_index,
             "rtl_pid": self.rtl_process.pid if self.rtl_process and rtl_alive else None,
             "mm_pid": self.mm_process.pid if self.mm_process and mm_alive else None,
             "message_count": len(self._messages),
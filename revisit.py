@@ -0,0 +1,175 @@
+import re
+import time
+from collections import deque
+
+import numpy as np
+
+from bands import FREQUENCY_DB
+from scanner import (
+    CHANNEL_BW,
+    NARROW_BW,
+    SETTLE_SAMPLES,
+    measure_channels,
+    plan_hops,
+    scan_fft_size,
+    scan_plan,
+)
+
+# Revisit interval by phonebook name/description, first match wins
+REVISIT_RULES = [
+    # (pattern, seconds between looks)
+    (r"fire|sheriff|ems|police|pd_|dispatch|distress", 0.5),
+    (r"ema|jail|hospital|wildlife|bureau", 1.0),
+    (r"noaa", 10.0),
+    (r"repeater|aprs", 5.0),
+]
+DEFAULT_INTERVAL = 2.0
+
+
+def revisit_interval(name, entry=None):
+    """Seconds between looks at a phonebook channel, from REVISIT_RULES."""
+    entry = entry or FREQUENCY_DB.get(name, {})
+    text = f"{name} {entry.get('description', '')}"
+    for pattern, interval in REVISIT_RULES:
+        if re.search(pattern, text, re.IGNORECASE):
+            return interval
+    return DEFAULT_INTERVAL
+
+
+class RevisitScheduler:
+    """Revisits phonebook channels by priority, a whole tuning window at a time.
+
+    Channels are grouped into as few windows as fit the usable span (the
+    same grouping as scanner hops), and every visit measures all channels
+    of a window from one capture. The next window is the one holding the
+    channel whose revisit is due soonest (earliest deadline first), so
+    short-interval channels like fire dispatch get looked at more often
+    while slower ones ride along whenever their window comes up.
+
+    Revisit gaps are kept per channel for latency statistics; events logs
+    each channel going active (SNR over snr_db against the CFAR floor).
+    """
+
+    def __init__(self, sdr, names=None, intervals=None, dwell_ms=20, snr_db=10.0,
+                 settle_samples=SETTLE_SAMPLES):
+        names = list(names or FREQUENCY_DB)
+        names.sort(key=lambda n: FREQUENCY_DB[n]["freq"])
+        intervals = intervals or {}
+        self.sdr = sdr
+        self.names = names
+        self.freqs = np.array([FREQUENCY_DB[n]["freq"] for n in names])
+        self.intervals = np.array([intervals.get(n) or revisit_interval(n) for n in names])
+        self.channel_bw = max(CHANNEL_BW.get(FREQUENCY_DB[n]["protocol"], NARROW_BW) for n in names)
+        self.sample_rate = sdr.sample_rate
+        self.fft_size = scan_fft_size(self.sample_rate, self.channel_bw)
+        self.samples_per_dwell = max(int(self.sample_rate * dwell_ms / 1000), self.fft_size)
+        self.settle_samples = settle_samples
+        self.snr_db = snr_db
+        self.windows = plan_hops(self.freqs, self.channel_bw, self.sample_rate)
+
+        n = len(names)
+        self.last_visit = np.full(n, -np.inf)
+        self.visits = np.zeros(n, dtype=int)
+        self.late = np.zeros(n, dtype=int)
+        self.gaps = [deque(maxlen=512) for _ in range(n)]
+        self.power_db = np.full(n, np.nan)
+        self.snr = np.full(n, np.nan)
+        self.active = np.zeros(n, dtype=bool)
+        self.events = []
+        self.window_visits = 0
+        # Running mean of a visit's duration, so visits start early enough
+        # to land within the interval rather than just after it
+        self.visit_seconds = 0.0
+        self._buf = np.empty(self.samples_per_dwell, dtype=np.complex64)
+        self._settle = np.empty(settle_samples, dtype=np.complex64)
+
+    def next_window(self):
+        """(index of the window to visit next, seconds until it is due)."""
+        due = self.last_visit + self.intervals - self.visit_seconds
+        first = int(np.argmin(due))
+        for w, (_, hop) in enumerate(self.windows):
+            if hop.start <= first < hop.stop:
+                return w, max(0.0, due[first] - time.monotonic())
+
+    def visit(self, w):
+        """Tune to window w and measure all of its channels from one capture."""
+        center, hop = self.windows[w]
+        started = time.monotonic()
+        self.sdr.center_freq = center
+        # Measure against where the tuner actually is (a replayed file keeps its own center)
+        center = self.sdr.center_freq
+        if self.settle_samples:
+            self.sdr.read_samples(self.settle_samples, out=self._settle)
+        iq = self.sdr.read_samples(self.samples_per_dwell, out=self._buf)
+        now = time.monotonic()
+        if len(iq) < self.fft_size:
+            return
+        plan = scan_plan(self.fft_size, self.sample_rate)
+        self.power_db[hop], self.snr[hop] = measure_channels(iq, plan, self.freqs[hop] - center, self.channel_bw)
+
+        seen = np.isfinite(self.last_visit[hop])
+        gaps = now - self.last_visit[hop]
+        for i, gap in zip(np.arange(hop.start, hop.stop)[seen], gaps[seen]):
+            self.gaps[i].append(gap)
+        self.late[hop] += seen & (gaps > self.intervals[hop] * 1.5)
+        self.last_visit[hop] = now
+        self.visits[hop] += 1
+        self.window_visits += 1
+        self.visit_seconds += 0.2 * (now - started - self.visit_seconds)
+
+        active = self.snr[hop] > self.snr_db
+        for i in np.arange(hop.start, hop.stop)[active & ~self.active[hop]]:
+            self.events.append(
+                {
+                    "time": time.time(),
+                    "name": self.names[i],
+                    "freq_mhz": float(self.freqs[i]) / 1e6,
+                    "power_db": round(float(self.power_db[i]), 1),
+                    "snr_db": round(float(self.snr[i]), 1),
+                }
+            )
+        self.active[hop] = active
+
+    def run(self, duration, stop=None):
+        """Visit windows as they fall due for duration seconds (or until stop is set)."""
+        end = time.monotonic() + duration
+        while time.monotonic() < end and not (stop and stop.is_set()):
+            w, wait = self.next_window()
+            if wait:
+                time.sleep(min(wait, end - time.monotonic(), 0.05))
+                continue
+            self.visit(w)
+
+    def latency_stats(self):
+        """Per-channel revisit gaps against the target interval.
+
+        late counts gaps over 1.5x the interval.
+        """
+        stats = []
+        for i, name in enumerate(self.names):
+            gaps = np.array(self.gaps[i])
+            stats.append(
+                {
+                    "name": name,
+                    "freq_mhz": float(self.freqs[i]) / 1e6,
+                    "interval_s": float(self.intervals[i]),
+                    "visits": int(self.visits[i]),
+                    "mean_gap_s": round(float(gaps.mean()), 3) if len(gaps) else None,
+                    "p95_gap_s": round(float(np.percentile(gaps, 95)), 3) if len(gaps) else None,
+                    "max_gap_s": round(float(gaps.max()), 3) if len(gaps) else None,
+                    "late": int(self.late[i]),
+                    "power_db": round(float(self.power_db[i]), 1) if self.visits[i] else None,
+                    "snr_db": round(float(self.snr[i]), 1) if self.visits[i] else None,
+                    "active": bool(self.active[i]),
+                }
+            )
+        return stats
+
+    def window_summary(self):
+        return [
+            {
+                "center_mhz": center / 1e6,
+                "channels": self.names[hop],
+            }
+            for center, hop in self.windows
+        ]
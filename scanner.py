@@ -1,28 +1,365 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
+from detect import find_detections, noise_floor_db
+from spectrum import engine
+
+# Share of the capture span clear of the dongle's anti-alias roll-off
+USABLE_FRACTION = 0.8
+# Samples dropped after each retune while the PLL locks and transfers
+# queued at the old frequency drain (8 ms at 2.048 MS/s)
+SETTLE_SAMPLES = 16384
+# Occupied bandwidth assumed for phonebook channels: NARROW_BW unless
+# their protocol is listed in CHANNEL_BW
+NARROW_BW = 12.5e3
+CHANNEL_BW = {"analog_wfm": 200e3}
+# Share of the dwell read first to decide whether a hop is worth the rest
+PROBE_FRACTION = 0.25
+# Blackman-Harris sidelobes (-92 dB) keep strong carriers out of their
+# neighbours' channels, where the display's Hann would leak
+SCAN_WINDOW = "blackmanharris"
+TIMING_PHASES = ("tune_ms", "settle_ms", "wait_ms", "read_ms", "probe_ms", "compute_ms")
+
+
+def channel_raster(start_freq, end_freq, step):
+    """Channel centers from start_freq to end_freq inclusive, step apart."""
+    count = int(np.floor((end_freq - start_freq) / step + 1e-9)) + 1
+    return start_freq + step * np.arange(max(count, 0))
 
-def scan_range(sdr, start_freq, end_freq, step=25e3, threshold_db=-30, dwell_ms=50):
-    """Scan frequency range and return signals above threshold.
 
-    Returns list of {freq_hz, freq_mhz, power_db} sorted by power descending.
+def plan_hops(channels, channel_bw, sample_rate, usable=USABLE_FRACTION):
+    """Group sorted channel centers into hops: list of (center_freq, slice).
+
+    Each hop covers as many channels as fit whole inside the usable part of
+    one capture, tuned a quarter channel above the middle of its first and
+    last channel so no channel centre sits on the DC bin.
     """
+    span = usable * sample_rate - 1.5 * channel_bw
+    if span < 0:
+        raise ValueError(f"Channel bandwidth {channel_bw / 1e3:.1f} kHz exceeds the usable span")
+    hops = []
+    i = 0
+    while i < len(channels):
+        j = int(np.searchsorted(channels, channels[i] + span, side="right"))
+        hops.append((float(channels[i] + channels[j - 1]) / 2 + channel_bw / 4, slice(i, j)))
+        i = j
+    return hops
+
+
+def scan_fft_size(sample_rate, channel_bw):
+    """Power-of-two FFT size giving at least 8 bins per channel.
+
+    Narrower bins keep the window's main lobe inside the channel, so a
+    strong carrier doesn't light up its neighbours.
+    """
+    return max(256, 1 << int(np.ceil(np.log2(8 * sample_rate / channel_bw))))
+
+
+def scan_plan(fft_size, sample_rate):
+    """Blackman-Harris plan from the shared engine, with its axis at baseband.
+
+    Its axis is offsets from the capture center, so every hop of a scan
+    reuses one cached plan (a plan per hop center would churn the engine's
+    cache and evict the display's); channels are measured at their offset
+    from the hop's center.
+    """
+    return engine.plan(fft_size, sample_rate, 0.0, SCAN_WINDOW)
+
+
+def hop_power(iq, plan):
+    """Welch-averaged linear power of every frame of one capture, by bin.
+
+    The dongle's DC offset is subtracted first, since the window spreads it
+    over a few bins either side, and what's left in the DC bin is replaced
+    by its neighbours' mean so LO leakage doesn't read as a carrier.
+    """
+    power = engine.power(iq - iq.mean(), plan, averages=0)
+    mid = plan.fft_size // 2
+    power[mid] = 0.5 * (power[mid - 1] + power[mid + 1])
+    return power
+
+
+def channel_bins(plan, channels, channel_bw):
+    """(lo, hi) bin bounds of each channel: the bins in [f - bw/2, f + bw/2)."""
+    n = plan.fft_size
+    bin_hz = plan.sample_rate / n
+    offsets = (np.asarray(channels) - plan.center_freq) / bin_hz + n // 2
+    half = channel_bw / 2 / bin_hz
+    lo = np.clip(np.ceil(offsets - half).astype(int), 0, n)
+    hi = np.clip(np.ceil(offsets + half).astype(int), 0, n)
+    return lo, hi
+
+
+def channel_power(power, plan, channels, channel_bw):
+    """Sum of per-bin linear power over each channel, in the units of mean |iq|^2."""
+    lo, hi = channel_bins(plan, channels, channel_bw)
+    cumulative = np.concatenate(([0.0], np.cumsum(power, dtype=np.float64)))
+    # Parseval: the bins of a full frame sum to n * sum(w^2) * mean |iq|^2
+    norm = plan.fft_size * float(np.sum(np.square(plan.window, dtype=np.float64)))
+    return (cumulative[hi] - cumulative[lo]) / norm
+
+
+def measure_channels(iq, plan, channels, channel_bw):
+    """(power_db, snr_db) of each channel in one capture, SNR against the CFAR floor.
+
+    channels are on plan's axis: offsets from the capture center for a scan_plan.
+    """
+    power = hop_power(iq, plan)
+    floor_db = noise_floor_db(10 * np.log10(power + 1e-20))
+    signal = channel_power(power, plan, channels, channel_bw)
+    noise = channel_power(10 ** (floor_db / 10), plan, channels, channel_bw)
+    return 10 * np.log10(signal + 1e-10), 10 * np.log10((signal + 1e-20) / (noise + 1e-20))
+
+
+def _ms_since(t0):
+    return round((time.perf_counter() - t0) * 1e3, 2)
+
+
+class HopScan:
+    """Pipelined hop scan over a channel raster.
+
+    The calling thread retunes and reads the next hop while a worker thread
+    analyses the previous capture (two buffers alternate between them), so
+    a hop costs the slower of I/O and compute rather than their sum. After
+    each retune settle_samples are read and dropped instead of sitting out
+    a fixed dwell.
+
+    Each hop first reads probe_fraction of the dwell and runs a CFAR check
+    on it; the rest of the dwell is only read if some bin stands snr_db
+    above the local noise floor, so empty hops cost a fraction of a dwell.
+    channels, if given, replaces the raster with an explicit list of channel
+    centers (hops then only go where those are).
+
+    Every channel gets its power and the CFAR noise power in its bandwidth;
+    detections collects the CFAR detections of all hops. timings gets one
+    dict per hop with tune, settle, wait (for the worker to free a buffer),
+    read, probe and compute times in ms.
+    """
+
+    def __init__(self, sdr, start_freq, end_freq, step=25e3, dwell_ms=50, channel_bw=None,
+                 settle_samples=SETTLE_SAMPLES, snr_db=10.0, probe_fraction=PROBE_FRACTION,
+                 channels=None):
+        self.sdr = sdr
+        self.channel_bw = channel_bw or step
+        if channels is not None:
+            self.channels = np.sort(np.asarray(channels, dtype=np.float64))
+        else:
+            self.channels = channel_raster(start_freq, end_freq, step)
+        self.sample_rate = sdr.sample_rate
+        self.fft_size = scan_fft_size(self.sample_rate, self.channel_bw)
+        self.samples_per_dwell = max(int(self.sample_rate * dwell_ms / 1000), self.fft_size)
+        self.probe_samples = min(
+            max(int(self.samples_per_dwell * probe_fraction), 8 * self.fft_size), self.samples_per_dwell
+        ) if probe_fraction else self.samples_per_dwell
+        self.settle_samples = settle_samples
+        self.snr_db = snr_db
+        self.hops = plan_hops(self.channels, self.channel_bw, self.sample_rate)
+        self.power_db = np.full(len(self.channels), np.nan)
+        self.noise_db = np.full(len(self.channels), np.nan)
+        self.detections = []
+        self.timings = []
+        self.elapsed = 0.0
+
+    def _spectrum(self, iq, center, hop):
+        """Linear bin power, CFAR floor in dB and the bin range the hop's channels cover."""
+        plan = scan_plan(self.fft_size, self.sample_rate)
+        power = hop_power(iq, plan)
+        lo, hi = channel_bins(plan, self.channels[hop] - center, self.channel_bw)
+        return plan, power, noise_floor_db(10 * np.log10(power + 1e-20)), slice(lo[0], hi[-1])
+
+    def _occupied(self, iq, center, hop):
+        _, power, floor_db, span = self._spectrum(iq, center, hop)
+        return bool(np.any(10 * np.log10(power[span] + 1e-20) - floor_db[span] > self.snr_db))
+
+    def _analyse(self, iq, center, hop, timing):
+        t0 = time.perf_counter()
+        plan, power, floor_db, span = self._spectrum(iq, center, hop)
+        channels = self.channels[hop] - center
+        self.power_db[hop] = 10 * np.log10(channel_power(power, plan, channels, self.channel_bw) + 1e-10)
+        noise = channel_power(10 ** (floor_db / 10), plan, channels, self.channel_bw)
+        self.noise_db[hop] = 10 * np.log10(noise + 1e-10)
+        self.detections.extend(
+            find_detections(
+                plan.freqs_mhz[span] * 1e6 + center, 10 * np.log10(power[span] + 1e-20), floor_db[span], self.snr_db
+            )
+        )
+        timing["compute_ms"] = _ms_since(t0)
+
+    def iter_hops(self):
+        """Scan hop by hop, yielding (index, center, channel slice) as each hop is analysed.
+
+        A hop's results (power_db, noise_db, detections) are filled in by
+        the time it is yielded; the next hop is already being read, so the
+        pipeline keeps going while the caller handles it. Closing the
+        generator stops the scan after the hop in flight.
+        """
+        buffers = [np.empty(self.samples_per_dwell, dtype=np.complex64) for _ in range(2)]
+        settle = np.empty(self.settle_samples, dtype=np.complex64)
+        previous = None
+        submitted = 0
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="scan") as worker:
+                for i, (center, hop) in enumerate(self.hops):
+                    t0 = time.perf_counter()
+                    self.sdr.center_freq = center
+                    # The tuner's actual center (a replayed file keeps its own)
+                    center = self.sdr.center_freq
+                    timing = {"center_mhz": center / 1e6, "tune_ms": _ms_since(t0)}
+                    self.timings.append(timing)
+                    t0 = time.perf_counter()
+                    if self.settle_samples:
+                        self.sdr.read_samples(self.settle_samples, out=settle)
+                    timing["settle_ms"] = _ms_since(t0)
+                    # Free since the capture before last was yielded
+                    buf = buffers[submitted % 2]
+                    t0 = time.perf_counter()
+                    iq = self.sdr.read_samples(self.probe_samples, out=buf[:self.probe_samples])
+                    timing["read_ms"] = _ms_since(t0)
+                    if len(iq) < self.fft_size:
+                        continue
+                    if len(iq) < self.samples_per_dwell:
+                        t0 = time.perf_counter()
+                        timing["occupied"] = self._occupied(iq, center, hop)
+                        timing["probe_ms"] = _ms_since(t0)
+                        if timing["occupied"]:
+                            t0 = time.perf_counter()
+                            rest = self.sdr.read_samples(
+                                self.samples_per_dwell - len(iq), out=buf[len(iq):]
+                            )
+                            iq = buf[:len(iq) + len(rest)]
+                            timing["read_ms"] += _ms_since(t0)
+                    future = worker.submit(self._analyse, iq, center, hop, timing)
+                    submitted += 1
+                    if previous is not None:
+                        t0 = time.perf_counter()
+                        previous[0].result()
+                        timing["wait_ms"] = _ms_since(t0)
+                        yield previous[1:]
+                    previous = (future, i, center, hop)
+                if previous is not None:
+                    previous[0].result()
+                    yield previous[1:]
+        finally:
+            self.elapsed = time.perf_counter() - started
+            self.detections.sort(key=lambda d: d["snr_db"], reverse=True)
+
+    def run(self):
+        """Scan every hop; returns power_db per channel (NaN where a read came up short)."""
+        for _ in self.iter_hops():
+            pass
+        return self.power_db
+
+    def summary(self):
+        """Totals and mean per-hop phase times of the last run()."""
+        return {
+            "channels": len(self.channels),
+            "hops": len(self.hops),
+            "fft_size": self.fft_size,
+            "samples_per_hop": self.settle_samples + self.samples_per_dwell,
+            "hops_probed_empty": sum(1 for t in self.timings if t.get("occupied") is False),
+            "seconds": round(self.elapsed, 3),
+            "hops_per_second": round(len(self.timings) / self.elapsed, 1) if self.elapsed else 0.0,
+            "mean_ms": {
+                phase: round(float(np.mean([t.get(phase, 0.0) for t in self.timings])), 2)
+                for phase in TIMING_PHASES
+            } if self.timings else {},
+        }
+
+
+def _matching_detection(detections, freq, channel_bw):
+    """Strongest detection centred inside the channel at freq, or None."""
+    inside = [d for d in detections if abs(d["freq_hz"] - freq) <= channel_bw / 2]
+    return max(inside, key=lambda d: d["snr_db"], default=None)
+
+
+def _hop_signals(scan, hop, threshold_db, snr_db):
+    """Active channels of one analysed hop, as scan_range result dicts."""
+    power_db = scan.power_db[hop]
+    snr = power_db - scan.noise_db[hop]
+    active = power_db > threshold_db if threshold_db is not None else snr > snr_db
+    signals = []
+    for i in np.flatnonzero(active):
+        freq = float(scan.channels[hop][i])
+        detection = _matching_detection(scan.detections, freq, scan.channel_bw)
+        signals.append(
+            {
+                "freq_hz": freq,
+                "freq_mhz": freq / 1e6,
+                "power_db": round(float(power_db[i]), 1),
+                "noise_db": round(float(scan.noise_db[hop][i]), 1),
+                "snr_db": round(float(snr[i]), 1),
+                "bandwidth_hz": detection["bandwidth_hz"] if detection else None,
+            }
+        )
+    return signals
+
+
+def iter_scan(sdr, start_freq, end_freq, step=25e3, threshold_db=None, dwell_ms=50, channel_bw=None,
+              settle_samples=SETTLE_SAMPLES, snr_db=10.0, channels=None, store=None):
+    """scan_range one hop at a time: yields a progress dict as each hop is analysed.
+
+    Each has hop (1-based) of hops, the hop's center and channel range in
+    MHz, and the active channels found in it ("signals", same dicts as
+    scan_range). Closing the generator cancels the scan after the hop in
+    flight; store still gets the hops that completed, logged as a scan of
+    just their channels.
+    """
+    started = time.time()
+    scan = HopScan(
+        sdr, start_freq, end_freq, step, dwell_ms, channel_bw, settle_samples, snr_db, channels=channels
+    )
+    if not len(scan.channels):
+        return
     signals = []
-    freq = start_freq
-    samples_per_dwell = int(sdr.sample_rate * dwell_ms / 1000)
-
-    while freq <= end_freq:
-        sdr.center_freq = freq
-        iq = sdr.read_samples(samples_per_dwell)
-        power_db = 10 * np.log10(np.mean(np.abs(iq) ** 2) + 1e-10)
-
-        if power_db > threshold_db:
-            signals.append(
-                {
-                    "freq_hz": freq,
-                    "freq_mhz": freq / 1e6,
-                    "power_db": round(power_db, 1),
-                }
+    measured = 0  # hops run in order, so the channels measured are a prefix
+    try:
+        for i, center, hop in scan.iter_hops():
+            hop_signals = _hop_signals(scan, hop, threshold_db, snr_db)
+            signals.extend(hop_signals)
+            measured = hop.stop
+            yield {
+                "hop": i + 1,
+                "hops": len(scan.hops),
+                "center_mhz": center / 1e6,
+                "start_mhz": float(scan.channels[hop][0]) / 1e6,
+                "end_mhz": float(scan.channels[hop][-1]) / 1e6,
+                "signals": hop_signals,
+            }
+    finally:
+        if store is not None and measured:
+            store.record_scan(
+                scan.channels[:measured], step, scan.channel_bw, signals, started, sparse=channels is not None
             )
-        freq += step
 
+
+def scan_range(sdr, start_freq, end_freq, step=25e3, threshold_db=None, dwell_ms=50, channel_bw=None,
+               settle_samples=SETTLE_SAMPLES, snr_db=10.0, channels=None, store=None):
+    """Scan frequency range and return active channels.
+
+    Channels sit every step from start_freq to end_freq, each channel_bw
+    wide (default: step). Rather than retuning per channel, the dongle hops
+    by the usable span and one Welch FFT per hop measures every channel in
+    it, so power_db is the power inside that channel alone. Hops run
+    pipelined through HopScan; iter_scan has the results hop by hop.
+
+    A channel is active when its power is snr_db over the CFAR noise floor
+    in the same bandwidth, which holds at any gain setting; threshold_db
+    switches to a fixed absolute power threshold instead.
+
+    channels restricts the scan to a list of channel centers (e.g. those
+    with recent activity); store is a hits.HitStore the scan and its
+    results are logged to.
+
+    Returns list of {freq_hz, freq_mhz, power_db, noise_db, snr_db,
+    bandwidth_hz} sorted by power descending; bandwidth_hz is the occupied
+    bandwidth of the CFAR detection in the channel (None if there isn't one).
+    """
+    hops = iter_scan(
+        sdr, start_freq, end_freq, step, threshold_db, dwell_ms, channel_bw, settle_samples, snr_db,
+        channels, store,
+    )
+    signals = [signal for progress in hops for signal in progress["signals"]]
     return sorted(signals, key=lambda s: s["power_db"], reverse=True)
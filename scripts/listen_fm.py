@@ -3,8 +3,10 @@ import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import numpy as np
+
 from sdr import SDR
-from demod import fm_demod
+from demod import FMDemodulator
 from audio import AudioPlayer
 
 
@@ -23,11 +25,15 @@ def main():
     # Discard first read (AGC settling)
     radio.read_samples(256 * 1024)
 
+    demod = FMDemodulator(sample_rate=2.048e6, audio_rate=48000)
+
+    buf = np.empty(256 * 1024, dtype=np.complex64)
+
     print(f"Listening... Press Ctrl+C to stop.")
     try:
         while True:
-            iq = radio.read_samples(256 * 1024)
-            audio = fm_demod(iq, sample_rate=2.048e6, audio_rate=48000)
+            iq = radio.read_samples(256 * 1024, out=buf)
+            audio = demod.process(iq)
             player.play(audio)
     except KeyboardInterrupt:
         print("\nStopping...")
@@ -25,7 +25,7 @@ def main():
     radio.open(sample_rate=2.048e6, center_freq=start, gain="auto")
 
     print(f"Scanning {start / 1e6:.3f} - {end / 1e6:.3f} MHz (step: {step / 1e3:.1f} kHz)...")
-    signals = scan_range(radio, start, end, step=step)
+    signals = scan_range(radio, start, end, step=step, channel_bw=step)
 
     if signals:
         print(f"\nFound {len(signals)} signals:")
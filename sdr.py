@@ -1,52 +1,315 @@
+import logging
+import os
 import threading
+import time
+from contextlib import contextmanager
 
-from rtlsdr import RtlSdr
+import numpy as np
 
-# Module-level device lock — only one consumer (webui or digital) at a time
-_device_lock = threading.Lock()
-_device_owner = None  # "webui", "digital", or None
+try:
+    from rtlsdr import RtlSdr
+except ImportError as e:
+    # pyrtlsdr fails to import without librtlsdr; file replay still works
+    RtlSdr = None
+    _rtlsdr_error = e
 
+from iqring import IQRing
 
-def acquire_device(owner):
-    """Acquire exclusive device access. Returns True if acquired."""
-    global _device_owner
-    with _device_lock:
-        if _device_owner is None or _device_owner == owner:
-            _device_owner = owner
-            return True
-        return False
+log = logging.getLogger("sdr.device")
+
+class DeviceLease:
+    """One consumer's claim on one dongle. Always truthy."""
+
+    def __init__(self, index, serial, owner, frequency_hz=None):
+        self.index = index
+        self.serial = serial
+        self.owner = owner
+        self.frequency_hz = frequency_hz
+        self.acquired_at = time.time()
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "serial": self.serial,
+            "owner": self.owner,
+            "frequency_mhz": self.frequency_hz / 1e6 if self.frequency_hz else None,
+            "held_seconds": round(time.time() - self.acquired_at, 1),
+        }
+
+
+class DevicePool:
+    """Leases RTL-SDR dongles, by index or serial number, to named consumers.
+
+    Pins reserve a dongle for an owner name or a frequency (e.g. 1090 MHz for
+    ADS-B, where a dedicated antenna usually hangs); pinned dongles are only
+    handed to other consumers when no unpinned one is free.
+    """
+
+    # Frequency pins match within this distance
+    PIN_TOLERANCE_HZ = 1e6
+
+    def __init__(self, pins=None):
+        self._lock = threading.Lock()
+        self._devices = None
+        self._leases = {}  # device index -> DeviceLease
+        self.pins = {}  # owner name or frequency in Hz -> index or serial
+        for key, device in (pins or {}).items():
+            self.pin(key, device)
+
+    def pin(self, key, device):
+        """Reserve device (index or serial) for an owner name or a frequency in Hz."""
+        with self._lock:
+            self.pins[key] = device
+
+    def devices(self):
+        """[(index, serial)] of attached dongles, enumerated once."""
+        if self._devices is None:
+            try:
+                serials = RtlSdr.get_device_serial_addresses() if RtlSdr else []
+            except OSError as e:
+                log.warning(f"Device enumeration failed: {e}")
+                serials = []
+            # Nothing found still yields index 0 so the open itself reports why
+            self._devices = list(enumerate(serials)) or [(0, None)]
+        return self._devices
+
+    def _resolve(self, device):
+        for index, serial in self.devices():
+            if device == index or (serial is not None and str(device) == serial):
+                return index
+        return None
+
+    def _pinned(self, owner, frequency_hz):
+        if owner in self.pins:
+            return self._resolve(self.pins[owner])
+        if frequency_hz:
+            for key, device in self.pins.items():
+                if isinstance(key, (int, float)) and abs(key - frequency_hz) <= self.PIN_TOLERANCE_HZ:
+                    return self._resolve(device)
+        return None
+
+    def acquire(self, owner, frequency_hz=None, device=None):
+        """Lease a dongle to owner. Returns the DeviceLease, or None if none fits.
+
+        An owner that already holds a lease gets it back.
+        """
+        with self._lock:
+            for lease in self._leases.values():
+                if lease.owner == owner:
+                    return lease
+            if device is not None:
+                wanted = [self._resolve(device)]
+            else:
+                pinned = self._pinned(owner, frequency_hz)
+                if pinned is not None:
+                    wanted = [pinned]
+                else:
+                    reserved = {self._resolve(d) for d in self.pins.values()}
+                    indexes = [i for i, _ in self.devices()]
+                    wanted = [i for i in indexes if i not in reserved]
+                    wanted += [i for i in indexes if i in reserved]
+            for index in wanted:
+                if index is not None and index not in self._leases:
+                    serial = dict(self.devices()).get(index)
+                    lease = DeviceLease(index, serial, owner, frequency_hz)
+                    self._leases[index] = lease
+                    log.info(f"Device {index} leased to {owner}")
+                    return lease
+            return None
+
+    def release(self, owner):
+        with self._lock:
+            for index, lease in list(self._leases.items()):
+                if lease.owner == owner:
+                    del self._leases[index]
+                    log.info(f"Device {index} released by {owner}")
+
+    def lease_of(self, owner):
+        with self._lock:
+            return next((l for l in self._leases.values() if l.owner == owner), None)
+
+    def owners(self):
+        with self._lock:
+            return [lease.owner for lease in self._leases.values()]
+
+    def status(self):
+        with self._lock:
+            return [
+                {
+                    "index": index,
+                    "serial": serial,
+                    "lease": self._leases[index].to_dict() if index in self._leases else None,
+                    "pinned_to": [str(k) for k, d in self.pins.items() if self._resolve(d) == index],
+                }
+                for index, serial in self.devices()
+            ]
+
+
+def _pins_from_env():
+    """SDR_DEVICE_PINS="adsb=00001090,1090=1": owner or MHz -> serial or index."""
+    pins = {}
+    for item in os.environ.get("SDR_DEVICE_PINS", "").split(","):
+        if "=" not in item:
+            continue
+        key, device = (part.strip() for part in item.split("=", 1))
+        try:
+            key = float(key) * 1e6
+        except ValueError:
+            pass
+        pins[key] = int(device) if device.isdigit() and len(device) < 4 else device
+    return pins
+
+
+pool = DevicePool(_pins_from_env())
+
+
+def acquire_device(owner, frequency_hz=None, device=None):
+    """Lease a dongle to owner. Returns a DeviceLease (truthy) or None."""
+    return pool.acquire(owner, frequency_hz, device)
 
 
 def release_device(owner):
-    """Release device access."""
-    global _device_owner
-    with _device_lock:
-        if _device_owner == owner:
-            _device_owner = None
+    """Release owner's lease."""
+    pool.release(owner)
 
 
 def device_owner():
-    """Return current owner or None."""
-    return _device_owner
+    """Comma-separated owners of leased dongles, or None."""
+    return ", ".join(pool.owners()) or None
+
+
+def bytes_to_iq(raw, out=None):
+    """Convert interleaved uint8 I/Q bytes to complex64 in [-1, 1].
+
+    Same scaling as pyrtlsdr's packed_bytes_to_iq, but computed in float32
+    straight into out (complex64, at least len(raw) // 2 long) when given, so
+    a streaming reader can reuse one buffer instead of allocating per block.
+    """
+    raw = np.frombuffer(raw, dtype=np.uint8)
+    n = len(raw) // 2
+    if out is None:
+        out = np.empty(n, dtype=np.complex64)
+    out = out[:n]
+    lanes = out.view(np.float32)
+    np.multiply(raw[:2 * n], np.float32(1 / 127.5), out=lanes, dtype=np.float32)
+    lanes -= 1
+    return out
 
 
 class SDR:
     def __init__(self):
         self.device = None
+        self.ring = None
+        self._stream_thread = None
+        self._tuned_freq = None
+        self._retunes = 0  # bumped before every retune, so capture can spot blocks that straddle one
 
-    def open(self, sample_rate=2.048e6, center_freq=100e6, gain="auto"):
-        self.device = RtlSdr()
+    def open(self, sample_rate=2.048e6, center_freq=100e6, gain="auto", device_index=0):
+        if RtlSdr is None:
+            raise RuntimeError(f"RTL-SDR support unavailable: {_rtlsdr_error}")
+        self.device = RtlSdr(device_index=device_index)
         self.device.sample_rate = sample_rate
         self.device.center_freq = center_freq
         self.device.gain = gain
+        self._tuned_freq = center_freq
 
     def close(self):
+        self.stop_stream()
+        self.ring = None
         if self.device:
             self.device.close()
             self.device = None
 
-    def read_samples(self, num_samples=256 * 1024):
-        return self.device.read_samples(num_samples)
+    # --- Streaming mode ---
+
+    @property
+    def streaming(self):
+        return self._stream_thread is not None and self._stream_thread.is_alive()
+
+    def start_stream(self, block_size=256 * 1024, num_blocks=32, ring=None):
+        """Run pyrtlsdr's async reader in a thread, filling an IQRing.
+
+        Pass ring to stream into an existing ring instead, e.g. a
+        SharedIQRing other processes read from.
+        """
+        if self.streaming:
+            return self.ring
+        if ring is not None:
+            self.ring = ring
+            ring.reopen()
+        elif self.ring is None or self.ring.blocks.shape != (num_blocks, block_size):
+            self.ring = IQRing(block_size, num_blocks)
+        else:
+            # Resume into the same ring so existing subscribers carry on
+            self.ring.reopen()
+        self._stream_thread = threading.Thread(
+            target=self._stream_loop, args=(self.ring,), daemon=True, name="sdr-stream"
+        )
+        self._stream_thread.start()
+        return self.ring
+
+    def stop_stream(self):
+        if not self.streaming:
+            return
+        self.device.cancel_read_async()
+        self._stream_thread.join(timeout=2)
+        self._stream_thread = None
+
+    @contextmanager
+    def paused_stream(self):
+        """Suspend streaming for synchronous, retune-heavy work such as scans."""
+        was_streaming = self.streaming
+        self.stop_stream()
+        try:
+            yield
+        finally:
+            if was_streaming:
+                self.start_stream(self.ring.block_size, self.ring.num_blocks)
+
+    def _stream_loop(self, ring):
+        seen = self._retunes
+
+        def on_bytes(raw, context):
+            nonlocal seen
+            bytes_to_iq(raw, ring.next_slot())
+            # Read the tuning before the retune count: a retune that lands in
+            # between then always shows up as a changed count.
+            freq = self._tuned_freq
+            retunes = self._retunes
+            if retunes != seen:
+                # Captured partly (or wholly) before the retune; NaN matches no tuning
+                seen = retunes
+                freq = np.nan
+            ring.commit(freq)
+
+        try:
+            self.device.read_bytes_async(on_bytes, 2 * ring.block_size)
+        except OSError as e:
+            log.error(f"Async read stopped: {e}")
+        finally:
+            ring.close()
+
+    def subscribe(self, name=None):
+        """Reader on the shared capture stream, starting it if needed."""
+        return self.start_stream().subscribe(name)
+
+    # --- Reads ---
+
+    def read_bytes(self, num_samples=256 * 1024):
+        """Raw interleaved uint8 I/Q straight from the dongle."""
+        return self.device.read_bytes(2 * num_samples)
+
+    def read_samples(self, num_samples=256 * 1024, out=None):
+        """Read complex64 samples, optionally into a preallocated array.
+
+        While streaming, the samples come from the ring (skipping blocks
+        still in flight from a previous tuning), since librtlsdr can't serve
+        synchronous reads alongside the async reader.
+        """
+        if self.streaming:
+            with self.ring.subscribe("read_samples") as sub:
+                return sub.read_samples(num_samples, out, center_freq=self._tuned_freq)
+        return bytes_to_iq(self.read_bytes(num_samples), out)
 
     @property
     def center_freq(self):
@@ -54,7 +317,9 @@ class SDR:
 
     @center_freq.setter
     def center_freq(self, freq):
+        self._retunes += 1
         self.device.center_freq = freq
+        self._tuned_freq = freq
 
     @property
     def sample_rate(self):
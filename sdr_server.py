@@ -1,14 +1,22 @@
 import os
+import json
 import wave
 import time
+import asyncio
+import threading
 
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
 import numpy as np
 
-from sdr import SDR, acquire_device, release_device
+from sdr import SDR, acquire_device, release_device, pool
 from demod import demodulate, DEMODS
-from spectrum import compute_spectrum, ascii_spectrum
-from scanner import scan_range
+from spectrum import compute_spectrum, ascii_spectrum, ASCII_STYLES, engine as spectrum_engine
+from scanner import iter_scan, HopScan, SETTLE_SAMPLES
+from detect import CFARDetector, noise_floor_db, find_detections
+from hits import HitStore
+from survey import Survey, SurveyArchive, list_archives
+from revisit import RevisitScheduler
+from conventional import ConventionalScanner
 from bands import BANDS, DIGITAL_CHANNELS, FREQUENCY_DB, RTL_SDR_MIN_FREQ, RTL_SDR_MAX_FREQ
 from digital import DigitalVoiceDecoder
 from adsb import ADSBDecoder
@@ -17,6 +25,9 @@ from pager import PagerDecoder
 from aprs import APRSDecoder
 from trunking import TrunkRecorder
 from smart_tune import resolve_frequency
+from filters import cache_stats
+from channelizer import channels_in_span, resolve_channels, monitor_capture
+from iqfile import IQFileSource
 
 mcp = FastMCP("SDR Lab")
 
@@ -27,8 +38,31 @@ ism_decoder = ISMDecoder()
 pager_decoder = PagerDecoder()
 aprs_decoder = APRSDecoder()
 trunk_recorder = TrunkRecorder()
+hit_store = HitStore()
 
 RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+SURVEY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "surveys")
+survey = None
+scanner = None
+_scanner_pcm = []  # audio of the transmission being recorded, written out on release
+
+
+def _lease(owner, frequency_hz=None):
+    """Lease a dongle from the pool for a decoder.
+
+    Only when no dongle is free does the MCP's own IQ handle give way;
+    decoders already running on other dongles are left alone.
+    """
+    lease = acquire_device(owner, frequency_hz)
+    if not lease and radio.device and pool.lease_of("mcp"):
+        radio.close()
+        release_device("mcp")
+        lease = acquire_device(owner, frequency_hz)
+    return lease
+
+
+def _no_device():
+    return {"error": "No free SDR device. Stop a consumer first.", "devices": pool.status()}
 
 
 @mcp.tool
@@ -36,20 +70,33 @@ def open_device(
     frequency_mhz: float = 100.0,
     sample_rate: float = 2.048e6,
     gain: str = "auto",
+    streaming: bool = True,
 ) -> dict:
-    """Open the RTL-SDR device and tune to a frequency."""
+    """Open the RTL-SDR device and tune to a frequency.
+
+    With streaming, a background reader fills a shared IQ ring so spectrum,
+    audio and power tools all tap one gap-free capture.
+    """
     freq_hz = frequency_mhz * 1e6
     if not (RTL_SDR_MIN_FREQ <= freq_hz <= RTL_SDR_MAX_FREQ):
         return {
             "error": f"Frequency {frequency_mhz} MHz out of range ({RTL_SDR_MIN_FREQ/1e6}-{RTL_SDR_MAX_FREQ/1e6} MHz)"
         }
 
-    if not acquire_device("mcp"):
-        return {"error": "Device in use. Stop other consumers first."}
+    lease = acquire_device("mcp", freq_hz)
+    if not lease:
+        return _no_device()
 
+    global radio
     try:
         gain_value = gain if gain == "auto" else float(gain)
-        radio.open(sample_rate=sample_rate, center_freq=freq_hz, gain=gain_value)
+        if radio.device:
+            radio.close()
+        if isinstance(radio, IQFileSource):
+            radio = SDR()
+        radio.open(sample_rate=sample_rate, center_freq=freq_hz, gain=gain_value, device_index=lease.index)
+        if streaming:
+            radio.start_stream()
     except Exception as e:
         release_device("mcp")
         return {"error": f"Failed to open device: {e}"}
@@ -59,14 +106,68 @@ def open_device(
         "frequency_mhz": frequency_mhz,
         "sample_rate": sample_rate,
         "gain": gain,
+        "streaming": radio.streaming,
+        "device_index": lease.index,
+    }
+
+
+@mcp.tool
+def open_iq_file(
+    path: str,
+    loop: bool = True,
+    realtime: bool = False,
+    fmt: str = "",
+    sample_rate: float = 0.0,
+    frequency_mhz: float = 0.0,
+    streaming: bool = False,
+) -> dict:
+    """Replay a recorded IQ capture in place of the dongle (offline mode).
+
+    path: .cu8/.cs8/.cs16/.cf32 raw file or a SigMF recording
+    fmt: sample format when the extension doesn't tell (cu8, cs8, cs16, cf32)
+    sample_rate / frequency_mhz: needed for raw files; SigMF metadata has them
+    realtime: pace reads to the sample rate instead of running flat out
+    Every tool that reads IQ then works on the file until close_device.
+    """
+    global radio
+    try:
+        source = IQFileSource(
+            path,
+            fmt=fmt or None,
+            sample_rate=sample_rate or None,
+            center_freq=frequency_mhz * 1e6 or None,
+            loop=loop,
+            realtime=realtime,
+        )
+        source.open()
+    except (OSError, ValueError, KeyError) as e:
+        return {"error": f"Failed to open {path}: {e}"}
+    radio.close()
+    release_device("mcp")
+    radio = source
+    if streaming:
+        radio.start_stream()
+    return {
+        "status": "replaying",
+        "path": source.data_path,
+        "format": source.fmt,
+        "frequency_mhz": source.center_freq / 1e6,
+        "sample_rate": source.sample_rate,
+        "duration_seconds": round(source.duration, 3),
+        "loop": loop,
+        "realtime": realtime,
+        "streaming": radio.streaming,
     }
 
 
 @mcp.tool
 def close_device() -> str:
     """Close the RTL-SDR device."""
+    global radio
     radio.close()
     release_device("mcp")
+    if isinstance(radio, IQFileSource):
+        radio = SDR()
     return "Device closed"
 
 
@@ -85,26 +186,75 @@ def set_gain(gain: str) -> dict:
 
 
 @mcp.tool
-def get_spectrum(fft_size: int = 1024) -> dict:
-    """Capture IQ samples and return ASCII power spectrum with peak info."""
-    iq = radio.read_samples(fft_size * 4)
+def get_spectrum(
+    fft_size: int = 1024,
+    averages: int = 32,
+    overlap: float = 0.5,
+    max_hold: bool = False,
+    style: str = "ascii",
+    width: int = 60,
+    height: int = 15,
+    snr_db: float = 10.0,
+) -> dict:
+    """Capture IQ samples and return ASCII power spectrum with peak info.
+
+    averages: overlapping FFT frames averaged (Welch) for a steadier noise floor
+    overlap: fraction each frame shares with the previous one (0 to <1)
+    max_hold: report each bin's peak across the frames instead of the mean
+    style: "ascii", "blocks" (eighth blocks) or "braille" (finest detail)
+    snr_db: CFAR threshold over the local noise floor for the signals list
+    """
+    if not 0 <= overlap < 1:
+        return {"error": "overlap must be in [0, 1)"}
+    if style not in ASCII_STYLES:
+        return {"error": f"Unknown style {style} (have {list(ASCII_STYLES)})"}
+    averages = max(averages, 1)
+    hop = max(1, int(fft_size * (1 - overlap)))
+    iq = radio.read_samples(fft_size + (averages - 1) * hop)
     freqs_mhz, power_db = compute_spectrum(
-        iq, radio.sample_rate, radio.center_freq, fft_size
+        iq, radio.sample_rate, radio.center_freq, fft_size, averages, overlap, max_hold
     )
 
-    ascii = ascii_spectrum(freqs_mhz, power_db, width=60, height=15)
+    ascii = ascii_spectrum(freqs_mhz, power_db, width=width, height=height, style=style, markers=True)
 
     peak_idx = np.argmax(power_db)
+    floor_db = noise_floor_db(power_db)
     return {
         "center_freq_mhz": radio.center_freq / 1e6,
         "span_mhz": radio.sample_rate / 1e6,
         "peak_freq_mhz": round(float(freqs_mhz[peak_idx]), 4),
         "peak_power_db": round(float(power_db[peak_idx]), 1),
-        "noise_floor_db": round(float(np.median(power_db)), 1),
+        "noise_floor_db": round(float(np.median(floor_db)), 1),
+        "signals": find_detections(freqs_mhz * 1e6, power_db, floor_db, snr_db)[:10],
         "ascii_spectrum": ascii,
     }
 
 
+@mcp.tool
+def detect_signals(snr_db: float = 10.0, fft_size: int = 1024, frames: int = 8) -> dict:
+    """Find signals in the current capture span with a CFAR detector.
+
+    Averages several consecutive captures into a running noise floor, then
+    reports every signal at least snr_db above it with its center
+    frequency, bandwidth estimate, peak power and SNR. Unlike a fixed dB
+    threshold this gives the same false-alarm rate at any gain or band.
+    """
+    detector = CFARDetector(snr_db=snr_db)
+    detections = []
+    for _ in range(max(frames, 1)):
+        iq = radio.read_samples(fft_size * 32)
+        freqs_mhz, power_db = compute_spectrum(
+            iq, radio.sample_rate, radio.center_freq, fft_size, averages=0
+        )
+        detections = detector.detect(freqs_mhz * 1e6, power_db)
+    return {
+        "center_freq_mhz": radio.center_freq / 1e6,
+        "span_mhz": radio.sample_rate / 1e6,
+        "noise_floor_db": round(float(np.median(detector.floor_db)), 1),
+        "signals": detections,
+    }
+
+
 @mcp.tool
 def capture_audio(duration_seconds: float = 2.0, mode: str = "wfm") -> dict:
     """Capture and demodulate audio. Returns signal stats (not playback)."""
@@ -123,26 +273,85 @@ def capture_audio(duration_seconds: float = 2.0, mode: str = "wfm") -> dict:
     }
 
 
+async def _scan_with_progress(ctx, start_freq, end_freq, **kwargs):
+    """scan_range on the MCP radio, reporting every hop as a progress notification.
+
+    The sweep runs in a worker thread; when the client cancels the call it
+    stops after the hop in flight.
+    """
+    loop = asyncio.get_running_loop()
+    progress = asyncio.Queue()
+    cancel = threading.Event()
+
+    def scan():
+        hops = iter_scan(radio, start_freq, end_freq, store=hit_store, **kwargs)
+        try:
+            with radio.paused_stream():
+                for update in hops:
+                    loop.call_soon_threadsafe(progress.put_nowait, update)
+                    if cancel.is_set():
+                        break
+        finally:
+            hops.close()
+            loop.call_soon_threadsafe(progress.put_nowait, None)
+
+    worker = asyncio.ensure_future(asyncio.to_thread(scan))
+    signals = []
+    try:
+        while (update := await progress.get()) is not None:
+            signals.extend(update["signals"])
+            message = f"{update['start_mhz']:.4f}-{update['end_mhz']:.4f} MHz"
+            if update["signals"]:
+                message += ": " + ", ".join(f"{sig['freq_mhz']:.4f}" for sig in update["signals"])
+            await ctx.report_progress(update["hop"], update["hops"], message)
+        await worker
+    finally:
+        cancel.set()
+    return sorted(signals, key=lambda sig: sig["power_db"], reverse=True)
+
+
 @mcp.tool
-def scan_frequencies(
+async def scan_frequencies(
     start_mhz: float,
     end_mhz: float,
     step_khz: float = 25.0,
-    threshold_db: float = -30.0,
+    snr_db: float = 10.0,
+    threshold_db: float = 0.0,
+    bandwidth_khz: float = 0.0,
+    recent_hours: float = 0.0,
+    ctx: Context = None,
 ) -> list[dict]:
-    """Scan a frequency range and return signals above the threshold."""
-    return scan_range(
-        radio,
-        start_mhz * 1e6,
-        end_mhz * 1e6,
+    """Scan a frequency range and return active channels.
+
+    Channels sit every step_khz, each bandwidth_khz wide (0: the step);
+    power_db is the power inside each channel. A channel is active when it
+    is snr_db above the adaptive (CFAR) noise floor; a nonzero threshold_db
+    uses that fixed absolute power instead. recent_hours > 0 only revisits
+    channels with hits in the scan history over that many hours.
+    Results are logged to the scan history (see scan_history). Each hop
+    (about 1.6 MHz) is reported as progress with the channels found in it,
+    and cancelling the call stops the sweep.
+    """
+    start, end = start_mhz * 1e6, end_mhz * 1e6
+    channels = hit_store.active_channels(start, end, recent_hours) if recent_hours else None
+    return await _scan_with_progress(
+        ctx,
+        start,
+        end,
         step=step_khz * 1e3,
-        threshold_db=threshold_db,
+        threshold_db=threshold_db or None,
+        channel_bw=bandwidth_khz * 1e3 if bandwidth_khz else None,
+        snr_db=snr_db,
+        channels=channels,
     )
 
 
 @mcp.tool
-def scan_band(band_name: str) -> list[dict]:
-    """Scan a named band (e.g., 'noaa', 'aviation', 'marine', 'fm')."""
+async def scan_band(band_name: str, recent_hours: float = 0.0, ctx: Context = None) -> list[dict]:
+    """Scan a named band (e.g., 'noaa', 'aviation', 'marine', 'fm').
+
+    recent_hours > 0 only revisits channels heard within that many hours.
+    """
     matching = {k: v for k, v in BANDS.items() if k.startswith(band_name)}
     if not matching:
         return [{"error": f"Unknown band: {band_name}", "available": list(BANDS.keys())}]
@@ -151,7 +360,280 @@ def scan_band(band_name: str) -> list[dict]:
     start, end = min(freqs) - 100e3, max(freqs) + 100e3
     step = list(matching.values())[0][2]
 
-    return scan_range(radio, start, end, step=step)
+    channels = hit_store.active_channels(start, end, recent_hours) if recent_hours else None
+    return await _scan_with_progress(ctx, start, end, step=step, channel_bw=step, channels=channels)
+
+
+@mcp.tool
+def scan_history(hours: float = 24.0, start_mhz: float = 0.0, end_mhz: float = 0.0) -> dict:
+    """Channel occupancy from past scans, to decide which channels to watch.
+
+    channels: busiest first, with hits, the scans that covered it,
+    duty_cycle (hits / scans), last_heard (epoch s), mean SNR and the
+    phonebook name. by_hour: hits per local hour of day over the last week.
+    last_heard: the most recently active channels. A zero start/end_mhz
+    leaves that side of the range open.
+    """
+    start = start_mhz * 1e6 if start_mhz else None
+    end = end_mhz * 1e6 if end_mhz else None
+    return {
+        "channels": hit_store.channel_stats(hours, start, end),
+        "by_hour": hit_store.activity_by_hour(start, end),
+        "last_heard": hit_store.last_heard(),
+        "store": hit_store.stats(),
+    }
+
+
+@mcp.tool
+def profile_scan(
+    start_mhz: float,
+    end_mhz: float,
+    step_khz: float = 25.0,
+    dwell_ms: float = 50.0,
+    settle_samples: int = SETTLE_SAMPLES,
+) -> dict:
+    """Run a hop scan and report where the time goes.
+
+    Returns mean tune/settle/wait/read/compute ms per hop, hops per second
+    and the per-hop timings. wait_ms near zero means analysis keeps up and
+    the scan is bound by retuning and reading; lower settle_samples or
+    dwell_ms to push towards the dongle's retune limit.
+    """
+    scan = HopScan(
+        radio, start_mhz * 1e6, end_mhz * 1e6, step=step_khz * 1e3, dwell_ms=dwell_ms,
+        settle_samples=settle_samples,
+    )
+    with radio.paused_stream():
+        scan.run()
+    return {**scan.summary(), "timings": scan.timings}
+
+
+@mcp.tool
+def priority_scan(
+    duration_seconds: float = 10.0,
+    names: str = "",
+    intervals: str = "",
+    dwell_ms: float = 20.0,
+    snr_db: float = 10.0,
+) -> dict:
+    """Watch phonebook channels by priority for a while and report activity.
+
+    Channels (comma-separated FREQUENCY_DB names; empty: all of them) are
+    grouped into as few tuning windows as possible and every visit
+    measures a whole window from one capture. Windows are revisited when
+    their most urgent channel is due: fire/police/EMS dispatch every 0.5 s,
+    repeaters every 5 s and so on; intervals overrides as
+    "name=seconds,...". Returns the windows, each channel's revisit latency
+    (mean/p95/max gap, late visits) and last SNR, and the activity events.
+    """
+    selected = [n.strip() for n in names.split(",") if n.strip()] or None
+    unknown = [n for n in selected or [] if n not in FREQUENCY_DB]
+    if unknown:
+        return {"error": f"Unknown channels: {unknown}", "available": list(FREQUENCY_DB)}
+    overrides = {}
+    for item in intervals.split(","):
+        if "=" in item:
+            name, seconds = item.split("=", 1)
+            overrides[name.strip()] = float(seconds)
+    scheduler = RevisitScheduler(radio, selected, overrides, dwell_ms=dwell_ms, snr_db=snr_db)
+    with radio.paused_stream():
+        scheduler.run(duration_seconds)
+    return {
+        "windows": scheduler.window_summary(),
+        "window_visits": scheduler.window_visits,
+        "visits_per_second": round(scheduler.window_visits / duration_seconds, 1),
+        "channels": scheduler.latency_stats(),
+        "events": scheduler.events,
+    }
+
+
+@mcp.tool
+def start_survey(
+    start_mhz: float = RTL_SDR_MIN_FREQ / 1e6,
+    end_mhz: float = RTL_SDR_MAX_FREQ / 1e6,
+    bin_khz: float = 25.0,
+    dwell_ms: float = 20.0,
+    name: str = "",
+    sweeps: int = 0,
+) -> dict:
+    """Start a long-running spectrum survey (like rtl_power) on its own dongle.
+
+    Sweeps start_mhz..end_mhz back to back with the hopping FFT scanner and
+    appends one row of bin_khz-wide power bins per sweep to the archive
+    surveys/<name> (default: a timestamp). An existing name is resumed with
+    its own frequency axis. sweeps > 0 stops after that many.
+    """
+    global survey
+    if survey and survey.running:
+        return {"error": "A survey is already running", **survey.status()}
+    lease = _lease("survey", start_mhz * 1e6)
+    if not lease:
+        return _no_device()
+    name = name or time.strftime("survey_%Y%m%d_%H%M%S")
+    path = os.path.join(SURVEY_DIR, name)
+    try:
+        os.makedirs(SURVEY_DIR, exist_ok=True)
+        if os.path.exists(path + ".json"):
+            archive = SurveyArchive(path, mode="r+")
+        else:
+            archive = SurveyArchive.create(path, start_mhz * 1e6, end_mhz * 1e6, bin_khz * 1e3)
+        sdr = SDR()
+        sdr.open(sample_rate=2.048e6, center_freq=archive.start_freq, gain="auto", device_index=lease.index)
+    except (OSError, RuntimeError, ValueError) as e:
+        release_device("survey")
+        return {"error": str(e)}
+    survey = Survey(sdr, archive, dwell_ms=dwell_ms)
+    survey.start(sweeps)
+    return {"status": "started", **survey.status()}
+
+
+@mcp.tool
+def stop_survey() -> dict:
+    """Stop the running survey and release its dongle."""
+    global survey
+    if survey is None:
+        return {"error": "No survey running"}
+    # The device and archive stay open until the sweep thread is gone
+    if not survey.stop():
+        return {"error": "The survey is still finishing a hop; try again", **survey.status()}
+    survey.sdr.close()
+    release_device("survey")
+    status = survey.status()
+    survey.archive.close()
+    survey = None
+    return {"status": "stopped", **status}
+
+
+@mcp.tool
+def survey_status() -> dict:
+    """Progress of the running survey and the archives on disk."""
+    return {
+        "survey": survey.status() if survey else None,
+        "archives": list_archives(SURVEY_DIR),
+    }
+
+
+_HEAT_CHARS = np.array(list(" .:-=+*#%@"))
+
+
+@mcp.tool
+def survey_heatmap(
+    name: str,
+    hours: float = 0.0,
+    start_mhz: float = 0.0,
+    end_mhz: float = 0.0,
+    rows: int = 24,
+    cols: int = 72,
+) -> dict:
+    """Text heatmap of a survey archive, time down and frequency across.
+
+    Covers the last `hours` (0: everything) and start_mhz..end_mhz (0: the
+    archive's edges), max-reduced to rows x cols cells shaded " .:-=+*#%@"
+    from weakest to strongest. Reads only the requested window from disk.
+    """
+    path = os.path.join(SURVEY_DIR, name)
+    if not os.path.exists(path + ".json"):
+        return {"error": f"No survey archive {name}", "archives": list_archives(SURVEY_DIR)}
+    archive = SurveyArchive(path)
+    tile = archive.window(
+        t_start=time.time() - hours * 3600 if hours else None,
+        start_freq=start_mhz * 1e6 if start_mhz else None,
+        end_freq=end_mhz * 1e6 if end_mhz else None,
+        rows=rows,
+        cols=cols,
+    )
+    if tile is None:
+        return {"error": "No survey rows in that window", "archive": archive.stats()}
+    data = tile.pop("data")
+    shades = _HEAT_CHARS[(data.astype(int) * len(_HEAT_CHARS)) // 256]
+    return {
+        **tile,
+        "start_mhz": tile.pop("start_hz") / 1e6,
+        "end_mhz": tile.pop("end_hz") / 1e6,
+        "db_range": [round(tile["db_offset"], 1), round(tile["db_offset"] + 255 * tile["db_step"], 1)],
+        "heatmap": ["".join(row) for row in shades],
+    }
+
+
+def _scanner_lock(name, freq, mode, center, iq):
+    scanner.current["file"] = f"{time.strftime('%Y%m%d_%H%M%S')}_{freq / 1e6:.4f}MHz_{name}.wav"
+    _scanner_pcm.clear()
+
+
+def _scanner_audio(audio):
+    _scanner_pcm.append((np.clip(audio, -1, 1) * 32767).astype(np.int16).tobytes())
+
+
+def _scanner_release(transmission):
+    os.makedirs(RECORDINGS_DIR, exist_ok=True)
+    with wave.open(os.path.join(RECORDINGS_DIR, transmission["file"]), "w") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(scanner.audio_rate)
+        wf.writeframes(b"".join(_scanner_pcm))
+    _scanner_pcm.clear()
+
+
+@mcp.tool
+def start_scanner(
+    channels: str = "",
+    snr_db: float = 10.0,
+    hang_time: float = 2.0,
+    dwell_ms: float = 30.0,
+) -> dict:
+    """Start a conventional scanner on its own dongle: stop on activity, record, resume.
+
+    Sweeps channels (comma-separated FREQUENCY_DB names or MHz values;
+    empty: every analog phonebook channel) a tuning window at a time. When
+    a channel's SNR tops snr_db it locks onto the strongest, demodulates it
+    into a WAV in recordings/ until squelch has been closed for hang_time
+    seconds, then resumes. scanner_status has the transmissions heard and
+    the detect-to-audio latency.
+    """
+    global scanner
+    if scanner and scanner.running:
+        return {"error": "The scanner is already running", **scanner.status()}
+    try:
+        selected = resolve_channels(channels.split(",")) or None
+    except ValueError as e:
+        return {"error": f"Bad channel list: {e}"}
+    lease = _lease("scanner")
+    if not lease:
+        return _no_device()
+    try:
+        sdr = SDR()
+        sdr.open(sample_rate=2.048e6, center_freq=100e6, gain="auto", device_index=lease.index)
+        scanner = ConventionalScanner(
+            sdr, selected, snr_db=snr_db, hang_time=hang_time, dwell_ms=dwell_ms,
+            on_lock=_scanner_lock, on_release=_scanner_release, on_audio=_scanner_audio,
+        )
+    except (OSError, RuntimeError, ValueError) as e:
+        release_device("scanner")
+        return {"error": str(e)}
+    scanner.start()
+    return {"status": "started", **scanner.status()}
+
+
+@mcp.tool
+def stop_scanner() -> dict:
+    """Stop the conventional scanner and release its dongle."""
+    global scanner
+    if scanner is None:
+        return {"error": "No scanner running"}
+    scanner.stop()
+    scanner.radio.close()
+    release_device("scanner")
+    status = scanner.status()
+    scanner = None
+    return {"status": "stopped", **status}
+
+
+@mcp.tool
+def scanner_status() -> dict:
+    """State of the conventional scanner, its recent transmissions and detect-to-audio latency."""
+    if scanner is None:
+        return {"error": "No scanner running"}
+    return scanner.status()
 
 
 @mcp.tool
@@ -185,15 +667,64 @@ def tune_preset(preset_name: str) -> dict:
 
 
 @mcp.tool
-def measure_power() -> dict:
-    """Measure signal power at current frequency."""
+def measure_power(snr_db: float = 10.0) -> dict:
+    """Measure signal power at current frequency.
+
+    has_signal is a CFAR decision: some part of the span stands snr_db
+    above its local noise floor, whatever the gain.
+    """
     iq = radio.read_samples(256 * 1024)
-    power = float(np.mean(np.abs(iq) ** 2))
+    power = float(np.vdot(iq, iq).real) / len(iq)
     power_db = 10 * np.log10(power + 1e-10)
+    freqs_mhz, spectrum_db = compute_spectrum(
+        iq, radio.sample_rate, radio.center_freq, fft_size=1024, averages=0
+    )
+    signals = find_detections(freqs_mhz * 1e6, spectrum_db, noise_floor_db(spectrum_db), snr_db)
     return {
         "frequency_mhz": radio.center_freq / 1e6,
         "power_db": round(power_db, 1),
-        "has_signal": power_db > -30,
+        "snr_db": signals[0]["snr_db"] if signals else 0.0,
+        "has_signal": bool(signals),
+    }
+
+
+@mcp.tool
+def list_capture_channels(protocol: str = "analog_nfm") -> dict:
+    """List phonebook channels that fit inside the current capture span."""
+    channels = channels_in_span(radio.center_freq, radio.sample_rate, protocol)
+    return {
+        "center_freq_mhz": radio.center_freq / 1e6,
+        "span_mhz": radio.sample_rate / 1e6,
+        "channels": {name: round(freq / 1e6, 4) for name, freq in channels.items()},
+    }
+
+
+@mcp.tool
+def monitor_channels(channels: str = "", duration_seconds: float = 1.0) -> dict:
+    """NFM-demodulate several channels from one capture with a polyphase channelizer.
+
+    channels is a comma-separated list of phonebook names or MHz values;
+    empty monitors every analog NFM phonebook channel inside the span.
+    """
+    if channels:
+        try:
+            selected = resolve_channels(channels.split(","))
+        except ValueError as e:
+            return {"error": f"Bad channel list: {e}"}
+    else:
+        selected = channels_in_span(radio.center_freq, radio.sample_rate)
+    if not selected:
+        return {"error": "No channels inside the current capture span"}
+
+    iq = radio.read_samples(int(radio.sample_rate * duration_seconds))
+    try:
+        results = monitor_capture(iq, radio.sample_rate, radio.center_freq, selected)
+    except ValueError as e:
+        return {"error": str(e)}
+    return {
+        "center_freq_mhz": radio.center_freq / 1e6,
+        "duration_seconds": duration_seconds,
+        "channels": results,
     }
 
 
@@ -203,6 +734,36 @@ def available_modes() -> list[str]:
     return list(DEMODS.keys())
 
 
+@mcp.tool
+def list_devices() -> list[dict]:
+    """Attached RTL-SDR dongles with their current lease and pins."""
+    return pool.status()
+
+
+@mcp.tool
+def pin_device(device: str, owner: str = "", frequency_mhz: float = 0.0) -> dict:
+    """Reserve a dongle (index or serial) for a decoder name or a frequency, e.g. 1090 MHz."""
+    if not owner and not frequency_mhz:
+        return {"error": "Give an owner (e.g. 'adsb') or a frequency_mhz to pin"}
+    target = int(device) if device.isdigit() and len(device) < 4 else device
+    pool.pin(owner or frequency_mhz * 1e6, target)
+    return {"pins": {str(k): v for k, v in pool.pins.items()}}
+
+
+@mcp.tool
+def stream_status() -> dict:
+    """Capture ring state: blocks written and each subscriber's lag and overruns."""
+    if not radio.streaming:
+        return {"streaming": False}
+    return {"streaming": True, **radio.ring.stats()}
+
+
+@mcp.tool
+def filter_cache_stats() -> dict:
+    """Hit/miss counters for the shared filter design cache, plus cached spectrum plans."""
+    return {**cache_stats(), "spectrum": spectrum_engine.stats()}
+
+
 # --- Digital decoder tools ---
 
 
@@ -214,11 +775,14 @@ def start_digital_decode(
     squelch: int = 0,
 ) -> dict:
     """Start real-time digital voice decoding. Modes: auto, dmr, p25, nxdn, dstar, ysf, nfm, am, wfm."""
-    if radio.device:
-        radio.close()
-        release_device("mcp")
-    acquire_device("digital")
-    decoder.start(frequency_mhz * 1e6, mode, gain, squelch)
+    lease = _lease("digital", frequency_mhz * 1e6)
+    if not lease:
+        return _no_device()
+    try:
+        decoder.start(frequency_mhz * 1e6, mode, gain, squelch, device_index=lease.index)
+    except Exception as e:
+        release_device("digital")
+        return {"error": str(e)}
     return decoder.get_status()
 
 
@@ -254,11 +818,14 @@ def tune_digital_preset(preset_name: str) -> dict:
     if preset_name not in DIGITAL_CHANNELS:
         return {"error": f"Unknown preset: {preset_name}", "available": list(DIGITAL_CHANNELS.keys())}
     ch = DIGITAL_CHANNELS[preset_name]
-    if radio.device:
-        radio.close()
-        release_device("mcp")
-    acquire_device("digital")
-    decoder.start(ch["freq"], ch["mode"], "auto", 0)
+    lease = _lease("digital", ch["freq"])
+    if not lease:
+        return _no_device()
+    try:
+        decoder.start(ch["freq"], ch["mode"], "auto", 0, device_index=lease.index)
+    except Exception as e:
+        release_device("digital")
+        return {"error": str(e)}
     return {"preset": preset_name, **decoder.get_status()}
 
 
@@ -332,71 +899,35 @@ def smart_tune(frequency_mhz: float, gain: str = "auto") -> dict:
     or uses band-based guessing, or falls back to dsd-fme auto-detection.
     Returns the lookup result and decoder status.
     """
-    info = resolve_frequency(frequency_mhz * 1e6)
+    freq_hz = frequency_mhz * 1e6
+    info = resolve_frequency(freq_hz)
     dec = info["decoder"]
     mode = info["mode"]
 
-    # Stop any active consumer and release device
-    if radio.device:
-        radio.close()
-        release_device("mcp")
-    for name, obj in [("digital", decoder), ("adsb", adsb_decoder),
-                      ("ism", ism_decoder), ("pager", pager_decoder),
-                      ("aprs", aprs_decoder), ("trunk", trunk_recorder)]:
-        if obj.active:
-            obj.stop()
-            release_device(name)
-
-    # Start the appropriate decoder
-    if dec == "adsb":
-        if not acquire_device("adsb"):
-            return {"error": "Device in use", **info}
-        try:
-            adsb_decoder.start(gain=gain)
-        except Exception as e:
-            release_device("adsb")
-            return {"error": str(e), **info}
-        return {**info, "status": adsb_decoder.get_status()}
-
-    if dec == "aprs":
-        if not acquire_device("aprs"):
-            return {"error": "Device in use", **info}
-        try:
-            aprs_decoder.start(frequency_hz=frequency_mhz * 1e6, gain=gain)
-        except Exception as e:
-            release_device("aprs")
-            return {"error": str(e), **info}
-        return {**info, "status": aprs_decoder.get_status()}
-
-    if dec == "ism":
-        if not acquire_device("ism"):
-            return {"error": "Device in use", **info}
-        try:
-            ism_decoder.start(frequency_hz=frequency_mhz * 1e6, gain=gain)
-        except Exception as e:
-            release_device("ism")
-            return {"error": str(e), **info}
-        return {**info, "status": ism_decoder.get_status()}
-
-    if dec == "digital":
-        if not acquire_device("digital"):
-            return {"error": "Device in use", **info}
-        try:
-            decoder.start(frequency_mhz * 1e6, mode, gain, 0)
-        except Exception as e:
-            release_device("digital")
-            return {"error": str(e), **info}
-        return {**info, "status": decoder.get_status()}
-
-    # Default: analog (rtl_fm)
-    if not acquire_device("digital"):
-        return {"error": "Device in use", **info}
+    owners = {"adsb": adsb_decoder, "aprs": aprs_decoder, "ism": ism_decoder}
+    owner = dec if dec in owners else "digital"
+    target = owners.get(dec, decoder)
+
+    # Restart only the decoder being retargeted; the rest keep their dongles
+    if target.active:
+        target.stop()
+        release_device(owner)
+    lease = _lease(owner, freq_hz)
+    if not lease:
+        return {**_no_device(), **info}
+
     try:
-        decoder.start(frequency_mhz * 1e6, mode, gain, 0)
+        if dec == "adsb":
+            adsb_decoder.start(gain=gain, device_index=lease.index)
+        elif dec in ("aprs", "ism"):
+            target.start(frequency_hz=freq_hz, gain=gain, device_index=lease.index)
+        else:
+            # Digital voice, or analog via rtl_fm
+            decoder.start(freq_hz, mode, gain, 0, device_index=lease.index)
     except Exception as e:
-        release_device("digital")
+        release_device(owner)
         return {"error": str(e), **info}
-    return {**info, "status": decoder.get_status()}
+    return {**info, "status": target.get_status()}
 
 
 @mcp.tool
@@ -445,13 +976,11 @@ def search_frequencies(query: str = "", protocol: str = "", decoder: str = "") -
 @mcp.tool
 def start_adsb(gain: str = "auto") -> dict:
     """Start ADS-B aircraft tracking on 1090 MHz using dump1090."""
-    if radio.device:
-        radio.close()
-        release_device("mcp")
-    if not acquire_device("adsb"):
-        return {"error": "Device in use. Stop other consumers first."}
+    lease = _lease("adsb", 1090e6)
+    if not lease:
+        return _no_device()
     try:
-        adsb_decoder.start(gain=gain)
+        adsb_decoder.start(gain=gain, device_index=lease.index)
     except Exception as e:
         release_device("adsb")
         return {"error": str(e)}
@@ -484,13 +1013,11 @@ def get_aircraft() -> list[dict]:
 @mcp.tool
 def start_ism(frequency_mhz: float = 433.92, gain: str = "auto") -> dict:
     """Start ISM band decoder (weather stations, sensors, etc.) using rtl_433."""
-    if radio.device:
-        radio.close()
-        release_device("mcp")
-    if not acquire_device("ism"):
-        return {"error": "Device in use. Stop other consumers first."}
+    lease = _lease("ism", frequency_mhz * 1e6)
+    if not lease:
+        return _no_device()
     try:
-        ism_decoder.start(frequency_hz=frequency_mhz * 1e6, gain=gain)
+        ism_decoder.start(frequency_hz=frequency_mhz * 1e6, gain=gain, device_index=lease.index)
     except Exception as e:
         release_device("ism")
         return {"error": str(e)}
@@ -528,11 +1055,9 @@ def start_pager(
     squelch: int = 0,
 ) -> dict:
     """Start pager/EAS decoder using multimon-ng. Decoders: POCSAG512, POCSAG1200, POCSAG2400, EAS, DTMF, AFSK1200, MORSE_CW."""
-    if radio.device:
-        radio.close()
-        release_device("mcp")
-    if not acquire_device("pager"):
-        return {"error": "Device in use. Stop other consumers first."}
+    lease = _lease("pager", frequency_mhz * 1e6)
+    if not lease:
+        return _no_device()
     try:
         decoder_list = [d.strip() for d in decoders.split(",")]
         pager_decoder.start(
@@ -540,6 +1065,7 @@ def start_pager(
             decoders=decoder_list,
             gain=gain,
             squelch=squelch,
+            device_index=lease.index,
         )
     except Exception as e:
         release_device("pager")
@@ -573,13 +1099,11 @@ def get_pager_messages(last_n: int = 50) -> list[dict]:
 @mcp.tool
 def start_aprs(frequency_mhz: float = 144.39, gain: str = "auto") -> dict:
     """Start APRS packet decoder using direwolf. Default 144.390 MHz (NA standard)."""
-    if radio.device:
-        radio.close()
-        release_device("mcp")
-    if not acquire_device("aprs"):
-        return {"error": "Device in use. Stop other consumers first."}
+    lease = _lease("aprs", frequency_mhz * 1e6)
+    if not lease:
+        return _no_device()
     try:
-        aprs_decoder.start(frequency_hz=frequency_mhz * 1e6, gain=gain)
+        aprs_decoder.start(frequency_hz=frequency_mhz * 1e6, gain=gain, device_index=lease.index)
     except Exception as e:
         release_device("aprs")
         return {"error": str(e)}
@@ -618,13 +1142,11 @@ def start_trunk(config_path: str = "") -> dict:
             config_path = default
         else:
             return {"error": "No config_path provided and no trunk_config.json found. Use generate_trunk_config first."}
-    if radio.device:
-        radio.close()
-        release_device("mcp")
-    if not acquire_device("trunk"):
-        return {"error": "Device in use. Stop other consumers first."}
+    lease = _lease("trunk")
+    if not lease:
+        return _no_device()
     try:
-        trunk_recorder.start(config_path=config_path)
+        trunk_recorder.start(config_path=config_path, device_index=lease.index)
     except Exception as e:
         release_device("trunk")
         return {"error": str(e)}
@@ -655,11 +1177,13 @@ def get_trunk_calls(last_n: int = 50) -> list[dict]:
 def generate_trunk_config(
     system_type: str,
     control_channels: str,
+    device_index: int = 0,
 ) -> dict:
     """Generate a trunk-recorder config.json for a trunked system.
 
     system_type: 'p25' or 'smartnet'
     control_channels: Comma-separated control channel frequencies in Hz (e.g. '851012500,852012500')
+    device_index: RTL-SDR dongle to use (start_trunk overrides it with the leased one)
     """
     base_dir = os.path.dirname(os.path.abspath(__file__))
     config_path = os.path.join(base_dir, "trunk_config.json")
@@ -672,7 +1196,7 @@ def generate_trunk_config(
             "center": channels[0],
             "rate": 2048000,
             "driver": "osmosdr",
-            "device": "rtl=0",
+            "device": f"rtl={device_index}",
             "gain": 40,
         }],
         "systems": [{
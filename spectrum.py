@@ -1,18 +1,193 @@
+import threading
+
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import fft
+
+import filters
+
+
+def welch_frames(iq_samples, fft_size, averages=1, overlap=0.5):
+    """Overlapping fft_size frames ending at the newest sample, as a strided view.
+
+    averages caps the frame count (0 takes every frame that fits).
+    """
+    hop = max(1, int(fft_size * (1 - overlap)))
+    frames = sliding_window_view(iq_samples, fft_size)
+    # Align to the end so the newest samples always land in a frame
+    frames = frames[(len(frames) - 1) % hop::hop]
+    if averages:
+        frames = frames[-averages:]
+    return frames
+
+
+class SpectrumPlan:
+    """Per-configuration constants: window and frequency axis."""
+
+    def __init__(self, fft_size, sample_rate, center_freq, window="hann"):
+        self.fft_size = fft_size
+        self.sample_rate = sample_rate
+        self.center_freq = center_freq
+        # Alternating signs move DC to the middle bin, so for even sizes the
+        # FFT output comes out already fftshifted
+        self.shifted = fft_size % 2 == 0
+        self.window = filters.window(window, fft_size)
+        if self.shifted:
+            self.window = self.window * np.where(np.arange(fft_size) % 2, -1, 1).astype(np.float32)
+        freqs = (np.arange(fft_size) - fft_size // 2) * (sample_rate / fft_size)
+        self.freqs_mhz = (freqs + center_freq) / 1e6
+
+
+class SpectrumEngine:
+    """Shared spectrum computation with plans cached per configuration.
+
+    Plans are keyed by (fft_size, sample_rate, center_freq, window), so the
+    web stream, the scanners and the MCP tools reuse the same windows and
+    axes while a handful of recent tunings stay warm. window defaults to
+    the engine's own. FFTs run on scipy.fft, which also
+    keeps its own plan cache and spreads batched frames over `workers`.
+    """
+
+    def __init__(self, window="hann", workers=-1, max_plans=16):
+        self.window = window
+        self.workers = workers
+        self.max_plans = max_plans
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def plan(self, fft_size, sample_rate, center_freq, window=None):
+        key = (int(fft_size), float(sample_rate), float(center_freq), window or self.window)
+        with self._lock:
+            plan = self._plans.pop(key, None)
+            if plan is None:
+                plan = SpectrumPlan(*key)
+                if len(self._plans) >= self.max_plans:
+                    # Dicts keep insertion order: the first key is the stalest
+                    del self._plans[next(iter(self._plans))]
+            self._plans[key] = plan
+        return plan
+
+    def _frame_power(self, frames, plan):
+        """Linear power of every frame (last axis) in one batched FFT, centred."""
+        spectra = fft.fft(frames * plan.window, axis=-1, workers=self.workers, overwrite_x=True)
+        power = np.abs(spectra)
+        power *= power
+        if not plan.shifted:
+            power = np.fft.fftshift(power, axes=-1)
+        return power
+
+    def power(self, iq_samples, plan, averages=1, overlap=0.5, max_hold=False):
+        """Welch-averaged (or max-held) linear power, ordered like plan.freqs_mhz."""
+        power = self._frame_power(welch_frames(iq_samples, plan.fft_size, averages, overlap), plan)
+        return power.max(axis=0) if max_hold else power.mean(axis=0)
+
+    def power_db(self, iq_samples, plan, averages=1, overlap=0.5, max_hold=False):
+        """power() in dB."""
+        return 10 * np.log10(self.power(iq_samples, plan, averages, overlap, max_hold) + 1e-10)
+
+    def waterfall_power(self, iq_samples, plan, num_rows, overlap=0.5):
+        """Linear power rows over consecutive slices of a block, oldest first.
+
+        Each slice is Welch-averaged over its own overlapping frames, and all
+        rows go through a single batched FFT. Returns shape (rows, fft_size);
+        fewer rows if the block can't give each one a full frame.
+        """
+        num_rows = max(1, min(num_rows, len(iq_samples) // plan.fft_size))
+        seg = len(iq_samples) // num_rows
+        # Drop the oldest remainder so the last row ends on the newest sample
+        segments = iq_samples[len(iq_samples) - num_rows * seg:].reshape(num_rows, seg)
+        hop = max(1, int(plan.fft_size * (1 - overlap)))
+        frames = sliding_window_view(segments, plan.fft_size, axis=1)[:, ::hop]
+        return self._frame_power(frames, plan).mean(axis=1)
+
+    def compute(self, iq_samples, sample_rate, center_freq, fft_size=1024,
+                averages=1, overlap=0.5, max_hold=False):
+        plan = self.plan(fft_size, sample_rate, center_freq)
+        return plan.freqs_mhz, self.power_db(iq_samples, plan, averages, overlap, max_hold)
 
+    def stats(self):
+        with self._lock:
+            return {"plans": len(self._plans), "max_plans": self.max_plans, "window": self.window}
 
-def compute_spectrum(iq_samples, sample_rate, center_freq, fft_size=1024):
-    """Compute power spectrum from IQ samples. Returns (freqs_mhz, power_db)."""
-    x = iq_samples[-fft_size:]
 
-    window = np.hanning(fft_size)
-    spectrum = np.fft.fftshift(np.fft.fft(x * window))
-    power_db = 10 * np.log10(np.abs(spectrum) ** 2 + 1e-10)
+# Shared by web.py's stream, the spectrum workers, the scanners and the MCP tools
+engine = SpectrumEngine()
 
-    freqs = np.fft.fftshift(np.fft.fftfreq(fft_size, 1 / sample_rate))
-    freqs_mhz = (freqs + center_freq) / 1e6
 
-    return freqs_mhz, power_db
+def reduce_to_pixels(power_db, freqs, start, stop, width):
+    """(low, high) per pixel: min and max of the bins falling in each column.
+
+    Columns narrower than a bin repeat the bin under them, so the output is
+    always width long and never loses a narrow peak.
+    """
+    edges = start + (stop - start) * np.arange(width) / width
+    idx = np.clip(np.searchsorted(freqs, edges), 0, len(power_db) - 1)
+    return np.minimum.reduceat(power_db, idx), np.maximum.reduceat(power_db, idx)
+
+
+class ZoomSpectrum:
+    """High-resolution spectrum of a viewport inside a streaming capture.
+
+    A DDC moves the viewport center to DC and decimates to just over the
+    viewport width, then a long Welch FFT at that low rate gives at least
+    two bins per pixel (up to MAX_FFT), and the result is reduced to a
+    min/max pair per pixel. Viewports wider than half the capture skip
+    the DDC. Decimated samples carry over between blocks, so FFTs longer
+    than one block's worth still see fresh data every call.
+    """
+
+    MAX_FFT = 1 << 20
+
+    def __init__(self, sample_rate, center_freq, start, stop, width, overlap=0.5, engine=engine):
+        from demod import DDC
+
+        self.sample_rate = sample_rate
+        self.center_freq = center_freq
+        self.start = start
+        self.stop = stop
+        self.width = width
+        self.overlap = overlap
+        self.engine = engine
+        span = stop - start
+        self.ddc = None
+        rate = sample_rate
+        if span < sample_rate / 2:
+            mid = (start + stop) / 2
+            self.ddc = DDC(sample_rate, mid - center_freq, 1.25 * span, span)
+            rate = self.ddc.output_rate
+            # The NCO snaps its frequency; center the axis on what it really mixed
+            mid = center_freq + self.ddc.offset
+        else:
+            mid = center_freq
+        self.rate = rate
+        needed = 2 * width * rate / span
+        self.fft_size = min(1 << max(int(np.ceil(np.log2(needed))), 4), self.MAX_FFT)
+        self.plan = engine.plan(self.fft_size, rate, mid)
+        self.freqs = self.plan.freqs_mhz * 1e6
+        self._tail = np.zeros(0, dtype=np.complex64)
+
+    def process(self, iq_samples):
+        """Returns (low_db, high_db), each `width` long, for one IQ block."""
+        x = iq_samples if self.ddc is None else self.ddc.process(iq_samples)
+        x = np.concatenate((self._tail, x.astype(np.complex64, copy=False)))
+        self._tail = x[-self.fft_size:]
+        if len(x) < self.fft_size:
+            x = np.concatenate((np.zeros(self.fft_size - len(x), dtype=np.complex64), x))
+        power_db = self.engine.power_db(x, self.plan, 0, self.overlap)
+        return reduce_to_pixels(power_db, self.freqs, self.start, self.stop, self.width)
+
+
+def compute_spectrum(iq_samples, sample_rate, center_freq, fft_size=1024,
+                     averages=1, overlap=0.5, max_hold=False):
+    """Compute power spectrum from IQ samples. Returns (freqs_mhz, power_db).
+
+    With averages > 1 (or 0 for the whole capture) the overlapping frames are
+    windowed in one broadcast and transformed in a single batched FFT, then
+    their power is averaged (Welch) or, with max_hold, peak-held per bin.
+    """
+    return engine.compute(
+        iq_samples, sample_rate, center_freq, fft_size, averages, overlap, max_hold
+    )
 
 
 def plot_spectrum(freqs_mhz, power_db):
@@ -29,23 +204,90 @@ def plot_spectrum(freqs_mhz, power_db):
     plt.show()
 
 
-def ascii_spectrum(freqs_mhz, power_db, width=80, height=20):
-    """Terminal-based ASCII spectrum display."""
-    indices = np.linspace(0, len(power_db) - 1, width, dtype=int)
-    values = power_db[indices]
-    freqs = freqs_mhz[indices]
+# Eighth blocks for 8 levels per character row
+_BLOCK_CHARS = np.array(list(" \u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588"))
+# Every braille pattern, indexed by its dot bits
+_BRAILLE_CHARS = np.array([chr(0x2800 + i) for i in range(256)])
+# Dot bits from the top dot row down, for the left and right dot columns
+_BRAILLE_BITS = np.array([[0x01, 0x08], [0x02, 0x10], [0x04, 0x20], [0x40, 0x80]])
+ASCII_STYLES = ("ascii", "blocks", "braille")
+
+
+def _join_rows(chars):
+    """(rows, cols) array of single characters -> list of row strings."""
+    chars = np.ascontiguousarray(chars, dtype="<U1")
+    return chars.view(f"<U{chars.shape[1]}").ravel().tolist()
+
+
+def ascii_spectrum(freqs_mhz, power_db, width=80, height=20, style="ascii", markers=False):
+    """Terminal-based spectrum display.
+
+    style: "ascii" ('#' bars), "blocks" (eighth blocks, 8 levels per row)
+    or "braille" (2x4 dots per character). Each column shows the strongest
+    bin under it. A 2-D power_db (frames x bins) is averaged in linear
+    power first. markers adds the noise floor (median) as a dotted row and
+    a line pointing at the peak.
+    """
+    power_db = np.asarray(power_db, dtype=np.float64)
+    if power_db.ndim == 2:
+        power_db = 10 * np.log10(np.mean(10 ** (power_db / 10), axis=0))
+    dots_x = 2 if style == "braille" else 1
+    levels = {"ascii": 1, "blocks": 8, "braille": 4}[style]
+
+    cols = min(width * dots_x, len(power_db))
+    edges = np.linspace(0, len(power_db), cols, endpoint=False).astype(int)
+    values = np.maximum.reduceat(power_db, edges)
+    if cols < width * dots_x:
+        values = values[np.linspace(0, cols - 1, width * dots_x).astype(int)]
 
     vmin, vmax = values.min(), values.max()
     if vmax - vmin < 1e-6:
         vmax = vmin + 1
-    normalized = ((values - vmin) / (vmax - vmin) * height).astype(int)
+    scale = height * levels / (vmax - vmin)
+    floor = np.median(power_db)
+
+    if style == "ascii":
+        normalized = ((values - vmin) * scale).astype(int)
+        rows = np.arange(height, -1, -1)
+        chars = np.where(normalized >= rows[:, None], "#", " ")
+        blank = " "
+        floor_row = height - int((floor - vmin) * scale)
+    elif style == "blocks":
+        filled = np.rint((values - vmin) * scale).astype(int)
+        rows = np.arange(height - 1, -1, -1) * 8
+        chars = _BLOCK_CHARS[np.clip(filled - rows[:, None], 0, 8)]
+        blank = " "
+        floor_row = height - 1 - min(int((floor - vmin) * scale) // 8, height - 1)
+    else:
+        filled = np.rint((values - vmin) * scale).astype(int).reshape(width, 2)
+        # Dot height above the bottom for each (char row, dot row)
+        dot = (np.arange(height - 1, -1, -1)[:, None] * 4 + np.arange(3, -1, -1))[:, :, None, None]
+        on = filled[None, None, :, :] > dot  # (rows, 4 dot rows, width, 2 dot cols)
+        bits = (on * _BRAILLE_BITS[None, :, None, :]).sum(axis=(1, 3))
+        chars = _BRAILLE_CHARS[bits]
+        blank = _BRAILLE_CHARS[0]
+        floor_row = height - 1 - min(int((floor - vmin) * scale) // 4, height - 1)
 
-    lines = []
-    for row in range(height, -1, -1):
-        line = ""
-        for col in range(width):
-            line += "#" if normalized[col] >= row else " "
-        lines.append(line)
+    lines_chars = np.array(chars)
+    if markers and 0 <= floor_row < len(lines_chars):
+        row = lines_chars[floor_row]
+        row[row == blank] = "\u00b7"
+    lines = _join_rows(lines_chars)
 
-    lines.append(f"{freqs[0]:.1f} MHz{' ' * (width - 20)}{freqs[-1]:.1f} MHz")
+    if markers:
+        peak = int(np.argmax(power_db))
+        col = min(int(peak * width / len(power_db)), width - 1)
+        short = f" peak {freqs_mhz[peak]:.4f} MHz {power_db[peak]:.1f} dB"
+        # Right of the marker if it fits, else ending at it; the floor is
+        # dropped before anything is cut off at the edge
+        for label in (f"{short}, floor {floor:.1f} dB", short):
+            if col + 1 + len(label) <= width:
+                lines.append(" " * col + "^" + label)
+                break
+            if col >= len(label):
+                lines.append(" " * (col - len(label)) + label.strip() + " ^")
+                break
+        else:
+            lines.append((" " * col + "^" + short)[:width])
+    lines.append(f"{freqs_mhz[0]:.1f} MHz{' ' * (width - 20)}{freqs_mhz[-1]:.1f} MHz")
     return "\n".join(lines)
@@ -14,7 +14,8 @@ const wfCanvas = $("waterfall");
 let specCtx, wfCtx;
 
 // Zoom/pan state
-let zoomLevel = 1;    // 1 = full span, 16 = max zoom
+let zoomLevel = 1;    // 1 = full span, MAX_ZOOM = narrowest server-side zoom
+const MAX_ZOOM = 1024;
 let panCenter = 0.5;  // 0-1, center of visible window in FFT
 let isDragging = false;
 let dragStartX = 0;
@@ -38,7 +39,8 @@ const SPEC_BOTTOM = 24;
 const SPEC_TOP = 8;
 
 function visibleSlice(arr) {
-    if (zoomLevel <= 1) return arr;
+    // Viewport frames are already zoomed server-side
+    if (zoomLevel <= 1 || frameIsViewport) return arr;
     const half = (1 / zoomLevel) / 2;
     const start = Math.max(0, Math.floor((panCenter - half) * arr.length));
     const end = Math.min(arr.length, Math.ceil((panCenter + half) * arr.length));
@@ -48,10 +50,11 @@ function visibleSlice(arr) {
 // Bandwidth per mode in kHz (for filter overlay)
 const MODE_BANDWIDTHS = { wfm: 200, fm: 200, nfm: 12.5, am: 25 };
 
-function drawSpectrum(freqs, power, centerFreq) {
+function drawSpectrum(freqs, power, centerFreq, low = null) {
     // Apply zoom/pan: slice to visible window
     const visFreqs = visibleSlice(freqs);
     const visPower = visibleSlice(power);
+    const visLow = low ? visibleSlice(low) : null;
 
     const w = specCanvas.getBoundingClientRect().width;
     const h = specCanvas.getBoundingClientRect().height;
@@ -63,7 +66,7 @@ function drawSpectrum(freqs, power, centerFreq) {
     ctx.fillStyle = "#060a0f";
     ctx.fillRect(0, 0, w, h);
 
-    const minP = Math.min(...visPower);
+    const minP = Math.min(...(visLow || visPower));
     const maxP = Math.max(...visPower);
     const dbMin = Math.floor(minP / 10) * 10;
     const dbMax = Math.ceil(maxP / 10) * 10;
@@ -111,7 +114,7 @@ function drawSpectrum(freqs, power, centerFreq) {
         ctx.fillText(f.toFixed(decimals), x, h - 6);
     }
 
-    // Center frequency marker
+    // Tuned frequency marker (may sit off the hardware center via the DDC)
     if (centerFreq >= freqStart && centerFreq <= freqEnd) {
         const centerX = SPEC_LEFT + ((centerFreq - freqStart) / freqSpan) * plotW;
         ctx.strokeStyle = "rgba(255, 80, 80, 0.5)";
@@ -140,6 +143,19 @@ function drawSpectrum(freqs, power, centerFreq) {
         ctx.strokeRect(Math.max(SPEC_LEFT, filterLeft), SPEC_TOP, Math.min(filterW, plotW), plotH);
     }
 
+    // Per-pixel min/max envelope of a server-reduced viewport
+    if (visLow) {
+        ctx.strokeStyle = "rgba(0, 212, 170, 0.25)";
+        ctx.lineWidth = 1;
+        ctx.beginPath();
+        for (let i = 0; i < visLow.length; i++) {
+            const x = SPEC_LEFT + (i / visLow.length) * plotW;
+            ctx.moveTo(x, SPEC_TOP + plotH - ((visLow[i] - dbMin) / dbRange) * plotH);
+            ctx.lineTo(x, SPEC_TOP + plotH - ((visPower[i] - dbMin) / dbRange) * plotH);
+        }
+        ctx.stroke();
+    }
+
     // Spectrum line
     ctx.strokeStyle = "#00d4aa";
     ctx.lineWidth = 1.5;
@@ -206,38 +222,50 @@ const WF_ALPHA = 0.05;
 // Bands data for bookmark markers (populated by loadBands)
 let bandsData = {};
 
-function drawWaterfall(power) {
+// rows: power arrays oldest first; several per message at high waterfall rates
+function drawWaterfall(rows) {
     const w = wfCanvas.width;
     const h = wfCanvas.height;
     const ctx = wfCtx;
+    const n = Math.min(rows.length, h);
 
-    // Shift down 1 pixel (in canvas coordinates)
-    if (h > 1) {
-        const img = ctx.getImageData(0, 0, w, h - 1);
-        ctx.putImageData(img, 0, 1);
+    // Shift down n pixels (in canvas coordinates)
+    if (h > n) {
+        const img = ctx.getImageData(0, 0, w, h - n);
+        ctx.putImageData(img, 0, n);
     }
 
     // Apply zoom/pan: slice power to visible window
-    const vis = visibleSlice(power);
+    const visRows = rows.slice(-n).map(visibleSlice);
 
     // Auto-level with exponential smoothing
-    const frameMin = Math.min(...vis);
-    const frameMax = Math.max(...vis);
+    let frameMin = Infinity, frameMax = -Infinity;
+    for (const vis of visRows) {
+        for (const v of vis) {
+            if (v < frameMin) frameMin = v;
+            if (v > frameMax) frameMax = v;
+        }
+    }
     wfMin += WF_ALPHA * (frameMin - wfMin);
     wfMax += WF_ALPHA * (frameMax - wfMax);
     const range = wfMax - wfMin || 1;
 
-    const row = ctx.createImageData(w, 1);
-    for (let i = 0; i < w; i++) {
-        const idx = Math.floor((i / w) * vis.length);
-        const norm = Math.max(0, Math.min(1, (vis[idx] - wfMin) / range));
-        const ci = (norm * 255) | 0;
-        row.data[i * 4] = COLOR_LUT[ci * 3];
-        row.data[i * 4 + 1] = COLOR_LUT[ci * 3 + 1];
-        row.data[i * 4 + 2] = COLOR_LUT[ci * 3 + 2];
-        row.data[i * 4 + 3] = 255;
-    }
-    ctx.putImageData(row, 0, 0);
+    // Newest row on top
+    const block = ctx.createImageData(w, n);
+    visRows.forEach((vis, r) => {
+        const base = (n - 1 - r) * w * 4;
+        for (let i = 0; i < w; i++) {
+            const idx = Math.floor((i / w) * vis.length);
+            const norm = Math.max(0, Math.min(1, (vis[idx] - wfMin) / range));
+            const ci = (norm * 255) | 0;
+            const p = base + i * 4;
+            block.data[p] = COLOR_LUT[ci * 3];
+            block.data[p + 1] = COLOR_LUT[ci * 3 + 1];
+            block.data[p + 2] = COLOR_LUT[ci * 3 + 2];
+            block.data[p + 3] = 255;
+        }
+    });
+    ctx.putImageData(block, 0, 0);
 }
 
 function drawBookmarks(ctx, visFreqs, freqStart, freqEnd, freqSpan, plotW, plotH, canvasH) {
@@ -284,10 +312,10 @@ function initAudio() {
     nextPlayTime = audioCtx.currentTime;
 }
 
-function playAudio(arrayBuffer) {
+function playAudio(arrayBuffer, offset = 0) {
     if (!audioCtx || audioCtx.state === "closed") return;
 
-    const int16 = new Int16Array(arrayBuffer);
+    const int16 = new Int16Array(arrayBuffer, offset);
     const float32 = new Float32Array(int16.length);
     for (let i = 0; i < int16.length; i++) {
         float32[i] = int16[i] / 32768;
@@ -306,6 +334,150 @@ function playAudio(arrayBuffer) {
     nextPlayTime += buffer.duration;
 }
 
+// --- Binary spectrum frames ---
+
+// 4-byte tags read as little-endian uint32: "PCM0", "SPEC"
+const PCM_TAG = 0x304d4350;
+const SPEC_TAG = 0x43455053;
+// Header layout matches SPECTRUM_HEADER in web.py ("<4sIdddddfffIHBB")
+const SPEC_HEADER_SIZE = 68;
+const FLAG_LOW = 1;
+const FLAG_VIEWPORT = 2;
+
+let axisKey = "";
+let halfLUT = null;
+// Capture the current frames come from, for mapping zoom/pan to a viewport
+let captureCenter = 0, captureSpan = 0;
+let frameIsViewport = false;
+
+function halfToFloatLUT() {
+    if (halfLUT) return halfLUT;
+    halfLUT = new Float32Array(65536);
+    for (let h = 0; h < 65536; h++) {
+        const sign = h & 0x8000 ? -1 : 1;
+        const exp = (h >> 10) & 0x1f;
+        const frac = h & 0x3ff;
+        if (exp === 0) halfLUT[h] = sign * Math.pow(2, -14) * (frac / 1024);
+        else if (exp === 31) halfLUT[h] = frac ? NaN : sign * Infinity;
+        else halfLUT[h] = sign * Math.pow(2, exp - 15) * (1 + frac / 1024);
+    }
+    return halfLUT;
+}
+
+function decodeSpectrum(buf) {
+    const view = new DataView(buf);
+    const center = view.getFloat64(8, true);
+    const span = view.getFloat64(16, true);
+    const tuned = view.getFloat64(24, true);
+    const start = view.getFloat64(32, true);
+    const stop = view.getFloat64(40, true);
+    const offset = view.getFloat32(48, true);
+    const step = view.getFloat32(52, true);
+    const peak = view.getFloat32(56, true);
+    const bins = view.getUint32(60, true);
+    const rows = view.getUint16(64, true);
+    const encoding = view.getUint8(66);
+    const flags = view.getUint8(67);
+
+    if (center !== captureCenter || span !== captureSpan) {
+        captureCenter = center;
+        captureSpan = span;
+        // A retune moves the capture under the viewport; ask again
+        if (zoomLevel > 1) sendViewport();
+    }
+    frameIsViewport = (flags & FLAG_VIEWPORT) !== 0;
+
+    // The axis only changes on retune, zoom or FFT size change
+    const key = `${start}/${stop}/${bins}`;
+    if (key !== axisKey) {
+        axisKey = key;
+        currentFreqs = new Float64Array(bins);
+        for (let i = 0; i < bins; i++) {
+            currentFreqs[i] = (start + i * ((stop - start) / bins)) / 1e6;
+        }
+    }
+
+    const lowRows = flags & FLAG_LOW ? 1 : 0;
+    const values = new Float32Array(bins * (1 + lowRows + rows));
+    if (encoding === 2) {
+        const lut = halfToFloatLUT();
+        const raw = new Uint16Array(buf, SPEC_HEADER_SIZE, values.length);
+        for (let i = 0; i < values.length; i++) values[i] = lut[raw[i]];
+    } else {
+        const raw = new Uint8Array(buf, SPEC_HEADER_SIZE, values.length);
+        for (let i = 0; i < values.length; i++) values[i] = offset + raw[i] * step;
+    }
+    const waterfall = [];
+    for (let r = 1 + lowRows; r <= lowRows + rows; r++) {
+        waterfall.push(values.subarray(r * bins, (r + 1) * bins));
+    }
+    return {
+        power: values.subarray(0, bins),
+        low: lowRows ? values.subarray(bins, 2 * bins) : null,
+        waterfall: rows ? waterfall : null,
+        tuned_freq: tuned / 1e6,
+        peak_power: peak,
+    };
+}
+
+// Ask the server for a zoomed spectrum of what's on screen (throttled)
+let viewportTimer = null;
+function sendViewport() {
+    if (viewportTimer) return;
+    viewportTimer = setTimeout(() => {
+        viewportTimer = null;
+        if (!ws || ws.readyState !== 1 || !captureSpan) return;
+        if (zoomLevel <= 1) {
+            ws.send(JSON.stringify({ type: "viewport", reset: true }));
+            return;
+        }
+        const half = (1 / zoomLevel) / 2;
+        const left = captureCenter - captureSpan / 2;
+        const width = Math.round(specCanvas.getBoundingClientRect().width - SPEC_LEFT);
+        ws.send(JSON.stringify({
+            type: "viewport",
+            start_hz: left + (panCenter - half) * captureSpan,
+            end_hz: left + (panCenter + half) * captureSpan,
+            width,
+        }));
+    }, 100);
+}
+
+// Paint the server's recent waterfall so a new or reloaded viewer doesn't start blank
+async function loadWaterfallHistory() {
+    const w = wfCanvas.width;
+    const h = wfCanvas.height;
+    const rate = parseFloat($("waterfallRate").value) || 8;
+    const params = new URLSearchParams({ rows: h, cols: w, seconds: h / rate });
+    if (zoomLevel > 1 && captureSpan) {
+        const half = (1 / zoomLevel) / 2;
+        const left = captureCenter - captureSpan / 2;
+        params.set("start_mhz", (left + (panCenter - half) * captureSpan) / 1e6);
+        params.set("end_mhz", (left + (panCenter + half) * captureSpan) / 1e6);
+    }
+    const resp = await fetch(`/api/waterfall?${params}`);
+    const tile = await resp.json();
+    if (!tile.rows) return;
+
+    const raw = Uint8Array.from(atob(tile.data), (c) => c.charCodeAt(0));
+    wfMin = tile.db_offset;
+    wfMax = tile.db_offset + 255 * tile.db_step;
+    const img = wfCtx.createImageData(w, h);
+    // Oldest row first in the tile; newest goes on top, stretched to fit
+    for (let y = 0; y < h; y++) {
+        const r = tile.rows - 1 - Math.floor((y / h) * tile.rows);
+        for (let x = 0; x < w; x++) {
+            const ci = raw[r * tile.cols + Math.floor((x / w) * tile.cols)];
+            const p = (y * w + x) * 4;
+            img.data[p] = COLOR_LUT[ci * 3];
+            img.data[p + 1] = COLOR_LUT[ci * 3 + 1];
+            img.data[p + 2] = COLOR_LUT[ci * 3 + 2];
+            img.data[p + 3] = 255;
+        }
+    }
+    wfCtx.putImageData(img, 0, 0);
+}
+
 // --- WebSocket ---
 
 function connect() {
@@ -316,21 +488,25 @@ function connect() {
 
     ws.onopen = () => {
         console.log("WebSocket connected");
+        loadWaterfallHistory();
     };
 
     ws.onmessage = (event) => {
         if (typeof event.data === "string") {
             const msg = JSON.parse(event.data);
-            if (msg.type === "spectrum") {
-                currentFreqs = msg.freqs;
-                drawSpectrum(msg.freqs, msg.power, msg.center_freq);
-                drawWaterfall(msg.power);
-                updatePower(msg.peak_power);
-            } else if (msg.type === "digital") {
+            if (msg.type === "digital") {
                 showDigitalOverlay(msg);
             }
-        } else {
-            playAudio(event.data);
+            return;
+        }
+        const tag = new DataView(event.data).getUint32(0, true);
+        if (tag === SPEC_TAG) {
+            const msg = decodeSpectrum(event.data);
+            drawSpectrum(currentFreqs, msg.power, msg.tuned_freq, msg.low);
+            drawWaterfall(msg.waterfall || [msg.power]);
+            updatePower(msg.peak_power);
+        } else if (tag === PCM_TAG) {
+            playAudio(event.data, 4);
         }
     };
 
@@ -465,6 +641,14 @@ function gainChanged() {
     }
 }
 
+async function setWaterfallRate(rate) {
+    await fetch("/api/spectrum", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ waterfall_rate: parseFloat(rate) }),
+    });
+}
+
 // --- Click-to-tune, zoom, pan on spectrum and waterfall ---
 
 function pixelToFreq(e, canvas) {
@@ -487,7 +671,7 @@ function clickToTune(e, canvas) {
 function handleZoom(e) {
     e.preventDefault();
     const delta = e.deltaY > 0 ? -1 : 1;
-    const newZoom = Math.max(1, Math.min(16, zoomLevel * (1 + delta * 0.2)));
+    const newZoom = Math.max(1, Math.min(MAX_ZOOM, zoomLevel * (1 + delta * 0.2)));
 
     // Zoom toward mouse position
     if (currentFreqs.length && newZoom > 1) {
@@ -503,6 +687,7 @@ function handleZoom(e) {
     // Clamp pan so we don't go out of bounds
     const half = (1 / zoomLevel) / 2;
     panCenter = Math.max(half, Math.min(1 - half, panCenter));
+    sendViewport();
 }
 
 // Pan: click-drag
@@ -530,6 +715,7 @@ function handleMouseMove(e) {
     panCenter = Math.max(half, Math.min(1 - half, panCenter));
 
     if (Math.abs(dx) > 3) dragMoved = true;
+    sendViewport();
 }
 
 function handleMouseUp(e) {
@@ -753,32 +939,58 @@ async function smartTune(freqMhz) {
 
 // --- Scanner ---
 
-async function runScan() {
-    const btn = $("scanBtn");
-    btn.disabled = true;
-    btn.textContent = "Scanning...";
+let scanSocket = null;
 
-    const resp = await fetch("/api/scan", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-            start_mhz: parseFloat($("scanStart").value),
-            end_mhz: parseFloat($("scanEnd").value),
-        }),
-    });
-    const signals = await resp.json();
-
-    let html = "<table><tr><th>Freq (MHz)</th><th>Power (dB)</th></tr>";
+function renderScanResults(signals, note) {
+    let html = "<table><tr><th>Freq (MHz)</th><th>Power (dB)</th><th>SNR (dB)</th></tr>";
     for (const s of signals) {
         html += `<tr onclick="tuneToFreq(${s.freq_mhz})">`;
-        html += `<td>${s.freq_mhz.toFixed(3)}</td><td>${s.power_db}</td></tr>`;
+        html += `<td>${s.freq_mhz.toFixed(3)}</td><td>${s.power_db}</td><td>${s.snr_db}</td></tr>`;
     }
     html += "</table>";
-    if (!signals.length) html = '<div style="color:#484f58;font-size:12px;padding:8px">No signals found</div>';
+    if (!signals.length) html = "";
+    if (note) html += `<div style="color:#484f58;font-size:12px;padding:8px">${note}</div>`;
     $("scanResults").innerHTML = html;
+}
+
+function runScan() {
+    const btn = $("scanBtn");
+    // A second click cancels the sweep in progress
+    if (scanSocket) {
+        scanSocket.send(JSON.stringify({ type: "cancel" }));
+        btn.disabled = true;
+        return;
+    }
+    btn.textContent = "Cancel";
 
-    btn.disabled = false;
-    btn.textContent = "Scan";
+    const signals = [];
+    const proto = location.protocol === "https:" ? "wss:" : "ws:";
+    scanSocket = new WebSocket(`${proto}//${location.host}/ws/scan`);
+    scanSocket.onopen = () => {
+        scanSocket.send(JSON.stringify({
+            type: "scan",
+            start_mhz: parseFloat($("scanStart").value),
+            end_mhz: parseFloat($("scanEnd").value),
+        }));
+    };
+    scanSocket.onmessage = (event) => {
+        const msg = JSON.parse(event.data);
+        if (msg.type === "scan_progress") {
+            signals.push(...msg.signals);
+            signals.sort((a, b) => b.power_db - a.power_db);
+            renderScanResults(signals, `Hop ${msg.hop}/${msg.hops} (${msg.end_mhz.toFixed(3)} MHz)`);
+        } else if (msg.type === "scan_done") {
+            const note = msg.cancelled ? "Scan cancelled" : (msg.signals.length ? "" : "No signals found");
+            renderScanResults(msg.signals, note);
+        } else if (msg.type === "scan_error") {
+            renderScanResults(signals, "Error: " + msg.error);
+        }
+    };
+    scanSocket.onclose = () => {
+        scanSocket = null;
+        btn.disabled = false;
+        btn.textContent = "Scan";
+    };
 }
 
 // --- Recording ---
@@ -0,0 +1,267 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from scanner import HopScan
+from waterfall import quantize_rows
+
+log = logging.getLogger("sdr.survey")
+
+# Per-row time and dequantization, alongside the uint8 rows
+INDEX_DTYPE = np.dtype([("time", "<f8"), ("db_offset", "<f4"), ("db_step", "<f4")])
+# Rows added to the files each time they fill up
+GROW_ROWS = 256
+# Source rows dequantized at once while reducing a query window
+CHUNK_ROWS = 64
+
+
+def list_archives(directory):
+    """Names of the survey archives in a directory."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(f[:-5] for f in os.listdir(directory) if f.endswith(".json"))
+
+
+class SurveyArchive:
+    """Growable on-disk time x frequency power archive, like rtl_power's CSV.
+
+    Every sweep is one uint8 row in <path>.u8 (np.memmap, grown GROW_ROWS
+    at a time), quantized over its own dB range; <path>.idx holds each
+    row's time and dequantization, and <path>.json the frequency axis and
+    row count. Readers map only the rows written so far, read-only, and
+    window() reduces a query in chunks, so heatmaps of any time/frequency
+    window never load the whole archive.
+    """
+
+    def __init__(self, path, mode="r"):
+        self.path = path
+        self.mode = mode
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        self.start_freq = meta["start_freq"]
+        self.bin_hz = meta["bin_hz"]
+        self.bins = meta["bins"]
+        self.rows = meta["rows"]
+        self.created = meta["created"]
+        self._lock = threading.Lock()
+        self._map(self.rows if mode == "r" else max(self.rows, GROW_ROWS))
+
+    @classmethod
+    def create(cls, path, start_freq, end_freq, bin_hz):
+        """New empty archive with bins every bin_hz from start_freq to end_freq."""
+        bins = int(np.floor((end_freq - start_freq) / bin_hz + 1e-9)) + 1
+        meta = {
+            "start_freq": start_freq, "bin_hz": bin_hz, "bins": bins, "rows": 0, "created": time.time(),
+        }
+        with open(path + ".json", "w") as f:
+            json.dump(meta, f)
+        for ext in (".u8", ".idx"):
+            open(path + ext, "wb").close()
+        return cls(path, mode="r+")
+
+    @property
+    def end_freq(self):
+        return self.start_freq + (self.bins - 1) * self.bin_hz
+
+    @property
+    def freqs(self):
+        """Bin centers in Hz."""
+        return self.start_freq + self.bin_hz * np.arange(self.bins)
+
+    def _map(self, capacity):
+        self.capacity = capacity
+        if not capacity:
+            self.data = np.zeros((0, self.bins), dtype=np.uint8)
+            self.index = np.zeros(0, dtype=INDEX_DTYPE)
+            return
+        if self.mode != "r":
+            for ext, row_bytes in ((".u8", self.bins), (".idx", INDEX_DTYPE.itemsize)):
+                with open(self.path + ext, "r+b") as f:
+                    f.truncate(capacity * row_bytes)
+        self.data = np.memmap(self.path + ".u8", dtype=np.uint8, mode=self.mode, shape=(capacity, self.bins))
+        self.index = np.memmap(self.path + ".idx", dtype=INDEX_DTYPE, mode=self.mode, shape=(capacity,))
+
+    def _save_meta(self):
+        meta = {
+            "start_freq": self.start_freq, "bin_hz": self.bin_hz, "bins": self.bins,
+            "rows": self.rows, "created": self.created,
+        }
+        tmp = self.path + ".json.tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.path + ".json")
+
+    def append(self, row_db, t):
+        """Add one sweep (power in dB per bin) taken at epoch time t."""
+        quantized, lo, step = quantize_rows(np.asarray(row_db, dtype=np.float64)[None, :])
+        with self._lock:
+            if self.rows == self.capacity:
+                self.data.flush()
+                self.index.flush()
+                self._map(self.capacity + GROW_ROWS)
+            self.data[self.rows] = quantized[0]
+            self.index[self.rows] = (t, lo[0], step[0])
+            self.data.flush()
+            self.index.flush()
+            # Rows count last, so readers never map a half-written row
+            self.rows += 1
+            self._save_meta()
+
+    def window(self, t_start=None, t_end=None, start_freq=None, end_freq=None, rows=256, cols=512):
+        """Max-reduced heatmap of a time/frequency window, or None if it's empty.
+
+        Same shape of result as WaterfallHistory.window: a (rows, cols)
+        uint8 "data" array, oldest row first, with db_offset/db_step and the
+        window actually covered. Never upsamples.
+        """
+        with self._lock:
+            count = self.rows
+            times = np.asarray(self.index["time"][:count])
+            first = np.searchsorted(times, t_start) if t_start is not None else 0
+            last = np.searchsorted(times, t_end, side="right") if t_end is not None else count
+            if last <= first:
+                return None
+            b0, b1 = 0, self.bins
+            if start_freq is not None:
+                b0 = int(np.clip(np.floor((start_freq - self.start_freq) / self.bin_hz + 0.5), 0, self.bins - 1))
+            if end_freq is not None:
+                b1 = int(np.clip(np.floor((end_freq - self.start_freq) / self.bin_hz + 0.5) + 1, b0 + 1, self.bins))
+            rows = max(1, min(rows, last - first))
+            cols = max(1, min(cols, b1 - b0))
+            row_edges = first + np.linspace(0, last - first, rows + 1).astype(int)
+            col_starts = np.linspace(0, b1 - b0, cols, endpoint=False).astype(int)
+            out = np.full((rows, cols), -np.inf, dtype=np.float32)
+            for r in range(rows):
+                for c0 in range(row_edges[r], row_edges[r + 1], CHUNK_ROWS):
+                    c1 = min(c0 + CHUNK_ROWS, row_edges[r + 1])
+                    index = self.index[c0:c1]
+                    db = index["db_offset"][:, None] + self.data[c0:c1, b0:b1] * index["db_step"][:, None]
+                    out[r] = np.maximum(out[r], np.maximum.reduceat(db.max(axis=0), col_starts))
+            t0, t1 = float(times[first]), float(times[last - 1])
+
+        lo = float(out.min())
+        step = max(float(out.max()) - lo, 1e-3) / 255
+        return {
+            "data": np.rint((out - lo) / step).astype(np.uint8),
+            "db_offset": lo,
+            "db_step": step,
+            "t_start": t0,
+            "t_end": t1,
+            "start_hz": self.start_freq + (b0 - 0.5) * self.bin_hz,
+            "end_hz": self.start_freq + (b1 - 0.5) * self.bin_hz,
+        }
+
+    def stats(self):
+        with self._lock:
+            times = self.index["time"][:self.rows]
+            return {
+                "name": os.path.basename(self.path),
+                "start_freq_mhz": self.start_freq / 1e6,
+                "end_freq_mhz": self.end_freq / 1e6,
+                "bin_khz": self.bin_hz / 1e3,
+                "bins": self.bins,
+                "rows": self.rows,
+                "first": float(times[0]) if self.rows else None,
+                "last": float(times[-1]) if self.rows else None,
+                "size_mb": round(self.rows * (self.bins + INDEX_DTYPE.itemsize) / 1e6, 1),
+            }
+
+    def close(self):
+        with self._lock:
+            self.data = self.index = None
+
+
+class Survey:
+    """rtl_power-style survey: back-to-back hop-FFT sweeps into an archive.
+
+    Each sweep is a HopScan over the archive's bins (channel bandwidth =
+    bin width), appended as one row stamped with the sweep's start time.
+    Runs in a background thread until stop() or `sweeps` sweeps.
+    """
+
+    def __init__(self, sdr, archive, dwell_ms=20, settle_samples=None):
+        self.sdr = sdr
+        self.archive = archive
+        self.dwell_ms = dwell_ms
+        self.settle_samples = settle_samples
+        self.sweeps = 0
+        self.last_sweep_seconds = None
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def sweep(self):
+        """One sweep of the whole range into the archive.
+
+        Returns the HopScan, or None if stop() cut the sweep short (the
+        partial row is dropped) or no samples came in.
+        """
+        archive = self.archive
+        kwargs = {} if self.settle_samples is None else {"settle_samples": self.settle_samples}
+        scan = HopScan(
+            self.sdr, archive.start_freq, archive.end_freq, step=archive.bin_hz,
+            dwell_ms=self.dwell_ms, channels=archive.freqs, **kwargs,
+        )
+        started = time.time()
+        # A full-range sweep is ~1000 hops, so stop() is honoured per hop
+        hops = scan.iter_hops()
+        try:
+            for _ in hops:
+                if self._stop.is_set():
+                    return None
+        finally:
+            hops.close()
+        power_db = scan.power_db
+        # Hops whose read came up short: show them as the sweep's floor
+        missing = np.isnan(power_db)
+        if missing.all():
+            return None
+        power_db[missing] = np.nanmin(power_db)
+        archive.append(power_db, started)
+        self.sweeps += 1
+        self.last_sweep_seconds = round(scan.elapsed, 2)
+        return scan
+
+    def _run(self, sweeps):
+        try:
+            while not self._stop.is_set() and (not sweeps or self.sweeps < sweeps):
+                if self.sweep() is None:
+                    if not self._stop.is_set():
+                        log.warning("Survey sweep got no samples; stopping")
+                    break
+        except Exception as e:
+            # Any failure ends the survey, but status() has to say why
+            self.error = str(e)
+            log.exception(f"Survey stopped: {e}")
+
+    def start(self, sweeps=0):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(sweeps,), daemon=True, name="survey")
+        self._thread.start()
+
+    def stop(self, timeout=30):
+        """Stop after the hop in flight; False if the thread hasn't exited yet."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return False
+        self._thread = None
+        return True
+
+    def status(self):
+        return {
+            "running": self.running,
+            "sweeps": self.sweeps,
+            "last_sweep_seconds": self.last_sweep_seconds,
+            "error": self.error,
+            "archive": self.archive.stats(),
+        }
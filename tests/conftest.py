@@ -0,0 +1,62 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import sdr
+
+
+class FakeDongle:
+    """Stands in for pyrtlsdr's RtlSdr: streams noise, optionally with one carrier."""
+
+    carrier_hz = None
+
+    def __init__(self, device_index=0):
+        self.sample_rate = 2.048e6
+        self.center_freq = 100e6
+        self.gain = "auto"
+        self._stop = threading.Event()
+        self._rng = np.random.default_rng(device_index)
+
+    def read_bytes(self, num_bytes):
+        n = num_bytes // 2
+        iq = 0.02 * (self._rng.standard_normal(n) + 1j * self._rng.standard_normal(n))
+        if self.carrier_hz is not None and abs(self.carrier_hz - self.center_freq) < self.sample_rate / 2:
+            iq += 0.3 * np.exp(2j * np.pi * (self.carrier_hz - self.center_freq) * np.arange(n) / self.sample_rate)
+        raw = np.empty(num_bytes, dtype=np.uint8)
+        raw[0::2] = np.clip(np.rint(iq.real * 127.5 + 127.5), 0, 255)
+        raw[1::2] = np.clip(np.rint(iq.imag * 127.5 + 127.5), 0, 255)
+        return raw
+
+    def read_bytes_async(self, callback, num_bytes):
+        while not self._stop.is_set():
+            callback(self.read_bytes(num_bytes), None)
+            time.sleep(0.002)
+        self._stop.clear()
+
+    @staticmethod
+    def get_device_serial_addresses():
+        return ["00000001"]
+
+    def cancel_read_async(self):
+        self._stop.set()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_dongle(monkeypatch):
+    """Make sdr.SDR open FakeDongles instead of real hardware."""
+    monkeypatch.setattr(sdr, "RtlSdr", FakeDongle)
+    return FakeDongle
+
+
+@pytest.fixture
+def radio(fake_dongle):
+    """An open sdr.SDR on a fake dongle; set fake_dongle.carrier_hz for a signal."""
+    radio = sdr.SDR()
+    radio.open(center_freq=162e6)
+    yield radio
+    radio.close()
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+import sdr_server
+from channelizer import DFT_MAX_CHANNELS, Channelizer, ChannelMonitor, resolve_channels
+
+SAMPLE_RATE = 2.048e6
+CENTER = 155e6
+
+
+def tones(n, freqs, amplitude=0.3, seed=0):
+    """Carriers at absolute freqs (Hz) around CENTER, plus noise."""
+    t = np.arange(n) / SAMPLE_RATE
+    rng = np.random.default_rng(seed)
+    iq = 0.01 * (rng.standard_normal(n) + 1j * rng.standard_normal(n))
+    for f in freqs:
+        iq = iq + amplitude * np.exp(2j * np.pi * (f - CENTER) * t)
+    return iq.astype(np.complex64)
+
+
+def run(channelizer, iq, sizes):
+    outputs, start, i = [], 0, 0
+    while start < len(iq):
+        outputs.append(channelizer.process(iq[start:start + sizes[i % len(sizes)]]))
+        start += sizes[i % len(sizes)]
+        i += 1
+    return [np.concatenate(streams) for streams in zip(*outputs)]
+
+
+@pytest.mark.parametrize("count", [3, DFT_MAX_CHANNELS + 6])
+def test_chunked_matches_whole(count):
+    freqs = [CENTER - 800e3 + k * 50e3 + 3e3 for k in range(count)]
+    iq = tones(300_000, freqs[:2])
+    whole = Channelizer(SAMPLE_RATE, CENTER, freqs).process(iq)
+    chunked = run(Channelizer(SAMPLE_RATE, CENTER, freqs), iq, [5, 70001, 31, 100000])
+    for a, b in zip(whole, chunked):
+        assert len(a) == len(b)
+        np.testing.assert_allclose(a, b, atol=1e-5)
+
+
+def test_fft_path_matches_dft_path():
+    few = [CENTER - 612.5e3, CENTER + 12.5e3, CENTER + 700e3]
+    many = few + [CENTER - 900e3 + k * 60e3 for k in range(DFT_MAX_CHANNELS)]
+    iq = tones(100_000, few)
+    dft = Channelizer(SAMPLE_RATE, CENTER, few).process(iq)
+    fft = Channelizer(SAMPLE_RATE, CENTER, many).process(iq)[:len(few)]
+    for a, b in zip(dft, fft):
+        np.testing.assert_allclose(a, b, atol=1e-4)
+
+
+def test_carrier_lands_at_baseband_of_its_channel():
+    target = CENTER + 237.5e3  # off its bin center
+    channelizer = Channelizer(SAMPLE_RATE, CENTER, [target, CENTER - 400e3])
+    streams = channelizer.process(tones(2 ** 18, [target]))
+    settled = streams[0][len(streams[0]) // 2:]
+    # A pure carrier comes out as a constant phasor at the channel's baseband
+    assert np.abs(settled).mean() == pytest.approx(0.3, rel=0.05)
+    drift = np.angle(settled[1:] * np.conj(settled[:-1])).mean() * channelizer.output_rate / (2 * np.pi)
+    assert abs(drift) < 5  # Hz
+    assert np.mean(np.abs(streams[1]) ** 2) < 1e-3 * np.mean(np.abs(settled) ** 2)
+
+
+def test_channels_outside_the_span_are_rejected():
+    with pytest.raises(ValueError):
+        Channelizer(SAMPLE_RATE, CENTER, [CENTER + 1.0e6])
+
+
+def test_monitor_reports_the_active_channel():
+    active, idle = CENTER + 50e3, CENTER - 300e3
+    monitor = ChannelMonitor(SAMPLE_RATE, CENTER, [active, idle])
+    (active_db, audio), (idle_db, _) = monitor.process(tones(2 ** 18, [active]))
+    assert active_db - idle_db > 20
+    assert len(audio) == pytest.approx(2 ** 18 * 48000 / SAMPLE_RATE, abs=50)
+
+
+def test_resolve_channels():
+    channels = resolve_channels(["154.2950", " ", "carter_sheriff_roan"])
+    assert channels == {"154.2950": 154.295e6, "carter_sheriff_roan": 155.760e6}
+    with pytest.raises(ValueError, match="'not-a-channel'"):
+        resolve_channels(["154.2950", "not-a-channel"])
+
+
+def test_monitor_tools_report_unknown_channels():
+    result = sdr_server.monitor_channels("carter_sheriff_roan,not-a-channel")
+    assert "Bad channel list" in result["error"] and "not-a-channel" in result["error"]
@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+import pytest
+
+from bands import FREQUENCY_DB
+from conventional import ConventionalScanner, analog_channels
+
+CHANNELS = {"quiet": 155.1e6, "busy": 155.76e6, "far": 162.4e6}
+
+
+@pytest.fixture
+def scanner(radio, fake_dongle, monkeypatch):
+    monkeypatch.setattr(fake_dongle, "carrier_hz", CHANNELS["busy"])
+    calls = {"tune": [], "lock": [], "release": [], "audio": []}
+    scanner = ConventionalScanner(
+        radio, CHANNELS, hang_time=0.05, dwell_ms=20,
+        on_tune=calls["tune"].append,
+        on_lock=lambda *args: calls["lock"].append(args),
+        on_release=calls["release"].append,
+        on_audio=calls["audio"].append,
+    )
+    scanner.calls = calls
+    return scanner
+
+
+def test_locks_onto_the_active_channel(scanner):
+    assert len(scanner.windows) == 2
+    scanner.scan_step()
+    assert scanner.current["name"] == "busy" and scanner.state == "listening"
+    name, freq, mode, center, iq = scanner.calls["lock"][0]
+    assert (name, freq, mode) == ("busy", CHANNELS["busy"], "nfm")
+    assert center == scanner.windows[0][0] and len(iq) == scanner.samples_per_dwell
+    assert scanner.calls["tune"] == [center]
+    # The tripping capture is played straight away
+    assert len(scanner.calls["audio"]) == 1 and len(scanner.calls["audio"][0])
+    assert scanner.current["latency_ms"] is not None
+
+
+def test_listens_until_the_hang_time_runs_out(scanner, fake_dongle, monkeypatch):
+    scanner.scan_step()
+    scanner.listen_step()
+    assert scanner.state == "listening" and scanner.calls["tune"] == [scanner.windows[0][0]]
+    monkeypatch.setattr(fake_dongle, "carrier_hz", None)
+    scanner.listen_step()
+    assert scanner.state == "hang" and scanner.current is not None
+    time.sleep(0.06)
+    scanner.listen_step()
+    assert scanner.state == "scanning" and scanner.current is None
+    transmission = scanner.calls["release"][0]
+    assert transmission["name"] == "busy" and transmission["duration_s"] >= 0
+    assert len(scanner.calls["audio"]) == 4
+
+
+def test_empty_windows_move_on(scanner, fake_dongle, monkeypatch):
+    monkeypatch.setattr(fake_dongle, "carrier_hz", None)
+    for _ in range(4):
+        scanner.scan_step()
+    assert scanner.current is None and scanner.sweeps == 2
+    assert len(scanner.calls["tune"]) == 4
+
+
+def test_stopping_releases_the_lock(scanner):
+    scanner.start()
+    deadline = time.monotonic() + 5
+    while not scanner.calls["lock"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    scanner.stop()
+    assert scanner.state == "idle" and scanner.error is None
+    assert [t["name"] for t in scanner.calls["release"]] == ["busy"]
+    status = scanner.status()
+    assert status["latency_ms"]["count"] == 1 and not status["running"]
+
+
+def test_default_channels_are_the_analog_phonebook(radio):
+    channels = analog_channels()
+    assert "carter_sheriff_roan" in channels and "elizabethton_fire" not in channels
+    scanner = ConventionalScanner(radio)
+    assert set(scanner.names) == set(channels)
+    assert np.all(np.diff(scanner.freqs) >= 0)
+
+
+def test_an_unexpected_error_still_releases_the_lock(scanner, monkeypatch):
+    scanner.scan_step()
+
+    def broken():
+        raise AttributeError("listen_step broke")
+
+    monkeypatch.setattr(scanner, "listen_step", broken)
+    scanner.start()
+    scanner._thread.join(5)
+    assert scanner.error == "listen_step broke" and scanner.state == "idle"
+    assert [t["name"] for t in scanner.calls["release"]] == ["busy"]
+
+
+def test_channels_are_measured_over_their_protocol_bandwidth(radio, monkeypatch):
+    monkeypatch.setitem(FREQUENCY_DB, "test_fm", {**FREQUENCY_DB["carter_sheriff_roan"], "freq": 156.3e6,
+                                                  "protocol": "analog_wfm", "mode": "wfm"})
+    scanner = ConventionalScanner(radio, {"busy": CHANNELS["busy"], "test_fm": 156.3e6})
+    assert scanner.channel_bws.tolist() == [12.5e3, 200e3]
+    # A broadcast-wide signal: noise filling 150 kHz around the FM channel
+    center, hop = scanner.windows[0]
+    rng = np.random.default_rng(0)
+    n = 1 << 16
+    band = np.fft.fftfreq(n, 1 / radio.sample_rate) + center
+    spectrum = np.where(np.abs(band - 156.3e6) < 75e3, 1.0, 0.0) * (rng.standard_normal(n) + 1j * rng.standard_normal(n))
+    iq = np.fft.ifft(spectrum).astype(np.complex64)
+    iq += 1e-4 * (rng.standard_normal(n) + 1j * rng.standard_normal(n))
+    power_db, _ = scanner._measure(iq, center, hop)
+    assert power_db[1] == pytest.approx(10 * np.log10(np.mean(np.abs(iq) ** 2)), abs=0.5)
+    assert ConventionalScanner(radio, {"test_fm": 156.3e6}, channel_bw=25e3).channel_bws.tolist() == [25e3]
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from detect import CFARDetector, find_detections, noise_floor_db
+
+FREQS = 100e6 + 1e3 * np.arange(1024)
+
+
+def frame(floor_db=-90.0, signals=(), seed=0):
+    """Noise at floor_db (about 1 dB spread) plus (start_bin, bins, level_db) blocks."""
+    power_db = floor_db + np.random.default_rng(seed).normal(0, 1, len(FREQS))
+    for start, bins, level in signals:
+        power_db[start:start + bins] = level
+    return power_db
+
+
+def test_floor_ignores_narrow_signals():
+    power_db = frame(signals=[(500, 10, -30)])
+    floor = noise_floor_db(power_db)
+    assert np.abs(floor - -90).max() < 1.5
+    # A sloping floor is followed rather than flattened
+    slope = np.linspace(-100, -80, len(FREQS))
+    assert np.abs(noise_floor_db(slope) - slope)[100:-100].max() < 0.5
+
+
+def test_detections_are_merged_and_measured():
+    power_db = frame(signals=[(200, 5, -40), (207, 5, -40), (600, 1, -60)])
+    detections = find_detections(FREQS, power_db, noise_floor_db(power_db), snr_db=10)
+    assert len(detections) == 2
+    wide, narrow = detections
+    # Two runs with a 2-bin gap count as one signal
+    assert wide["freq_hz"] == pytest.approx(FREQS[206], abs=1e3)
+    assert wide["bandwidth_hz"] == 12e3
+    assert wide["snr_db"] == pytest.approx(50, abs=3)
+    assert narrow["freq_hz"] == FREQS[600] and narrow["bandwidth_hz"] == 1e3
+    assert find_detections(FREQS, power_db, noise_floor_db(power_db), snr_db=10, min_bins=2) == [wide]
+
+
+def test_same_snr_threshold_works_at_any_gain():
+    for floor_db in (-110, -70, -40):
+        power_db = frame(floor_db, [(300, 4, floor_db + 20)])
+        detections = find_detections(FREQS, power_db, noise_floor_db(power_db), snr_db=10)
+        assert [round(d["freq_hz"]) for d in detections] == [pytest.approx(FREQS[301] + 500, abs=1e3)]
+
+
+def test_detector_floor_follows_a_gain_change_within_a_few_frames():
+    detector = CFARDetector(alpha=0.25)
+    for k in range(20):
+        detector.update(FREQS, frame(-90, [(500, 20, -30)], seed=k))
+    # A carrier on air doesn't lift the floor under it
+    assert detector.floor_db[500:520].max() < -85
+    detector.update(FREQS, frame(-70, seed=20))
+    assert -80 < np.median(detector.floor_db) < -72  # part way there
+    for k in range(20):
+        detector.update(FREQS, frame(-70, seed=21 + k))
+    assert np.median(detector.floor_db) == pytest.approx(-70, abs=1)
+    assert detector.detect(FREQS, frame(-70, [(10, 3, -40)], seed=99))[0]["freq_mhz"] == pytest.approx(100.011, abs=1e-3)
+
+
+def test_new_axis_starts_a_fresh_floor():
+    detector = CFARDetector()
+    detector.update(FREQS, frame(-90))
+    detector.update(FREQS + 1e6, frame(-50))
+    assert detector.frames == 1
+    assert np.median(detector.floor_db) == pytest.approx(-50, abs=1)
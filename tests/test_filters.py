@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from scipy import signal
+
+import filters
+from filters import FilterCache
+
+
+def test_cache_builds_once_per_key():
+    cache = FilterCache()
+    calls = []
+
+    def build():
+        calls.append(1)
+        return np.ones(3)
+
+    first = cache.get(("k", 1), build)
+    assert cache.get(("k", 1), build) is first
+    cache.get(("k", 2), build)
+    assert len(calls) == 2
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 2, "hit_rate": round(1 / 3, 4)}
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+
+def test_designs_are_shared():
+    assert filters.lowpass_sos(4000, 48000) is filters.lowpass_sos(4000.0, 48000)
+    assert filters.polyphase_taps(3, 128) is filters.polyphase_taps(3, 128)
+
+
+def test_polyphase_taps_match_resample_poly():
+    x = np.random.default_rng(0).standard_normal(4000)
+    up, down = 3, 8
+    taps = filters.polyphase_taps(up, down)
+    np.testing.assert_allclose(
+        signal.resample_poly(x, up, down, window=taps / up), signal.resample_poly(x, up, down), atol=1e-12
+    )
+
+
+def test_one_pole_has_unity_dc_gain():
+    sos = filters.one_pole_sos(0.9)
+    step = signal.sosfilt(sos, np.ones(500))
+    assert step[-1] == pytest.approx(1.0)
+
+
+def test_resample_ratio_is_reduced():
+    assert filters.resample_ratio(2.048e6, 48000) == (3, 128)
+    assert filters.resample_ratio(256000, 48000) == (3, 16)
+
+
+@pytest.mark.parametrize("frequency", [100e3, -250e3, 12345.0])
+def test_nco_table_is_periodic_and_snapped(frequency):
+    sample_rate = 2.048e6
+    table, snapped = filters.nco_table(frequency, sample_rate)
+    assert abs(snapped - frequency) <= sample_rate / 2 ** filters.NCO_BITS / 2
+    length = len(table) // 2
+    np.testing.assert_array_equal(table[:length], table[length:])
+    # Continuing past the end of one copy picks up exactly where it left off
+    n = np.arange(len(table))
+    expected = np.exp(2j * np.pi * snapped * n / sample_rate)
+    np.testing.assert_allclose(table, expected, atol=1e-3)
@@ -0,0 +1,78 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from hits import HitStore, match_name
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HitStore(str(tmp_path / "hits.db"))
+    yield store
+    store.close()
+
+
+def hit(freq, power_db=-40.0, snr_db=20.0):
+    return {"freq_hz": freq, "power_db": power_db, "snr_db": snr_db, "bandwidth_hz": 10e3}
+
+
+def test_store_is_opened_on_first_use(tmp_path):
+    path = tmp_path / "hits.db"
+    store = HitStore(str(path))
+    store.close()
+    assert not path.exists()
+    assert store.stats() == {"path": str(path), "scans": 0, "hits": 0, "since": None}
+    assert path.exists()
+    store.close()
+
+
+def test_duty_cycle_counts_scans_that_covered_the_channel(store):
+    channels = 155e6 + 25e3 * np.arange(40)
+    now = time.time()
+    for k in range(4):
+        signals = [hit(155.1e6)] + ([hit(155.5e6, -30)] if k == 0 else [])
+        store.record_scan(channels, 25e3, 25e3, signals, now - 60 * k)
+    # A scan elsewhere doesn't dilute these channels
+    store.record_scan(162e6 + 25e3 * np.arange(10), 25e3, 25e3, [], now)
+    stats = {row["freq_hz"]: row for row in store.channel_stats()}
+    assert stats[155_100_000]["scans"] == 4 and stats[155_100_000]["duty_cycle"] == 1.0
+    assert stats[155_500_000]["duty_cycle"] == 0.25
+    assert stats[155_500_000]["max_power_db"] == -30
+    assert [row["freq_hz"] for row in store.channel_stats()] == [155_100_000, 155_500_000]
+    assert store.stats()["scans"] == 5 and store.stats()["hits"] == 5
+    assert store.active_channels(155e6, 156e6, min_hits=2) == [155.1e6]
+
+
+def test_sparse_scans_only_count_their_listed_channels(store):
+    now = time.time()
+    store.record_scan(155e6 + 25e3 * np.arange(40), 25e3, 25e3, [hit(155.1e6), hit(155.5e6)], now - 60)
+    store.record_scan([155.1e6], 25e3, 25e3, [hit(155.1e6)], now, sparse=True)
+    stats = {row["freq_hz"]: row for row in store.channel_stats()}
+    assert stats[155_100_000]["scans"] == 2
+    assert stats[155_500_000]["scans"] == 1
+
+
+def test_window_and_last_heard(store):
+    now = time.time()
+    store.record_scan([155.1e6, 155.2e6], 25e3, 25e3, [hit(155.1e6)], now - 3 * 3600)
+    store.record_scan([155.1e6, 155.2e6], 25e3, 25e3, [hit(155.2e6)], now - 60)
+    assert [row["freq_hz"] for row in store.channel_stats(hours=1)] == [155_200_000]
+    assert [row["freq_hz"] for row in store.last_heard()] == [155_200_000, 155_100_000]
+    assert sum(store.activity_by_hour().values()) == 2
+
+
+def test_hits_are_named_from_the_phonebook(store):
+    assert match_name(155.760e6 + 3e3, 12.5e3) == "carter_sheriff_roan"
+    assert match_name(155.760e6 + 30e3, 12.5e3) is None
+    store.record_scan([155.76e6], 25e3, 25e3, [hit(155.76e6 + 3e3)], time.time())
+    assert store.channel_stats()[0]["name"] == "carter_sheriff_roan"
+
+
+def test_second_connection_reads_while_open(store):
+    store.record_scan([155.1e6], 25e3, 25e3, [hit(155.1e6)], time.time())
+    other = HitStore(store.path)
+    assert other.stats()["hits"] == 1
+    other.close()
+    assert os.path.exists(store.path + "-wal")
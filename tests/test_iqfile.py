@@ -0,0 +1,85 @@
+import json
+
+import numpy as np
+import pytest
+
+from iqfile import IQFileSource, read_metadata
+
+SAMPLES = (np.exp(2j * np.pi * np.arange(1000) / 50) * 0.5).astype(np.complex64)
+
+
+def write_capture(path, fmt):
+    lanes = SAMPLES.view(np.float32)
+    if fmt == "cu8":
+        data = np.clip(np.rint(lanes * 127.5 + 127.5), 0, 255).astype(np.uint8)
+    elif fmt == "cs8":
+        data = np.rint(lanes * 128).astype(np.int8)
+    elif fmt == "cs16":
+        data = np.rint(lanes * 32768).astype(np.int16)
+    else:
+        data = lanes
+    data.tofile(path)
+    return path
+
+
+@pytest.mark.parametrize("fmt, atol", [("cu8", 1e-2), ("cs8", 1e-2), ("cs16", 1e-4), ("cf32", 0)])
+def test_formats_read_back(tmp_path, fmt, atol):
+    source = IQFileSource(str(write_capture(tmp_path / f"capture.{fmt}", fmt)), sample_rate=1e6, center_freq=145e6)
+    source.open()
+    iq = source.read_samples(1000)
+    assert iq.dtype == np.complex64
+    np.testing.assert_allclose(iq, SAMPLES, atol=atol)
+    assert source.sample_rate == 1e6 and source.center_freq == 145e6
+
+
+def test_sigmf_metadata_wins_over_open_arguments(tmp_path):
+    write_capture(tmp_path / "rec.sigmf-data", "cf32")
+    meta = {"global": {"core:datatype": "cf32_le", "core:sample_rate": 2.4e6}, "captures": [{"core:frequency": 162.4e6}]}
+    (tmp_path / "rec.sigmf-meta").write_text(json.dumps(meta))
+    assert read_metadata(str(tmp_path / "rec"))[1:] == ("cf32", 2.4e6, 162.4e6)
+    source = IQFileSource(str(tmp_path / "rec.sigmf-meta"))
+    source.open(sample_rate=2.048e6, center_freq=100e6)
+    assert (source.sample_rate, source.center_freq) == (2.4e6, 162.4e6)
+    source.center_freq = 150e6  # retunes are ignored
+    assert source.center_freq == 162.4e6
+    assert source.duration == pytest.approx(1000 / 2.4e6)
+
+
+def test_unknown_extension_needs_a_format(tmp_path):
+    with pytest.raises(ValueError):
+        IQFileSource(str(write_capture(tmp_path / "capture.dat", "cu8")))
+    assert IQFileSource(str(tmp_path / "capture.dat"), fmt="cu8").fmt == "cu8"
+
+
+def test_looping_and_end_of_file(tmp_path):
+    path = str(write_capture(tmp_path / "capture.cf32", "cf32"))
+    looping = IQFileSource(path)
+    looping.open()
+    looping.read_samples(900)
+    np.testing.assert_array_equal(looping.read_samples(200), np.concatenate((SAMPLES[900:], SAMPLES[:100])))
+    once = IQFileSource(path, loop=False)
+    once.open()
+    assert len(once.read_samples(900)) == 900
+    assert len(once.read_samples(200)) == 100
+    assert len(once.read_samples(200)) == 0
+
+
+def test_cf32_reads_are_views_of_the_map(tmp_path):
+    source = IQFileSource(str(write_capture(tmp_path / "capture.cf32", "cf32")))
+    source.open()
+    iq = source.read_samples(100)
+    assert not iq.flags.writeable
+    assert np.shares_memory(iq, source._samples)
+
+
+def test_streaming_serves_the_file_through_the_ring(tmp_path):
+    source = IQFileSource(str(write_capture(tmp_path / "capture.cf32", "cf32")), loop=False)
+    source.open()
+    ring = source.start_stream(block_size=100, num_blocks=16)
+    sub = ring.subscribe()
+    sub.cursor = 0
+    blocks = []
+    while (block := sub.read(timeout=2)) is not None:
+        blocks.append(block.copy())
+    source.close()
+    np.testing.assert_array_equal(np.concatenate(blocks), SAMPLES)
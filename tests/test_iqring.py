@@ -0,0 +1,105 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import sdr
+from iqring import IQRing
+
+
+def write(ring, value, center_freq=100e6):
+    ring.next_slot()[:] = value
+    ring.commit(center_freq)
+
+
+def test_every_subscriber_sees_every_block():
+    ring = IQRing(block_size=4, num_blocks=8)
+    a, b = ring.subscribe("a"), ring.subscribe("b")
+    for k in range(5):
+        write(ring, k)
+    assert [a.read(0)[0] for _ in range(5)] == [0, 1, 2, 3, 4]
+    assert [b.read(0)[0] for _ in range(5)] == [0, 1, 2, 3, 4]
+    assert a.read(0.01) is None
+
+
+def test_lapped_reader_skips_to_the_newest_block():
+    ring = IQRing(block_size=4, num_blocks=4)
+    sub = ring.subscribe()
+    for k in range(10):
+        write(ring, k)
+    assert sub.read(0)[0] == 9
+    assert sub.overruns == 1
+    assert sub.dropped_blocks == 9
+
+
+def test_read_samples_is_contiguous_across_calls():
+    ring = IQRing(block_size=4, num_blocks=8)
+    sub = ring.subscribe()
+    for k in range(4):
+        ring.next_slot()[:] = np.arange(4 * k, 4 * k + 4)
+        ring.commit(100e6)
+    first = sub.read_samples(6)
+    second = sub.read_samples(7)
+    np.testing.assert_array_equal(np.concatenate((first, second)).real, np.arange(13))
+
+
+def test_read_samples_skips_blocks_of_other_tunings():
+    ring = IQRing(block_size=4, num_blocks=8)
+    sub = ring.subscribe()
+    write(ring, 1, 100e6)
+    write(ring, 2, np.nan)  # straddled a retune
+    write(ring, 3, 101e6)
+    write(ring, 4, 101e6)
+    np.testing.assert_array_equal(sub.read_samples(8, center_freq=101e6).real, [3] * 4 + [4] * 4)
+
+
+def test_close_wakes_readers():
+    ring = IQRing(block_size=4, num_blocks=4)
+    sub = ring.subscribe()
+    threading.Timer(0.05, ring.close).start()
+    assert sub.read(timeout=5) is None
+    assert len(sub.read_samples(10, timeout=0.01)) == 0
+
+
+class RetuningDongle:
+    """Stands in for RtlSdr: each block's first byte says whether it straddled a retune."""
+
+    def __init__(self, device_index=0):
+        self.sample_rate = 2.048e6
+        self.center_freq = 100e6
+        self.gain = "auto"
+        self._stop = threading.Event()
+
+    def read_bytes_async(self, callback, num_bytes):
+        while not self._stop.is_set():
+            before = self.center_freq
+            time.sleep(0.005)
+            raw = np.full(num_bytes, 128, dtype=np.uint8)
+            raw[0] = 255 if self.center_freq != before else 128
+            callback(raw, None)
+        self._stop.clear()
+
+    def cancel_read_async(self):
+        self._stop.set()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def streaming_radio(monkeypatch):
+    monkeypatch.setattr(sdr, "RtlSdr", RetuningDongle)
+    radio = sdr.SDR()
+    radio.open(center_freq=100e6)
+    radio.start_stream(block_size=1024, num_blocks=8)
+    yield radio
+    radio.close()
+
+
+def test_blocks_straddling_a_retune_are_never_served(streaming_radio):
+    for k in range(20):
+        streaming_radio.center_freq = 100e6 + k * 1e6
+        iq = streaming_radio.read_samples(1024)
+        assert len(iq) == 1024
+        assert iq[0].real < 0.5, f"read {k} returned a block captured across the retune"
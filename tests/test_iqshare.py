@@ -0,0 +1,96 @@
+import multiprocessing as mp
+
+import numpy as np
+import pytest
+
+from iqshare import SharedIQRing
+
+
+@pytest.fixture
+def ring():
+    ring = SharedIQRing.create(block_size=8, num_blocks=4)
+    yield ring
+    ring.close()
+    ring.release()
+
+
+def write(ring, value, center_freq=100e6):
+    ring.next_slot()[:] = value
+    ring.commit(center_freq)
+
+
+def test_attached_reader_sees_blocks_and_tags(ring):
+    other = SharedIQRing.attach(ring.name)
+    sub = other.subscribe()
+    write(ring, 1, 101e6)
+    write(ring, 2, 102e6)
+    assert sub.read(0.1)[0] == 1 and sub.center_freq == 101e6
+    assert sub.read(0.1)[0] == 2 and sub.center_freq == 102e6
+    assert sub.read(0.01) is None
+    del sub
+    other.release()
+
+
+def test_intact_notices_the_writer_lapping_a_view(ring):
+    sub = ring.subscribe()
+    write(ring, 1)
+    block = sub.read(0.1)
+    assert sub.intact()
+    for k in range(3):
+        write(ring, k + 2)
+    assert sub.intact()  # slot not reused yet
+    ring.next_slot()  # the writer starts refilling the slot under the reader
+    assert not sub.intact()
+    assert block is not None
+
+
+def test_close_ends_reads(ring):
+    sub = ring.subscribe()
+    ring.close()
+    assert sub.read(1.0) is None
+
+
+def _sum_first_block(name, results):
+    ring = SharedIQRing.attach(name)
+    sub = ring.subscribe()
+    sub.cursor = 0
+    block = sub.read(5.0)
+    results.put((complex(block.sum()), float(sub.center_freq)))
+    del block, sub
+    ring.release()
+
+
+def test_another_process_reads_the_ring(ring):
+    write(ring, 0.5 + 0.25j, 144.39e6)
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    child = ctx.Process(target=_sum_first_block, args=(ring.name, results))
+    child.start()
+    total, freq = results.get(timeout=30)
+    child.join(10)
+    assert total == pytest.approx(8 * (0.5 + 0.25j))
+    assert freq == 144.39e6
+    assert np.all(ring.blocks[0] == np.complex64(0.5 + 0.25j))
+
+
+class LappedOnCopy(np.ndarray):
+    """Output buffer whose first copy lets the writer lap the reader."""
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if not self.lapped:
+            self.lapped = True
+            for k in range(self.ring.num_blocks):
+                write(self.ring, 10 + k)
+
+
+def test_read_samples_drops_a_block_overwritten_mid_copy(ring):
+    sub = ring.subscribe()
+    write(ring, 1)
+    write(ring, 2)
+    out = np.empty(12, dtype=np.complex64).view(LappedOnCopy)
+    out.ring, out.lapped = ring, False
+    iq = sub.read_samples(12, out=out, timeout=0.1)
+    # Block 1 was torn under the copy; the reader skips to the newest block
+    assert np.all(iq[:8] == 13) and len(iq) == 8
+    assert sub.overruns == 2 and sub.dropped_blocks == 1 + 4
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from bands import FREQUENCY_DB
+from revisit import DEFAULT_INTERVAL, RevisitScheduler, revisit_interval
+from scanner import USABLE_FRACTION
+
+
+def test_intervals_follow_the_rules():
+    assert revisit_interval("carter_fire_dispatch") == 0.5
+    assert revisit_interval("noaa_weather_1") == 10.0
+    assert revisit_interval("k4lns_2m") == 5.0  # a repeater
+    assert revisit_interval("unlisted", {"description": "Taxi dispatch"}) == 0.5
+    assert revisit_interval("unlisted", {"description": "Business"}) == DEFAULT_INTERVAL
+
+
+def test_channels_are_grouped_into_windows(radio):
+    scheduler = RevisitScheduler(radio)
+    grouped = np.concatenate([scheduler.freqs[hop] for _, hop in scheduler.windows])
+    np.testing.assert_array_equal(grouped, np.sort([entry["freq"] for entry in FREQUENCY_DB.values()]))
+    for center, hop in scheduler.windows:
+        assert np.abs(scheduler.freqs[hop] - center).max() < USABLE_FRACTION * radio.sample_rate / 2
+    assert len(scheduler.windows) < len(scheduler.names)
+
+
+def test_short_intervals_are_visited_more_often(radio):
+    scheduler = RevisitScheduler(radio, ["carter_fire_dispatch", "noaa_weather_1"], settle_samples=0)
+    assert len(scheduler.windows) == 2
+    scheduler.run(1.2)
+    stats = {row["name"]: row for row in scheduler.latency_stats()}
+    assert stats["noaa_weather_1"]["visits"] == 1
+    assert stats["carter_fire_dispatch"]["visits"] >= 2
+    assert stats["carter_fire_dispatch"]["mean_gap_s"] == pytest.approx(0.5, abs=0.15)
+    assert stats["carter_fire_dispatch"]["late"] == 0
+
+
+def test_activity_is_logged_once_per_transmission(radio, fake_dongle, monkeypatch):
+    names = ["carter_sheriff_holston", "carter_sheriff_roan", "elizabethton_pd_tac"]
+    scheduler = RevisitScheduler(radio, names, settle_samples=0)
+    assert len(scheduler.windows) == 1
+    monkeypatch.setattr(fake_dongle, "carrier_hz", FREQUENCY_DB["carter_sheriff_roan"]["freq"])
+    scheduler.visit(0)
+    scheduler.visit(0)
+    assert [event["name"] for event in scheduler.events] == ["carter_sheriff_roan"]
+    assert scheduler.active.tolist() == [False, True, False]
+    monkeypatch.setattr(fake_dongle, "carrier_hz", None)
+    scheduler.visit(0)
+    monkeypatch.setattr(fake_dongle, "carrier_hz", FREQUENCY_DB["carter_sheriff_roan"]["freq"])
+    scheduler.visit(0)
+    assert len(scheduler.events) == 2
@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+import scanner
+from hits import HitStore
+from scanner import (
+    TIMING_PHASES,
+    USABLE_FRACTION,
+    HopScan,
+    channel_bins,
+    channel_power,
+    channel_raster,
+    iter_scan,
+    plan_hops,
+    scan_fft_size,
+    scan_plan,
+    scan_range,
+)
+from spectrum import SpectrumEngine, engine
+
+SAMPLE_RATE = 2.048e6
+
+
+def test_channel_raster_includes_both_ends():
+    channels = channel_raster(162.4e6, 162.55e6, 25e3)
+    assert len(channels) == 7 and channels[-1] == pytest.approx(162.55e6)
+    assert len(channel_raster(162.4e6, 162.3e6, 25e3)) == 0
+
+
+@pytest.mark.parametrize("step", [12.5e3, 25e3, 200e3])
+def test_hops_cover_every_channel_inside_the_usable_span(step):
+    channels = channel_raster(150e6, 174e6, step)
+    hops = plan_hops(channels, step, SAMPLE_RATE)
+    covered = np.concatenate([channels[hop] for _, hop in hops])
+    np.testing.assert_array_equal(covered, channels)
+    for center, hop in hops:
+        edges = np.abs(channels[hop] - center) + step / 2
+        assert edges.max() <= USABLE_FRACTION * SAMPLE_RATE / 2
+        # No channel centre on the DC bin
+        assert np.abs(channels[hop] - center).min() >= step / 4 - 1e-6
+    with pytest.raises(ValueError):
+        plan_hops(channels, 2e6, SAMPLE_RATE)
+
+
+def test_channel_bins_partition_adjacent_channels():
+    plan = scan_plan(scan_fft_size(SAMPLE_RATE, 25e3), SAMPLE_RATE)
+    channels = 25e3 * np.arange(-10, 10) + 6.25e3
+    lo, hi = channel_bins(plan, channels, 25e3)
+    assert np.all(hi - lo >= 8)
+    np.testing.assert_array_equal(lo[1:], hi[:-1])
+
+
+def test_channel_power_is_the_carrier_power():
+    plan = scan_plan(scan_fft_size(SAMPLE_RATE, 25e3), SAMPLE_RATE)
+    n = 16 * plan.fft_size
+    carrier = 0.3 * np.exp(2j * np.pi * 100e3 * np.arange(n) / SAMPLE_RATE)
+    power = engine.power(carrier.astype(np.complex64), plan, averages=0)
+    inside, outside = channel_power(power, plan, [100e3, 200e3], 25e3)
+    assert 10 * np.log10(inside) == pytest.approx(10 * np.log10(0.09), abs=0.1)
+    assert outside < 1e-6 * inside
+
+
+def test_scan_range_finds_the_carrier(radio, fake_dongle, monkeypatch):
+    monkeypatch.setattr(fake_dongle, "carrier_hz", 162.55e6)
+    signals = scan_range(radio, 160e6, 165e6, step=25e3, dwell_ms=20)
+    assert [s["freq_hz"] for s in signals] == [pytest.approx(162.55e6)]
+    assert signals[0]["power_db"] == pytest.approx(10 * np.log10(0.09), abs=1)
+    assert signals[0]["snr_db"] > 20
+
+
+def test_hops_are_yielded_in_order_with_results_filled(radio, fake_dongle, monkeypatch):
+    monkeypatch.setattr(fake_dongle, "carrier_hz", 162.55e6)
+    scan = HopScan(radio, 155e6, 170e6, step=25e3, dwell_ms=20)
+    seen = []
+    for i, center, hop in scan.iter_hops():
+        seen.append(i)
+        assert not np.isnan(scan.power_db[hop]).any()
+        assert center == scan.hops[i][0]
+    assert seen == list(range(len(scan.hops)))
+    summary = scan.summary()
+    # Only the carrier's hop reads past the probe
+    assert summary["hops_probed_empty"] == len(scan.hops) - 1
+    assert set(summary["mean_ms"]) == set(TIMING_PHASES)
+
+
+def test_hops_share_one_plan_with_the_display(radio, fake_dongle, monkeypatch):
+    monkeypatch.setattr(fake_dongle, "carrier_hz", 162.55e6)
+    shared = SpectrumEngine(max_plans=2)
+    monkeypatch.setattr(scanner, "engine", shared)
+    display = shared.plan(2048, SAMPLE_RATE, 162e6)
+    scan = HopScan(radio, 155e6, 170e6, step=25e3, dwell_ms=20)
+    assert len(list(scan.iter_hops())) > 2
+    assert shared.plan(2048, SAMPLE_RATE, 162e6) is display
+    assert shared.stats()["plans"] == 2
+
+
+class OffsetDongle:
+    """Mixin: the tuner lands 20 kHz below what was asked, like a coarse PLL."""
+
+    @property
+    def center_freq(self):
+        return self._center
+
+    @center_freq.setter
+    def center_freq(self, freq):
+        self._center = freq - 20e3
+
+
+def test_channels_are_measured_at_the_tuner_actual_center(radio, fake_dongle, monkeypatch):
+    monkeypatch.setattr(fake_dongle, "carrier_hz", 162.55e6)
+    radio.device.__class__ = type("OffsetFake", (OffsetDongle, fake_dongle), {})
+    radio.center_freq = 162e6
+    signals = scan_range(radio, 162e6, 163e6, step=25e3, dwell_ms=20)
+    assert [s["freq_hz"] for s in signals] == [pytest.approx(162.55e6)]
+
+
+def test_cancelled_scan_logs_the_hops_it_measured(radio, fake_dongle, monkeypatch, tmp_path):
+    monkeypatch.setattr(fake_dongle, "carrier_hz", 162.55e6)
+    store = HitStore(str(tmp_path / "hits.db"))
+    hops = iter_scan(radio, 162e6, 170e6, step=25e3, dwell_ms=20, store=store)
+    first = next(hops)
+    assert first["hop"] == 1 and first["hops"] > 2
+    assert [s["freq_hz"] for s in first["signals"]] == [pytest.approx(162.55e6)]
+    hops.close()
+    (scan,) = store._query("SELECT start_hz, end_hz, channels FROM scans", {})
+    assert scan["start_hz"] == 162_000_000
+    assert scan["end_hz"] == round(first["end_mhz"] * 1e6)
+    assert store.stats()["hits"] == 1
+    store.close()
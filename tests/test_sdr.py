@@ -0,0 +1,61 @@
+import numpy as np
+
+from sdr import DevicePool, _pins_from_env, bytes_to_iq
+
+
+def test_bytes_to_iq_matches_pyrtlsdr_scaling():
+    raw = np.random.default_rng(0).integers(0, 256, 2 * 1000, dtype=np.uint8)
+    expected = (raw[0::2] / 127.5 - 1) + 1j * (raw[1::2] / 127.5 - 1)
+    iq = bytes_to_iq(raw.tobytes())
+    assert iq.dtype == np.complex64
+    np.testing.assert_allclose(iq, expected, atol=1e-6)
+
+
+def test_bytes_to_iq_fills_a_reused_buffer():
+    out = np.full(600, 9 + 9j, dtype=np.complex64)
+    raw = np.array([0, 255] * 500, dtype=np.uint8)
+    iq = bytes_to_iq(raw, out)
+    assert len(iq) == 500 and np.shares_memory(iq, out)
+    np.testing.assert_allclose(iq, -1 + 1j)
+    # Past the converted samples the buffer is untouched
+    assert out[500] == 9 + 9j
+
+
+def pool_of(*serials, pins=None):
+    pool = DevicePool(pins)
+    pool._devices = list(enumerate(serials))
+    return pool
+
+
+def test_pool_leases_each_dongle_once():
+    pool = pool_of("00000001", "00000002")
+    first = pool.acquire("webui")
+    second = pool.acquire("survey")
+    assert {first.index, second.index} == {0, 1}
+    assert pool.acquire("webui") is first
+    assert pool.acquire("digital") is None
+    pool.release("webui")
+    assert pool.acquire("digital").index == first.index
+    assert sorted(pool.owners()) == ["digital", "survey"]
+
+
+def test_pins_by_owner_and_frequency():
+    pool = pool_of("00000001", "00001090", pins={"adsb": "00001090", 1090e6: 1})
+    assert pool.acquire("webui").index == 0  # unpinned dongle first
+    assert pool.acquire("adsb", 1090e6).serial == "00001090"
+    pool.release("adsb")
+    assert pool.acquire("decoder", 1090.2e6).index == 1
+    status = {entry["index"]: entry for entry in pool.status()}
+    assert status[1]["lease"]["owner"] == "decoder"
+    assert set(status[1]["pinned_to"]) == {"adsb", str(1090e6)}
+
+
+def test_pinned_dongle_is_lent_out_when_nothing_else_is_free():
+    pool = pool_of("a", "b", pins={"adsb": "b"})
+    assert pool.acquire("webui").index == 0
+    assert pool.acquire("scanner").index == 1
+
+
+def test_pins_from_env(monkeypatch):
+    monkeypatch.setenv("SDR_DEVICE_PINS", "adsb=00001090, 1090=1,garbage")
+    assert _pins_from_env() == {"adsb": "00001090", 1090e6: 1}
@@ -0,0 +1,160 @@
+import numpy as np
+import pytest
+
+from spectrum import (
+    ASCII_STYLES,
+    SpectrumEngine,
+    ZoomSpectrum,
+    ascii_spectrum,
+    compute_spectrum,
+    reduce_to_pixels,
+    welch_frames,
+)
+
+SAMPLE_RATE = 2.048e6
+CENTER = 100e6
+
+
+def tone(n, offset_hz, amplitude=0.5, noise=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    iq = amplitude * np.exp(2j * np.pi * offset_hz * np.arange(n) / SAMPLE_RATE)
+    iq = iq + noise * (rng.standard_normal(n) + 1j * rng.standard_normal(n))
+    return iq.astype(np.complex64)
+
+
+def test_welch_frames_end_on_the_newest_sample():
+    iq = np.arange(1000)
+    frames = welch_frames(iq, 256, averages=0)
+    assert frames[-1][-1] == 999
+    assert frames[1][0] - frames[0][0] == 128
+    assert len(welch_frames(iq, 256, averages=2)) == 2
+    assert np.shares_memory(frames, iq)
+
+
+def test_averaged_spectrum_matches_a_loop_over_frames():
+    iq = tone(8192, 250e3)
+    freqs, power_db = compute_spectrum(iq, SAMPLE_RATE, CENTER, fft_size=512, averages=0)
+    engine = SpectrumEngine()
+    plan = engine.plan(512, SAMPLE_RATE, CENTER)
+    expected = np.mean([
+        np.abs(np.fft.fftshift(np.fft.fft(frame * np.abs(plan.window)))) ** 2
+        for frame in welch_frames(iq, 512, averages=0)
+    ], axis=0)
+    np.testing.assert_allclose(10 ** (power_db / 10), expected + 1e-10, rtol=1e-3)
+    assert freqs[np.argmax(power_db)] * 1e6 == pytest.approx(CENTER + 250e3, abs=SAMPLE_RATE / 512)
+
+
+def test_averaging_flattens_the_noise_floor():
+    iq = tone(65536, 0, amplitude=0, noise=0.1)
+    _, single = compute_spectrum(iq, SAMPLE_RATE, CENTER, fft_size=1024)
+    _, welch = compute_spectrum(iq, SAMPLE_RATE, CENTER, fft_size=1024, averages=0)
+    assert np.std(welch) < np.std(single) / 4
+
+
+def test_max_hold_keeps_a_burst():
+    iq = tone(16384, 0, amplitude=0, noise=0.01)
+    iq[:1024] += tone(1024, -300e3, noise=0)
+    _, mean_db = compute_spectrum(iq, SAMPLE_RATE, CENTER, fft_size=1024, averages=0)
+    _, held_db = compute_spectrum(iq, SAMPLE_RATE, CENTER, fft_size=1024, averages=0, max_hold=True)
+    assert held_db.max() - mean_db.max() > 10
+
+
+def test_plans_are_cached_and_the_stalest_evicted():
+    engine = SpectrumEngine(max_plans=2)
+    first = engine.plan(1024, SAMPLE_RATE, CENTER)
+    assert engine.plan(1024.0, SAMPLE_RATE, CENTER) is first
+    engine.plan(2048, SAMPLE_RATE, CENTER)
+    engine.plan(1024, SAMPLE_RATE, CENTER)  # refreshes the first plan
+    engine.plan(4096, SAMPLE_RATE, CENTER)
+    assert engine.plan(1024, SAMPLE_RATE, CENTER) is first
+    assert engine.stats()["plans"] == 2
+    # The window is part of the key
+    assert engine.plan(1024, SAMPLE_RATE, CENTER, "blackmanharris") is not first
+    assert engine.plan(1024, SAMPLE_RATE, CENTER, "hann") is first
+
+
+@pytest.mark.parametrize("fft_size", [1024, 1000])
+def test_plan_axis_and_centering(fft_size):
+    plan = SpectrumEngine().plan(fft_size, SAMPLE_RATE, CENTER)
+    assert plan.freqs_mhz[fft_size // 2] == pytest.approx(CENTER / 1e6)
+    _, power_db = SpectrumEngine().compute(tone(fft_size, 0), SAMPLE_RATE, CENTER, fft_size)
+    assert np.argmax(power_db) == fft_size // 2
+
+
+def test_waterfall_rows_follow_the_signal_through_the_block():
+    engine = SpectrumEngine()
+    plan = engine.plan(256, SAMPLE_RATE, CENTER)
+    iq = np.concatenate([tone(4096, offset, seed=k) for k, offset in enumerate((-400e3, 0, 400e3, 800e3))])
+    rows = engine.waterfall_power(iq, plan, 4)
+    assert rows.shape == (4, 256)
+    peaks = plan.freqs_mhz[np.argmax(rows, axis=1)] * 1e6 - CENTER
+    np.testing.assert_allclose(peaks, [-400e3, 0, 400e3, 800e3], atol=SAMPLE_RATE / 256)
+    # Each row is a Welch average over its own slice
+    np.testing.assert_allclose(rows[-1], engine.power(iq[-4096:], plan, averages=0), rtol=1e-4)
+
+
+def test_waterfall_rows_are_capped_by_the_block_length():
+    engine = SpectrumEngine()
+    plan = engine.plan(1024, SAMPLE_RATE, CENTER)
+    assert engine.waterfall_power(tone(3000, 0), plan, 8).shape == (2, 1024)
+
+
+def test_reduce_to_pixels_keeps_narrow_peaks():
+    freqs = np.arange(4096, dtype=np.float64)
+    power_db = np.full(4096, -100.0)
+    power_db[1234] = -20
+    low, high = reduce_to_pixels(power_db, freqs, 0, 4096, 100)
+    assert len(low) == len(high) == 100
+    assert high.max() == -20 and low.max() == -100
+    # Wider columns than bins repeat the bin underneath
+    low, high = reduce_to_pixels(power_db[:10], freqs[:10], 0, 10, 40)
+    assert len(high) == 40 and np.all(low == high)
+
+
+def test_zoom_resolves_tones_a_plain_fft_cannot():
+    # Two carriers 400 Hz apart, 5 kHz above center
+    t = np.arange(2 ** 18) / SAMPLE_RATE
+    iq = (np.exp(2j * np.pi * 5000 * t) + np.exp(2j * np.pi * 5400 * t)).astype(np.complex64)
+    start, stop = CENTER + 4000, CENTER + 6400
+    zoom = ZoomSpectrum(SAMPLE_RATE, CENTER, start, stop, 240)
+    for _ in range(4):
+        _, high = zoom.process(iq)
+    assert zoom.ddc is not None and zoom.fft_size >= 2 * 240 * zoom.rate / (stop - start)
+    pixel_hz = (stop - start) / 240
+    peaks = np.flatnonzero((high[1:-1] > high[:-2]) & (high[1:-1] >= high[2:]) & (high[1:-1] > high.max() - 6)) + 1
+    np.testing.assert_allclose(sorted(start + peaks * pixel_hz), [CENTER + 5000, CENTER + 5400], atol=3 * pixel_hz)
+
+
+@pytest.mark.parametrize("style", ASCII_STYLES)
+def test_ascii_spectrum_shape_and_peak(style):
+    freqs = np.linspace(99, 101, 1000)
+    power_db = np.full(1000, -90.0)
+    power_db[700] = -30
+    lines = ascii_spectrum(freqs, power_db, width=50, height=10, style=style, markers=True).split("\n")
+    assert len(lines) == 10 + (style == "ascii") + 2
+    plot = lines[:-2]
+    assert all(len(line) == 50 for line in plot)
+    blank = {" ", "·", "⠀"}
+    # Only the peak's column reaches the top row
+    top = [col for col, ch in enumerate(plot[0]) if ch not in blank]
+    assert top == [35]
+    assert lines[-2].index("^") == 35 and f"peak {freqs[700]:.4f} MHz" in lines[-2]
+    assert lines[-1].startswith("99.0 MHz") and lines[-1].endswith("101.0 MHz")
+
+
+@pytest.mark.parametrize("peak", [0, 380, 700, 999])
+def test_ascii_spectrum_marker_line_fits_the_width(peak):
+    freqs = np.linspace(99, 101, 1000)
+    power_db = np.full(1000, -90.0)
+    power_db[peak] = -30
+    lines = ascii_spectrum(freqs, power_db, width=60, height=8, markers=True).split("\n")
+    assert all(len(line) <= 60 for line in lines)
+    assert lines[-2].index("^") == min(peak * 60 // 1000, 59)
+
+
+def test_ascii_spectrum_averages_frames_in_linear_power():
+    freqs = np.linspace(99, 101, 64)
+    frames = np.array([np.full(64, -100.0), np.full(64, -100.0)])
+    frames[0, 10] = -20
+    expected = ascii_spectrum(freqs, 10 * np.log10(np.mean(10 ** (frames / 10), axis=0)), width=32, height=8)
+    assert ascii_spectrum(freqs, frames, width=32, height=8) == expected
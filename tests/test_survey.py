@@ -0,0 +1,90 @@
+import time
+
+import numpy as np
+import pytest
+
+import survey
+from survey import Survey, SurveyArchive, list_archives
+
+
+def sweep_rows(n, bins, seed=0):
+    return np.random.default_rng(seed).uniform(-100, -40, (n, bins))
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = SurveyArchive.create(str(tmp_path / "vhf"), 150e6, 151e6, 10e3)
+    yield archive
+    archive.close()
+
+
+def test_archive_grows_and_reopens_read_only(archive, tmp_path):
+    rows = sweep_rows(survey.GROW_ROWS + 10, archive.bins)
+    for k, row in enumerate(rows):
+        archive.append(row, 1000.0 + k)
+    assert archive.bins == 101 and archive.capacity == 2 * survey.GROW_ROWS
+    reader = SurveyArchive(archive.path)
+    assert reader.rows == len(rows)
+    assert reader.stats()["first"] == 1000.0 and reader.stats()["last"] == 1000.0 + len(rows) - 1
+    assert list_archives(str(tmp_path)) == ["vhf"]
+    tile = reader.window(rows=len(rows), cols=reader.bins)
+    restored = tile["db_offset"] + tile["data"] * tile["db_step"]
+    np.testing.assert_allclose(restored, rows, atol=0.25)
+
+
+def test_window_matches_a_brute_force_reduction(archive, monkeypatch):
+    monkeypatch.setattr(survey, "CHUNK_ROWS", 7)
+    rows = sweep_rows(200, archive.bins, seed=1)
+    for k, row in enumerate(rows):
+        archive.append(row, 1000.0 + k)
+    tile = archive.window(t_start=1050, t_end=1149, start_freq=150.2e6, end_freq=150.6e6, rows=10, cols=8)
+    assert (tile["t_start"], tile["t_end"]) == (1050.0, 1149.0)
+    assert tile["start_hz"] == pytest.approx(150.2e6 - 5e3) and tile["end_hz"] == pytest.approx(150.6e6 + 5e3)
+    stored = np.array([archive.index[k]["db_offset"] + archive.data[k] * archive.index[k]["db_step"]
+                       for k in range(50, 150)])[:, 20:61]
+    col_starts = np.linspace(0, 41, 8, endpoint=False).astype(int)
+    expected = np.maximum.reduceat(stored.reshape(10, 10, 41).max(axis=1), col_starts, axis=1)
+    np.testing.assert_allclose(tile["db_offset"] + tile["data"] * tile["db_step"], expected, atol=0.2)
+
+
+def test_empty_windows(archive):
+    assert archive.window() is None
+    archive.append(np.zeros(archive.bins), 1000.0)
+    assert archive.window(t_start=2000) is None
+    assert archive.window(rows=50, cols=500)["data"].shape == (1, archive.bins)
+
+
+def test_sweep_lands_the_carrier_in_its_bin(radio, fake_dongle, monkeypatch, tmp_path):
+    monkeypatch.setattr(fake_dongle, "carrier_hz", 162.55e6)
+    archive = SurveyArchive.create(str(tmp_path / "wx"), 161e6, 164e6, 25e3)
+    sweeper = Survey(radio, archive, dwell_ms=10)
+    sweeper.start(sweeps=2)
+    sweeper._thread.join(30)
+    assert sweeper.sweeps == 2 and sweeper.error is None
+    tile = archive.window()
+    assert archive.freqs[np.argmax(tile["data"][-1])] == pytest.approx(162.55e6)
+
+
+def test_an_unexpected_error_is_reported(radio, archive, monkeypatch):
+    sweeper = Survey(radio, archive)
+
+    def broken():
+        raise IndexError("bad hop")
+
+    monkeypatch.setattr(sweeper, "sweep", broken)
+    sweeper.start()
+    sweeper._thread.join(5)
+    assert sweeper.status()["error"] == "bad hop" and not sweeper.running
+
+
+def test_stop_interrupts_a_long_sweep(radio, tmp_path):
+    archive = SurveyArchive.create(str(tmp_path / "wide"), 24e6, 1766e6, 25e3)
+    sweeper = Survey(radio, archive, dwell_ms=20)
+    sweeper.start()
+    time.sleep(0.3)  # a few hops into a sweep of ~1100
+    started = time.monotonic()
+    assert sweeper.stop()
+    assert time.monotonic() - started < 2
+    # The cut-short sweep leaves no row behind, and nothing was logged as an error
+    assert archive.rows == 0 and sweeper.sweeps == 0 and sweeper.error is None
+    archive.close()
@@ -0,0 +1,52 @@
+import numpy as np
+
+from waterfall import WaterfallHistory, quantize_rows
+
+
+def ramp_rows(n, bins=64, first=0):
+    """Row k peaks at bin k % bins, -100 dB elsewhere."""
+    rows = np.full((n, bins), -100.0)
+    rows[np.arange(n), (first + np.arange(n)) % bins] = -40
+    return rows
+
+
+def test_quantize_rows_per_row_range():
+    rows = np.array([[-100.0, -50.0], [-20.0, -20.0]])
+    q, lo, step = quantize_rows(rows)
+    np.testing.assert_allclose(lo[:, None] + q * step[:, None], rows, atol=0.2)
+    assert q[0].tolist() == [0, 255]
+
+
+def test_window_covers_the_newest_rows_after_wrapping():
+    history = WaterfallHistory(num_rows=32, bins=64)
+    history.append(ramp_rows(40), np.arange(40.0), 100e6, 6.4e6)
+    tile = history.window(rows=1000, cols=1000)
+    assert tile["data"].shape == (32, 64)
+    assert (tile["t_start"], tile["t_end"]) == (8.0, 39.0)
+    assert tile["start_hz"] == 100e6 - 3.2e6 and tile["end_hz"] == 100e6 + 3.2e6
+    db = tile["db_offset"] + tile["data"] * tile["db_step"]
+    assert np.argmax(db, axis=1).tolist() == [k % 64 for k in range(8, 40)]
+
+
+def test_window_max_reduces_time_and_frequency():
+    history = WaterfallHistory(num_rows=128, bins=64)
+    history.append(ramp_rows(64), np.arange(64.0), 100e6, 6.4e6)
+    tile = history.window(t_start=16, t_end=31, start_freq=100e6 - 1.6e6, end_freq=100e6 + 1.6e6, rows=4, cols=8)
+    assert tile["data"].shape == (4, 8)
+    assert (tile["t_start"], tile["t_end"]) == (16.0, 31.0)
+    assert (tile["start_hz"], tile["end_hz"]) == (100e6 - 1.6e6, 100e6 + 1.6e6)
+    # The window is bins 16..47 at four bins per column; rows 16..31 peak in
+    # bins 16..31, so each group of four rows lights up one column
+    np.testing.assert_array_equal(tile["data"][:, :4], 255 * np.eye(4))
+    assert not tile["data"][:, 4:].any()
+    assert history.window(t_start=100) is None
+
+
+def test_retune_starts_a_new_history():
+    history = WaterfallHistory(num_rows=16, bins=64)
+    history.append(ramp_rows(10), np.arange(10.0), 100e6, 6.4e6)
+    history.append(ramp_rows(3, bins=32), np.arange(10.0, 13.0), 101e6, 6.4e6)
+    tile = history.window()
+    assert tile["data"].shape == (3, 32)
+    assert tile["t_start"] == 10.0
+    assert WaterfallHistory().window() is None
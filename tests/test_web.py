@@ -0,0 +1,225 @@
+import asyncio
+import base64
+import json
+import struct
+
+import numpy as np
+import pytest
+from starlette.testclient import TestClient
+
+import web
+from hits import HitStore
+from iqfile import IQFileSource
+from sdr import pool
+from waterfall import WaterfallHistory
+
+
+@pytest.fixture
+def hardware(monkeypatch, tmp_path, fake_dongle):
+    """web.py driving a fake dongle instead of --mock data."""
+    monkeypatch.setattr(web, "MOCK", False)
+    monkeypatch.setattr(web, "hit_store", HitStore(str(tmp_path / "hits.db")))
+    monkeypatch.setitem(web.state, "running", False)
+    yield
+    web.radio.close()
+    pool.release("webui")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """The app in --mock mode."""
+    monkeypatch.setattr(web, "MOCK", True)
+    monkeypatch.setitem(web.state, "running", False)
+    with TestClient(web.app) as client:
+        yield client
+
+
+def test_scan_from_stopped_releases_its_lease(hardware):
+    assert asyncio.run(web._prepare_scan()) is None
+    assert "webui" in pool.owners()
+    web._finish_scan(was_running=False)
+    assert "webui" not in pool.owners()
+    assert web.radio.device is None
+
+
+def test_failed_open_releases_its_lease(hardware, monkeypatch):
+    def broken(*args, **kwargs):
+        raise OSError("usb_open error -3")
+
+    monkeypatch.setattr(web.radio, "open", broken)
+    assert "usb_open error" in asyncio.run(web._prepare_scan())
+    assert "webui" not in pool.owners()
+
+
+def decode_spectrum(frame):
+    """Python twin of decodeSpectrum() in static/app.js, offsets included."""
+    center, span, tuned, start, stop = struct.unpack_from("<5d", frame, 8)
+    offset, step, peak = struct.unpack_from("<3f", frame, 48)
+    bins, rows = struct.unpack_from("<IH", frame, 60)
+    encoding, flags = frame[66], frame[67]
+    count = bins * (1 + (flags & web.FLAG_LOW) + rows)
+    assert len(frame) == 68 + count * (2 if encoding == 2 else 1)
+    if encoding == 2:
+        values = np.frombuffer(frame, np.float16, count, 68).astype(np.float32)
+    else:
+        values = offset + np.frombuffer(frame, np.uint8, count, 68) * np.float32(step)
+    return {
+        "tag": frame[:4], "center": center, "span": span, "tuned": tuned, "start": start,
+        "stop": stop, "peak": peak, "flags": flags, "values": values.reshape(-1, bins),
+    }
+
+
+@pytest.mark.parametrize("encoding, atol", [("u8", 0.1), ("f16", 0.05)])
+def test_spectrum_frame_round_trips_through_the_client_layout(encoding, atol):
+    assert web.SPECTRUM_HEADER.size == 68
+    rng = np.random.default_rng(0)
+    power = rng.uniform(-100, -60, 512).astype(np.float32)
+    low = power - 3
+    rows = rng.uniform(-100, -60, (3, 512)).astype(np.float32)
+    frame = web.pack_spectrum(
+        7, 162e6, 2.048e6, 162.4e6, 161e6, 163e6, power, low, rows, encoding=encoding, viewport=True,
+    )
+    decoded = decode_spectrum(frame)
+    assert decoded["tag"] == web.SPECTRUM_TAG
+    assert (decoded["center"], decoded["span"], decoded["tuned"]) == (162e6, 2.048e6, 162.4e6)
+    assert (decoded["start"], decoded["stop"]) == (161e6, 163e6)
+    assert decoded["flags"] == web.FLAG_LOW | web.FLAG_VIEWPORT
+    assert decoded["peak"] == pytest.approx(power.max())
+    np.testing.assert_allclose(decoded["values"], np.vstack((power, low, rows)), atol=atol)
+
+
+def test_spectrum_frame_without_extra_rows():
+    power = np.linspace(-90, -30, 100, dtype=np.float32)
+    decoded = decode_spectrum(web.pack_spectrum(1, 100e6, 2e6, 100e6, 99e6, 101e6, power))
+    assert decoded["flags"] == 0
+    assert decoded["values"].shape == (1, 100)
+    np.testing.assert_allclose(decoded["values"][0], power, atol=0.15)
+
+
+def test_viewport_is_clamped_to_the_capture():
+    viewport = {"start_hz": 90e6, "end_hz": 100.5e6, "width": 100000}
+    assert web.clamp_viewport(viewport, 100e6, 2.048e6) == (100e6 - 1.024e6, 100.5e6, 8192)
+    assert web.clamp_viewport({"start_hz": 100e6, "end_hz": 100e6 + 50, "width": 800}, 100e6, 2.048e6) is None
+    assert web.clamp_viewport({"start_hz": 103e6, "end_hz": 104e6, "width": 800}, 100e6, 2.048e6) is None
+    assert web.clamp_viewport(None, 100e6, 2.048e6) is None
+
+
+def test_waterfall_endpoint_serves_a_tile(client, monkeypatch):
+    history = WaterfallHistory(num_rows=64, bins=32)
+    rows = np.full((20, 32), -90.0)
+    rows[:, 5] = -30
+    history.append(rows, np.arange(1000.0, 1020.0), 100e6, 3.2e6)
+    monkeypatch.setattr(web, "history", history)
+    tile = client.get("/api/waterfall", params={"t_start": 1010, "start_mhz": 98.4, "rows": 5, "cols": 64}).json()
+    assert (tile["rows"], tile["cols"]) == (5, 32)
+    assert tile["t_start"] == 1010.0 and tile["start_hz"] == 98.4e6
+    data = np.frombuffer(base64.b64decode(tile["data"]), np.uint8).reshape(5, 32)
+    assert np.all(np.argmax(data, axis=1) == 5)
+    assert client.get("/api/waterfall", params={"rows": "lots"}).status_code == 400
+    assert client.get("/api/waterfall", params={"t_start": 5000}).json()["rows"] == 0
+
+
+def test_mock_scan_returns_the_canned_signal(client):
+    assert client.post("/api/scan", json={"start_mhz": 162, "end_mhz": 163}).json() == [web.MOCK_SIGNAL]
+    assert client.post("/api/scan", json={"start_mhz": 150, "end_mhz": 151}).json() == []
+
+
+def scan_messages(client, body, cancel=False):
+    with client.websocket_connect("/ws/scan") as ws:
+        ws.send_json({"type": "scan", **body})
+        if cancel:
+            ws.send_json({"type": "cancel"})
+        messages = [ws.receive_json()]
+        while messages[-1]["type"] == "scan_progress":
+            messages.append(ws.receive_json())
+    return messages
+
+
+def test_ws_scan_streams_every_hop(client):
+    *progress, done = scan_messages(client, {"start_mhz": 160, "end_mhz": 165})
+    assert [m["hop"] for m in progress] == list(range(1, progress[0]["hops"] + 1))
+    assert done == {"type": "scan_done", "cancelled": False, "signals": [web.MOCK_SIGNAL]}
+    hit = [m for m in progress if m["signals"]]
+    assert len(hit) == 1 and hit[0]["start_mhz"] <= 162.4 <= hit[0]["end_mhz"]
+
+
+def test_ws_scan_cancel_stops_after_the_hop_in_flight(client):
+    *progress, done = scan_messages(client, {"start_mhz": 144, "end_mhz": 174}, cancel=True)
+    assert done["type"] == "scan_done" and done["cancelled"]
+    # 19 hops; the sweep stops once the hop in flight is reported
+    assert len(progress) <= 2
+
+
+def test_tune_moves_the_ddc_inside_the_span_and_retunes_outside(hardware, monkeypatch):
+    monkeypatch.setitem(web.state, "center_freq", 162e6)
+    monkeypatch.setitem(web.state, "freq", 162e6)
+    web.radio.open(sample_rate=web.state["sample_rate"], center_freq=162e6)
+    with TestClient(web.app) as client:
+        inside = client.post("/api/tune", json={"freq_mhz": 162.55}).json()
+        assert inside == {"freq_mhz": 162.55, "center_freq_mhz": 162.0, "retuned": False}
+        assert web.radio.center_freq == 162e6 and web.state["freq"] == 162.55e6
+        outside = client.post("/api/tune", json={"freq_mhz": 155.76}).json()
+        assert outside == {"freq_mhz": 155.76, "center_freq_mhz": 155.76, "retuned": True}
+        assert web.radio.center_freq == 155.76e6
+
+
+@pytest.fixture
+def replay(monkeypatch, tmp_path, fake_dongle):
+    """web.py replaying a 1.024 MS/s SigMF capture recorded at 162.4 MHz."""
+    np.zeros(2 * 200_000, dtype=np.float32).tofile(tmp_path / "wx.sigmf-data")
+    meta = {"global": {"core:datatype": "cf32_le", "core:sample_rate": 1.024e6}, "captures": [{"core:frequency": 162.4e6}]}
+    (tmp_path / "wx.sigmf-meta").write_text(json.dumps(meta))
+    path = str(tmp_path / "wx.sigmf-meta")
+    monkeypatch.setattr(web, "MOCK", False)
+    monkeypatch.setattr(web, "IQ_FILE", path)
+    monkeypatch.setattr(web, "radio", IQFileSource(path))
+    for key in ("freq", "center_freq", "sample_rate", "running"):
+        monkeypatch.setitem(web.state, key, web.state[key])
+    with TestClient(web.app) as client:
+        yield client
+        client.post("/api/stop")
+
+
+def test_replay_takes_the_recorded_rate_and_center(replay):
+    assert replay.post("/api/start", json={"freq_mhz": 100.0}).json()["freq_mhz"] == 162.4
+    assert web.state["sample_rate"] == 1.024e6
+    assert web.state["center_freq"] == web.state["freq"] == 162.4e6
+    # Inside the recording the DDC moves; outside there is nothing to tune to
+    assert replay.post("/api/tune", json={"freq_mhz": 162.55}).json()["retuned"] is False
+    assert web.state["freq"] == 162.55e6 and web.state["center_freq"] == 162.4e6
+    response = replay.post("/api/tune", json={"freq_mhz": 155.76})
+    assert response.status_code == 400 and "outside the recording" in response.json()["error"]
+    assert web.state["freq"] == 162.55e6
+
+
+def test_replay_keeps_a_start_frequency_inside_the_recording(replay):
+    replay.post("/api/start", json={"freq_mhz": 162.475})
+    assert web.state["freq"] == 162.475e6 and web.state["center_freq"] == 162.4e6
+
+
+def test_monitor_rejects_unknown_channels(client):
+    response = client.post("/api/channels", json={"channels": ["carter_sheriff_roan", "not-a-channel"]})
+    assert response.status_code == 400 and "not-a-channel" in response.json()["error"]
+    monitored = client.post("/api/channels", json={"channels": ["100.05"], "duration_seconds": 0.1}).json()
+    assert [channel["name"] for channel in monitored["channels"]] == ["100.0500"]
+
+
+def test_scanner_lock_plays_the_capture_at_the_stream_level(monkeypatch):
+    class Listener:
+        def call_soon_threadsafe(self, callback, pcm):
+            callback(pcm)
+
+    played = []
+    pending = type("Pending", (), {"put_nowait": staticmethod(played.append)})()
+    monkeypatch.setattr(web, "_scanner_listeners", {(Listener(), pending)})
+    for key in ("freq", "mode", "muted"):
+        monkeypatch.setitem(web.state, key, web.state[key])
+    rate, audio_rate = web.state["sample_rate"], web.state["audio_rate"]
+    t = np.arange(65536) / rate
+    # A weak AM carrier: the one-shot demodulator would scale it to full level
+    iq = (0.05 * (1 + 0.3 * np.sin(2 * np.pi * 1000 * t)) * np.exp(2j * np.pi * 25e3 * t)).astype(np.complex64)
+    web._scanner_lock("test", 162.425e6, "am", 162.4e6, iq)
+    expected = web.create_demodulator("am", rate, audio_rate, 25e3).process(iq)
+    pcm = np.frombuffer(played[0][len(web.PCM_TAG):], dtype=np.int16)
+    np.testing.assert_array_equal(pcm, (np.clip(expected, -1, 1) * 32767).astype(np.int16))
+    assert web.state["freq"] == 162.425e6 and not web.state["muted"]
@@ -22,9 +22,15 @@ class TrunkRecorder:
         self._calls_lock = threading.Lock()
         self._poll_thread = None
         self._seen_files = set()
+        self.device_index = None
         self._has_trunk_recorder = shutil.which("trunk-recorder") is not None
 
-    def start(self, config_path=None, config_dict=None):
+    def start(self, config_path=None, config_dict=None, device_index=None):
+        """Launch trunk-recorder from a config file or dict.
+
+        device_index points a single-source config at that dongle (rtl=N);
+        a config file is then run from a patched copy.
+        """
         if self.active:
             self.stop()
 
@@ -35,8 +41,23 @@ class TrunkRecorder:
         self._capture_dir = os.path.join(base_dir, "trunk_captures")
         os.makedirs(self._capture_dir, exist_ok=True)
 
+        patched = False
+        if device_index is not None:
+            if not config_dict and config_path:
+                with open(config_path, "r") as f:
+                    config_dict = json.load(f)
+                patched = True
+            sources = (config_dict or {}).get("sources", [])
+            if len(sources) == 1:
+                sources[0]["device"] = f"rtl={device_index}"
+            else:
+                log.warning(f"Config has {len(sources)} sources; leaving device selection to it")
+            self.device_index = device_index
+
         if config_dict:
-            self._config_path = os.path.join(base_dir, "trunk_config.json")
+            # A patched copy must not overwrite the user's file
+            name = "trunk_config_active.json" if patched else "trunk_config.json"
+            self._config_path = os.path.join(base_dir, name)
             config_dict.setdefault("captureDir", self._capture_dir)
             with open(self._config_path, "w") as f:
                 json.dump(config_dict, f, indent=2)
@@ -96,6 +117,7 @@ class TrunkRecorder:
                     pass
             self.process = None
         self._seen_files.clear()
+        self.device_index = None
 
     def get_status(self):
         alive = self.process is not None and self.process.poll() is None
@@ -104,6 +126,7 @@ class TrunkRecorder:
             "has_trunk_recorder": self._has_trunk_recorder,
             "config_path": self._config_path,
             "capture_dir": self._capture_dir,
+            "device_index": self.device_index,
             "pid": self.process.pid if self.process and alive else None,
             "call_count": len(self._calls),
         }
@@ -0,0 +1,116 @@
+import threading
+
+import numpy as np
+
+
+def quantize_rows(rows_db):
+    """uint8 rows, each over its own dB range: (q, offset, step), db = offset + q * step."""
+    lo = rows_db.min(axis=1)
+    step = np.maximum(rows_db.max(axis=1) - lo, 1e-3) / 255
+    return np.rint((rows_db - lo[:, None]) / step[:, None]).astype(np.uint8), lo, step
+
+
+class WaterfallHistory:
+    """Ring of recent spectrum rows kept server-side as uint8.
+
+    Rows live in one preallocated (num_rows, bins) array, each quantized
+    over its own dB range (kept alongside with its timestamp), so new
+    viewers can be handed the recent past with one slice-and-reduce.
+    A change of capture center, span or bin count starts a new history,
+    since old rows would no longer share the frequency axis.
+    """
+
+    def __init__(self, num_rows=8192, bins=1024):
+        self.num_rows = num_rows
+        self._lock = threading.Lock()
+        self._allocate(bins)
+        self.center_freq = None
+        self.span = None
+
+    def _allocate(self, bins):
+        self.bins = bins
+        self.data = np.zeros((self.num_rows, bins), dtype=np.uint8)
+        self.times = np.zeros(self.num_rows)
+        self.offsets = np.zeros(self.num_rows, dtype=np.float32)
+        self.steps = np.ones(self.num_rows, dtype=np.float32)
+        self.count = 0  # rows appended since the last reset
+
+    def append(self, rows_db, times, center_freq, span):
+        """Add rows (oldest first, shape (n, bins)) captured at the given times."""
+        rows_db = np.atleast_2d(rows_db)
+        with self._lock:
+            if (center_freq, span, rows_db.shape[1]) != (self.center_freq, self.span, self.bins):
+                if rows_db.shape[1] != self.bins:
+                    self._allocate(rows_db.shape[1])
+                self.count = 0
+                self.center_freq = center_freq
+                self.span = span
+            quantized, lo, step = quantize_rows(rows_db)
+            slots = (self.count + np.arange(len(rows_db))) % self.num_rows
+            self.data[slots] = quantized
+            self.times[slots] = times
+            self.offsets[slots] = lo
+            self.steps[slots] = step
+            self.count += len(rows_db)
+
+    def window(self, t_start=None, t_end=None, start_freq=None, end_freq=None, rows=256, cols=512):
+        """Max-reduced tile of a time/frequency window, or None if nothing is stored.
+
+        Returns a dict with a (rows, cols) uint8 "data" array, oldest row
+        first, quantized by db_offset + q * db_step, plus the window it
+        actually covers. Never upsamples: small windows come back smaller.
+        """
+        with self._lock:
+            valid = min(self.count, self.num_rows)
+            if not valid:
+                return None
+            order = (self.count - valid + np.arange(valid)) % self.num_rows
+            times = self.times[order]
+            first = np.searchsorted(times, t_start) if t_start is not None else 0
+            last = np.searchsorted(times, t_end, side="right") if t_end is not None else valid
+            if last <= first:
+                return None
+            slots = order[first:last]
+
+            left = self.center_freq - self.span / 2
+            bin_width = self.span / self.bins
+            b0, b1 = 0, self.bins
+            if start_freq is not None:
+                b0 = int(np.clip((start_freq - left) // bin_width, 0, self.bins - 1))
+            if end_freq is not None:
+                b1 = int(np.clip(-(-(end_freq - left) // bin_width), b0 + 1, self.bins))
+            q = self.data[slots, b0:b1]
+            db = self.offsets[slots, None] + q * self.steps[slots, None]
+            t0, t1 = float(self.times[slots[0]]), float(self.times[slots[-1]])
+
+        rows = max(1, min(rows, len(db)))
+        cols = max(1, min(cols, db.shape[1]))
+        db = np.maximum.reduceat(db, np.linspace(0, len(db), rows, endpoint=False).astype(int), axis=0)
+        db = np.maximum.reduceat(db, np.linspace(0, db.shape[1], cols, endpoint=False).astype(int), axis=1)
+        lo = float(db.min())
+        step = max(float(db.max()) - lo, 1e-3) / 255
+        return {
+            "data": np.rint((db - lo) / step).astype(np.uint8),
+            "db_offset": lo,
+            "db_step": step,
+            "t_start": t0,
+            "t_end": t1,
+            "start_hz": left + b0 * bin_width,
+            "end_hz": left + b1 * bin_width,
+        }
+
+    def stats(self):
+        with self._lock:
+            valid = min(self.count, self.num_rows)
+            seconds = 0.0
+            if valid:
+                newest = self.times[(self.count - 1) % self.num_rows]
+                oldest = self.times[(self.count - valid) % self.num_rows]
+                seconds = round(float(newest - oldest), 2)
+            return {
+                "rows": valid,
+                "capacity": self.num_rows,
+                "bins": self.bins,
+                "seconds": seconds,
+                "center_freq_mhz": self.center_freq / 1e6 if self.center_freq else None,
+            }
@@ -1,9 +1,13 @@
 import os
 import sys
+import queue
+import struct
 import asyncio
 import logging
 import time
 import wave
+import base64
+import threading
 
 import numpy as np
 from starlette.applications import Starlette
@@ -12,38 +16,130 @@ from starlette.responses import JSONResponse
 from starlette.staticfiles import StaticFiles
 from starlette.websockets import WebSocketDisconnect
 
-from sdr import SDR, acquire_device, release_device, device_owner
-from demod import demodulate, DEMODS
-from spectrum import compute_spectrum
-from scanner import scan_range
+from sdr import SDR, acquire_device, release_device, device_owner, pool
+from demod import demodulate, create_demodulator, in_span, DEMODS
+from spectrum import ZoomSpectrum, engine as spectrum_engine
+from scanner import iter_scan, channel_raster, plan_hops
 from bands import BANDS, FREQUENCY_DB
 from digital import DigitalVoiceDecoder
 from smart_tune import resolve_frequency
+from channelizer import channels_in_span, resolve_channels, monitor_capture
+from iqshare import SharedIQRing, SharedSDR
+from iqfile import IQFileSource
+from waterfall import WaterfallHistory
+from detect import CFARDetector
+from hits import HitStore
+from survey import SurveyArchive, list_archives
+from conventional import ConventionalScanner
 
 log = logging.getLogger("sdr.web")
 MOCK = "--mock" in sys.argv
+# Capture in its own process and fan IQ out to DSP workers over shared memory
+SHM = "--shm" in sys.argv
+# Replay a recorded capture (cu8/cs8/cs16/cf32 or SigMF) instead of a dongle
+IQ_FILE = sys.argv[sys.argv.index("--iq-file") + 1] if "--iq-file" in sys.argv[:-1] else None
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 RECORDINGS_DIR = os.path.join(BASE_DIR, "recordings")
+SURVEY_DIR = os.path.join(BASE_DIR, "surveys")
 
-radio = SDR()
+if IQ_FILE:
+    radio = IQFileSource(IQ_FILE, realtime=True)
+else:
+    radio = SharedSDR() if SHM else SDR()
 decoder = DigitalVoiceDecoder()
 state = {
     "freq": 100.0e6,
+    # Hardware center; "freq" may sit anywhere inside the span via the DDC
+    "center_freq": 100.0e6,
     "mode": "wfm",
     "gain": "auto",
     "sample_rate": 2.048e6,
     "audio_rate": 48000,
     "fft_size": 1024,
+    # Welch frames per display update (0 = the whole block), their overlap,
+    # and per-bin peak instead of mean power
+    "averages": 0,
+    "overlap": 0.5,
+    "max_hold": False,
+    # Waterfall rows per second, sliced out of each block (0 = one per block)
+    "waterfall_rate": 32,
+    # Spectrum bins on the wire: "u8" (quantized) or "f16"
+    "spectrum_encoding": "u8",
+    # Silence instead of audio, while the conventional scanner is between hits
+    "muted": False,
     "running": False,
     "digital_active": False,
 }
 
 
+# Recent waterfall rows for viewers that connect late or reload
+history = WaterfallHistory()
+_history_thread = None
+# CFAR detections on the live spectrum, refreshed by the history thread
+detector = CFARDetector()
+live_signals = {"time": None, "center_freq": None, "signals": []}
+# Scan results for duty-cycle and last-heard queries, shared with the MCP server
+hit_store = HitStore()
+# Conventional scanner steering the audio path, and per-connection queues
+# for the audio of the capture that made it stop
+scanner = None
+_scanner_listeners = set()
+
+
+def _history_loop():
+    """Feed the server-side waterfall from the capture while the receiver runs."""
+    sub = None
+    num_samples = 256 * 1024
+    try:
+        while state["running"]:
+            if MOCK:
+                iq = mock_samples(num_samples)
+                center = state["center_freq"]
+                time.sleep(num_samples / state["sample_rate"])
+            else:
+                if sub is None or sub.ring is not radio.ring:
+                    if sub:
+                        sub.close()
+                    sub = radio.subscribe("history")
+                iq = sub.read()
+                if iq is None:
+                    time.sleep(0.1)
+                    continue
+                center = sub.center_freq
+            rate = state["sample_rate"]
+            plan = spectrum_engine.plan(state["fft_size"], rate, center)
+            # Same row rate as the live waterfall; one row per block when that's off
+            num_rows = round((state["waterfall_rate"] or 1) * len(iq) / rate) or 1
+            rows = spectrum_engine.waterfall_power(iq, plan, num_rows, state["overlap"])
+            row_time = len(iq) / rate / len(rows)
+            times = time.time() - row_time * np.arange(len(rows) - 1, -1, -1)
+            rows_db = 10 * np.log10(rows + 1e-10)
+            history.append(rows_db, times, float(center), rate)
+            spectrum_db = 10 * np.log10(rows.mean(axis=0) + 1e-10)
+            live_signals.update(
+                time=float(times[-1]),
+                center_freq=float(center),
+                signals=detector.detect(plan.freqs_mhz * 1e6, spectrum_db),
+            )
+    except (OSError, RuntimeError, ValueError) as e:
+        log.error(f"Waterfall history stopped: {e}")
+    finally:
+        if sub:
+            sub.close()
+
+
+def _start_history():
+    global _history_thread
+    if _history_thread is None or not _history_thread.is_alive():
+        _history_thread = threading.Thread(target=_history_loop, daemon=True, name="waterfall-history")
+        _history_thread.start()
+
+
 def mock_samples(n):
     t = np.arange(n) / state["sample_rate"]
     noise = (np.random.randn(n) + 1j * np.random.randn(n)) * 0.02
     sig = 0.5 * np.exp(2j * np.pi * 100e3 * t)
-    return (sig + noise).astype(np.complex128)
+    return (sig + noise).astype(np.complex64)
 
 
 # --- Spectrum/Audio streaming endpoints ---
@@ -51,24 +147,59 @@ def mock_samples(n):
 
 async def start(request):
     body = await request.json()
-    if not MOCK and not acquire_device("webui"):
-        owner = device_owner()
-        return JSONResponse(
-            {"error": f"Device in use by {owner}. Stop it first."}, status_code=409
-        )
+    freq = body.get("freq_mhz", 100.0) * 1e6
+    lease = None
+    if not MOCK:
+        lease = acquire_device("webui", freq)
+        if not lease:
+            owner = device_owner()
+            return JSONResponse(
+                {"error": f"No free device (in use by {owner}). Stop one first."}, status_code=409
+            )
     state["freq"] = body.get("freq_mhz", 100.0) * 1e6
     state["mode"] = body.get("mode", "wfm")
     state["gain"] = body.get("gain", "auto")
+    state["center_freq"] = state["freq"]
     if not MOCK:
         if radio.device:
             radio.close()
         gain = state["gain"] if state["gain"] == "auto" else float(state["gain"])
-        radio.open(sample_rate=state["sample_rate"], center_freq=state["freq"], gain=gain)
+        radio.open(
+            sample_rate=state["sample_rate"], center_freq=state["freq"], gain=gain,
+            device_index=lease.index,
+        )
+        _follow_source()
+        radio.start_stream()
     state["running"] = True
+    _start_history()
     return JSONResponse({"status": "started", "freq_mhz": state["freq"] / 1e6})
 
 
+def _follow_source():
+    """Take the rate and center the opened source really runs at.
+
+    A replayed capture keeps its recorded ones; a frequency outside that
+    span falls back to the recorded center.
+    """
+    state["sample_rate"] = radio.sample_rate
+    state["center_freq"] = radio.center_freq
+    if not in_span(state["freq"] - state["center_freq"], state["sample_rate"]):
+        state["freq"] = state["center_freq"]
+
+
+def _outside_replay(freq):
+    """Error message if a replayed capture can't reach freq, else None."""
+    if not (IQ_FILE and radio.device) or in_span(freq - radio.center_freq, radio.sample_rate):
+        return None
+    return (
+        f"{freq / 1e6:.4f} MHz is outside the recording "
+        f"({radio.center_freq / 1e6:.4f} MHz ± {radio.sample_rate / 2e6:.3f} MHz)"
+    )
+
+
 async def stop(request):
+    if scanner and scanner.running:
+        await asyncio.to_thread(_stop_scanner)
     state["running"] = False
     await asyncio.sleep(0.3)
     if not MOCK:
@@ -80,10 +211,23 @@ async def stop(request):
 async def tune(request):
     body = await request.json()
     freq = body["freq_mhz"] * 1e6
+    # A recording can't be retuned, only listened into
+    error = _outside_replay(freq)
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
     state["freq"] = freq
-    if not MOCK and radio.device:
-        radio.center_freq = freq
-    return JSONResponse({"freq_mhz": body["freq_mhz"]})
+    # Inside the current capture the DDC follows instantly; only leaving
+    # the span costs a hardware retune and PLL settle.
+    retuned = not in_span(freq - state["center_freq"], state["sample_rate"])
+    if retuned:
+        state["center_freq"] = freq
+        if not MOCK and radio.device:
+            radio.center_freq = freq
+    return JSONResponse({
+        "freq_mhz": body["freq_mhz"],
+        "center_freq_mhz": state["center_freq"] / 1e6,
+        "retuned": retuned,
+    })
 
 
 async def set_mode(request):
@@ -100,6 +244,35 @@ async def set_gain(request):
     return JSONResponse({"gain": body["gain"]})
 
 
+async def set_spectrum(request):
+    body = await request.json()
+    fft_size = int(body.get("fft_size", state["fft_size"]))
+    overlap = float(body.get("overlap", state["overlap"]))
+    averages = int(body.get("averages", state["averages"]))
+    waterfall_rate = float(body.get("waterfall_rate", state["waterfall_rate"]))
+    encoding = body.get("encoding", state["spectrum_encoding"])
+    if fft_size < 16 or fft_size & (fft_size - 1):
+        return JSONResponse({"error": "fft_size must be a power of two >= 16"}, status_code=400)
+    if not 0 <= overlap < 1:
+        return JSONResponse({"error": "overlap must be in [0, 1)"}, status_code=400)
+    if averages < 0:
+        return JSONResponse({"error": "averages must be >= 0 (0 = whole block)"}, status_code=400)
+    if not 0 <= waterfall_rate <= 200:
+        return JSONResponse({"error": "waterfall_rate must be 0-200 rows/s"}, status_code=400)
+    if encoding not in SPECTRUM_ENCODINGS:
+        return JSONResponse({"error": f"encoding must be one of {list(SPECTRUM_ENCODINGS)}"}, status_code=400)
+    state["fft_size"] = fft_size
+    state["overlap"] = overlap
+    state["averages"] = averages
+    state["max_hold"] = bool(body.get("max_hold", state["max_hold"]))
+    state["waterfall_rate"] = waterfall_rate
+    state["spectrum_encoding"] = encoding
+    return JSONResponse({
+        k: state[k]
+        for k in ("fft_size", "averages", "overlap", "max_hold", "waterfall_rate", "spectrum_encoding")
+    })
+
+
 async def get_bands(request):
     result = {}
     for name, (freq, mode, bw, desc) in BANDS.items():
@@ -118,10 +291,15 @@ async def set_preset(request):
     if name not in BANDS:
         return JSONResponse({"error": f"Unknown preset: {name}"}, status_code=400)
     freq, mode, bw, desc = BANDS[name]
+    error = _outside_replay(freq)
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
     state["freq"] = freq
     state["mode"] = mode
     if not MOCK and radio.device:
         radio.center_freq = freq
+    # A replay stays at its recorded center and the DDC picks out freq
+    state["center_freq"] = radio.center_freq if IQ_FILE and radio.device else freq
     return JSONResponse({"frequency_mhz": freq / 1e6, "mode": mode, "description": desc})
 
 
@@ -168,6 +346,7 @@ async def web_smart_tune(request):
             release_device("digital")
 
     state["freq"] = freq_mhz * 1e6
+    state["center_freq"] = state["freq"]
     state["digital_active"] = False
 
     if MOCK:
@@ -176,20 +355,28 @@ async def web_smart_tune(request):
 
     # WFM/AM use spectrum streaming; everything else uses dsd-fme subprocess
     if mode in ("wfm", "am"):
-        if not acquire_device("webui"):
+        lease = acquire_device("webui", freq_mhz * 1e6)
+        if not lease:
             owner = device_owner()
-            return JSONResponse({"error": f"Device in use by {owner}."}, status_code=409)
+            return JSONResponse({"error": f"No free device (in use by {owner})."}, status_code=409)
         gain_val = gain if gain == "auto" else float(gain)
-        radio.open(sample_rate=state["sample_rate"], center_freq=freq_mhz * 1e6, gain=gain_val)
+        radio.open(
+            sample_rate=state["sample_rate"], center_freq=freq_mhz * 1e6, gain=gain_val,
+            device_index=lease.index,
+        )
+        _follow_source()
+        radio.start_stream()
         state["mode"] = mode
         state["running"] = True
+        _start_history()
         return JSONResponse({**info, "status": "started"})
 
-    if not acquire_device("digital"):
+    lease = acquire_device("digital", freq_mhz * 1e6)
+    if not lease:
         owner = device_owner()
-        return JSONResponse({"error": f"Device in use by {owner}."}, status_code=409)
+        return JSONResponse({"error": f"No free device (in use by {owner})."}, status_code=409)
     try:
-        await asyncio.to_thread(decoder.start, freq_mhz * 1e6, mode, gain, 0)
+        await asyncio.to_thread(decoder.start, freq_mhz * 1e6, mode, gain, 0, lease.index)
         state["digital_active"] = True
         return JSONResponse({**info, "status": "started"})
     except Exception as e:
@@ -197,44 +384,421 @@ async def web_smart_tune(request):
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
+# Canned scan result for --mock
+MOCK_SIGNAL = {
+    "freq_hz": 162.4e6, "freq_mhz": 162.4, "power_db": -18.5, "noise_db": -62.0,
+    "snr_db": 43.5, "bandwidth_hz": 12000.0,
+}
+
+
+def _mock_scan(start_freq, end_freq, step):
+    """Per-hop progress like iter_scan's, with MOCK_SIGNAL in whichever hop covers it."""
+    raster = channel_raster(start_freq, end_freq, step)
+    hops = plan_hops(raster, step, state["sample_rate"])
+    for i, (center, hop) in enumerate(hops):
+        time.sleep(0.05)
+        channels = raster[hop]
+        yield {
+            "hop": i + 1,
+            "hops": len(hops),
+            "center_mhz": center / 1e6,
+            "start_mhz": float(channels[0]) / 1e6,
+            "end_mhz": float(channels[-1]) / 1e6,
+            "signals": [MOCK_SIGNAL] if channels[0] <= MOCK_SIGNAL["freq_hz"] <= channels[-1] else [],
+        }
+
+
+def _scan_request(body, emit=None, cancel=None):
+    """Sweep the range of a /api/scan or /ws/scan request; returns active channels, strongest first.
+
+    emit gets each hop's progress as it lands; setting cancel (a
+    threading.Event) stops the sweep after the hop in flight, and the hops
+    measured by then are still logged to hit_store.
+    """
+    start_freq, end_freq = body["start_mhz"] * 1e6, body["end_mhz"] * 1e6
+    step = body.get("step_khz", 25) * 1e3
+    if MOCK:
+        hops = _mock_scan(start_freq, end_freq, step)
+    else:
+        channels = None
+        if body.get("recent_hours"):
+            channels = hit_store.active_channels(start_freq, end_freq, body["recent_hours"])
+        hops = iter_scan(
+            radio,
+            start_freq,
+            end_freq,
+            step=step,
+            threshold_db=body.get("threshold_db"),
+            snr_db=body.get("snr_db", 10.0),
+            channel_bw=body["bandwidth_khz"] * 1e3 if body.get("bandwidth_khz") else None,
+            channels=channels,
+            store=hit_store,
+        )
+    signals = []
+    try:
+        # Retunes between hops: synchronous reads beat waiting on ring blocks
+        with radio.paused_stream():
+            for update in hops:
+                signals.extend(update["signals"])
+                if emit:
+                    emit(update)
+                if cancel and cancel.is_set():
+                    break
+    finally:
+        hops.close()
+    return sorted(signals, key=lambda sig: sig["power_db"], reverse=True)
+
+
+async def _prepare_scan():
+    """Pause the live stream and make sure a device is open; returns an error message or None."""
+    if scanner and scanner.running:
+        return "Stop the scanner first"
+    state["running"] = False
+    await asyncio.sleep(0.2)
+    if not MOCK and not radio.device:
+        lease = acquire_device("webui", state["center_freq"])
+        if not lease:
+            return f"No free device (in use by {device_owner()})."
+        try:
+            radio.open(
+                sample_rate=state["sample_rate"], center_freq=state["center_freq"], gain="auto",
+                device_index=lease.index,
+            )
+        except (OSError, RuntimeError) as e:
+            release_device("webui")
+            return f"Could not open the device: {e}"
+    return None
+
+
+def _finish_scan(was_running):
+    if MOCK:
+        return
+    if not was_running:
+        radio.close()
+        release_device("webui")
+    else:
+        radio.center_freq = state["center_freq"]
+
+
 async def run_scan(request):
     body = await request.json()
     was_running = state["running"]
-    state["running"] = False
-    await asyncio.sleep(0.2)
+    error = await _prepare_scan()
+    if error:
+        return JSONResponse({"error": error}, status_code=409)
+    try:
+        signals = await asyncio.to_thread(_scan_request, body)
+    finally:
+        _finish_scan(was_running)
+    return JSONResponse(signals)
+
+
+async def ws_scan(websocket):
+    """Scan with results hop by hop.
+
+    The browser sends the /api/scan body as {"type": "scan", ...}; every
+    hop comes back as {"type": "scan_progress", hop, hops, center_mhz,
+    start_mhz, end_mhz, signals} as soon as it is analysed, then
+    {"type": "scan_done", cancelled, signals} or {"type": "scan_error",
+    error}. {"type": "cancel"} or closing the socket stops the sweep after
+    the hop in flight.
+    """
+    await websocket.accept()
+    try:
+        body = await websocket.receive_json()
+    except (WebSocketDisconnect, ValueError):
+        return
+    was_running = state["running"]
+    error = await _prepare_scan()
+    if error:
+        await websocket.send_json({"type": "scan_error", "error": error})
+        await websocket.close()
+        return
+
+    loop = asyncio.get_running_loop()
+    progress = asyncio.Queue()
+    cancel = threading.Event()
 
+    def emit(update):
+        loop.call_soon_threadsafe(progress.put_nowait, update)
+
+    async def receive_cancel():
+        try:
+            while (await websocket.receive_json()).get("type") != "cancel":
+                pass
+        except (WebSocketDisconnect, RuntimeError, ValueError):
+            pass
+        cancel.set()
+        progress.put_nowait(None)
+
+    sweep = asyncio.ensure_future(asyncio.to_thread(_scan_request, body, emit, cancel))
+    sweep.add_done_callback(lambda _: progress.put_nowait(None))
+    listener = asyncio.create_task(receive_cancel())
+    try:
+        while not sweep.done() or not progress.empty():
+            update = await progress.get()
+            if update is not None:
+                await websocket.send_json({"type": "scan_progress", **update})
+        signals = await sweep
+        await websocket.send_json({"type": "scan_done", "cancelled": cancel.is_set(), "signals": signals})
+    except WebSocketDisconnect:
+        cancel.set()
+    except (KeyError, TypeError, ValueError, OSError, RuntimeError) as e:
+        log.error(f"Scan failed: {e}")
+        await websocket.send_json({"type": "scan_error", "error": str(e)})
+    finally:
+        listener.cancel()
+        cancel.set()
+        await asyncio.wait([sweep])
+        _finish_scan(was_running)
+    try:
+        await websocket.close()
+    except RuntimeError:
+        pass
+
+
+async def monitor_channels(request):
+    body = await request.json()
+    duration = body.get("duration_seconds", 1.0)
+    if body.get("channels"):
+        try:
+            channels = resolve_channels(body["channels"])
+        except ValueError as e:
+            return JSONResponse({"error": f"Bad channel list: {e}"}, status_code=400)
+    else:
+        channels = channels_in_span(state["center_freq"], state["sample_rate"])
+    if not channels:
+        return JSONResponse({"error": "No channels inside the current capture span"}, status_code=400)
+
+    num_samples = int(state["sample_rate"] * duration)
     if MOCK:
-        signals = [{"freq_hz": 162.4e6, "freq_mhz": 162.4, "power_db": -18.5}]
+        iq = mock_samples(num_samples)
     else:
         if not radio.device:
-            radio.open(sample_rate=state["sample_rate"], center_freq=state["freq"], gain="auto")
-        signals = await asyncio.to_thread(
-            scan_range,
-            radio,
-            body["start_mhz"] * 1e6,
-            body["end_mhz"] * 1e6,
-            step=body.get("step_khz", 25) * 1e3,
-            threshold_db=body.get("threshold_db", -30),
-        )
-        if not was_running:
-            radio.close()
+            return JSONResponse({"error": "Device not open. Start streaming first."}, status_code=400)
+        iq = await asyncio.to_thread(radio.read_samples, num_samples)
 
-    return JSONResponse(signals)
+    try:
+        results = await asyncio.to_thread(
+            monitor_capture, iq, state["sample_rate"], state["center_freq"], channels, state["audio_rate"]
+        )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse({"center_freq_mhz": state["center_freq"] / 1e6, "channels": results})
 
 
 async def get_state(request):
     return JSONResponse(
         {
             "freq_mhz": state["freq"] / 1e6,
+            "center_freq_mhz": state["center_freq"] / 1e6,
             "mode": state["mode"],
             "gain": state["gain"],
+            "fft_size": state["fft_size"],
+            "averages": state["averages"],
+            "overlap": state["overlap"],
+            "max_hold": state["max_hold"],
+            "waterfall_rate": state["waterfall_rate"],
+            "spectrum_encoding": state["spectrum_encoding"],
             "running": state["running"],
             "digital_active": state["digital_active"],
+            "scanning": bool(scanner and scanner.running),
             "mock": MOCK,
         }
     )
 
 
+async def get_waterfall(request):
+    """Tile of the server-side waterfall history.
+
+    Query: seconds (most recent N) or t_start/t_end (epoch seconds),
+    start_mhz/end_mhz, and the rows/cols to reduce to (max-hold).
+    """
+    q = request.query_params
+    try:
+        t_end = float(q["t_end"]) if "t_end" in q else None
+        if "seconds" in q:
+            t_start = (t_end or time.time()) - float(q["seconds"])
+        else:
+            t_start = float(q["t_start"]) if "t_start" in q else None
+        start_freq = float(q["start_mhz"]) * 1e6 if "start_mhz" in q else None
+        end_freq = float(q["end_mhz"]) * 1e6 if "end_mhz" in q else None
+        rows = min(int(q.get("rows", 256)), 4096)
+        cols = min(int(q.get("cols", 1024)), 8192)
+    except ValueError as e:
+        return JSONResponse({"error": f"Bad query: {e}"}, status_code=400)
+    tile = await asyncio.to_thread(history.window, t_start, t_end, start_freq, end_freq, rows, cols)
+    if tile is None:
+        return JSONResponse({"rows": 0, "cols": 0, "history": history.stats()})
+    data = tile.pop("data")
+    return JSONResponse({
+        **tile,
+        "rows": data.shape[0],
+        "cols": data.shape[1],
+        # Row-major uint8, oldest row first
+        "data": base64.b64encode(data.tobytes()).decode(),
+    })
+
+
+async def scan_history(request):
+    """Occupancy from the scan-hit store: ?hours=&start_mhz=&end_mhz=."""
+    q = request.query_params
+    try:
+        hours = float(q.get("hours", 24))
+        start_freq = float(q["start_mhz"]) * 1e6 if "start_mhz" in q else None
+        end_freq = float(q["end_mhz"]) * 1e6 if "end_mhz" in q else None
+    except ValueError as e:
+        return JSONResponse({"error": f"Bad query: {e}"}, status_code=400)
+
+    def query():
+        return {
+            "channels": hit_store.channel_stats(hours, start_freq, end_freq),
+            "by_hour": hit_store.activity_by_hour(start_freq, end_freq),
+            "last_heard": hit_store.last_heard(),
+            "store": hit_store.stats(),
+        }
+
+    return JSONResponse(await asyncio.to_thread(query))
+
+
+async def get_survey(request):
+    """Heatmap tile of a survey archive, or the list of archives without ?name=.
+
+    Query as for /api/waterfall: seconds or t_start/t_end, start_mhz/end_mhz,
+    rows/cols. Only the requested window is read from the memory map.
+    """
+    q = request.query_params
+    if "name" not in q:
+        return JSONResponse({"archives": list_archives(SURVEY_DIR)})
+    path = os.path.join(SURVEY_DIR, os.path.basename(q["name"]))
+    if not os.path.exists(path + ".json"):
+        return JSONResponse({"error": f"No survey archive {q['name']}"}, status_code=404)
+    try:
+        t_end = float(q["t_end"]) if "t_end" in q else None
+        if "seconds" in q:
+            t_start = (t_end or time.time()) - float(q["seconds"])
+        else:
+            t_start = float(q["t_start"]) if "t_start" in q else None
+        start_freq = float(q["start_mhz"]) * 1e6 if "start_mhz" in q else None
+        end_freq = float(q["end_mhz"]) * 1e6 if "end_mhz" in q else None
+        rows = min(int(q.get("rows", 256)), 4096)
+        cols = min(int(q.get("cols", 1024)), 8192)
+    except ValueError as e:
+        return JSONResponse({"error": f"Bad query: {e}"}, status_code=400)
+
+    def query():
+        archive = SurveyArchive(path)
+        return archive.stats(), archive.window(t_start, t_end, start_freq, end_freq, rows, cols)
+
+    stats, tile = await asyncio.to_thread(query)
+    if tile is None:
+        return JSONResponse({"rows": 0, "cols": 0, "archive": stats})
+    data = tile.pop("data")
+    return JSONResponse({
+        **tile,
+        "archive": stats,
+        "rows": data.shape[0],
+        "cols": data.shape[1],
+        # Row-major uint8, oldest row first
+        "data": base64.b64encode(data.tobytes()).decode(),
+    })
+
+
+async def get_signals(request):
+    """CFAR detections on the live spectrum; an snr_db query keeps only stronger ones."""
+    signals = live_signals["signals"]
+    if "snr_db" in request.query_params:
+        try:
+            snr_db = float(request.query_params["snr_db"])
+        except ValueError as e:
+            return JSONResponse({"error": f"Bad query: {e}"}, status_code=400)
+        signals = [s for s in signals if s["snr_db"] > snr_db]
+    floor_db = detector.floor_db
+    return JSONResponse({
+        "time": live_signals["time"],
+        "center_freq_mhz": live_signals["center_freq"] / 1e6 if live_signals["center_freq"] else None,
+        "noise_floor_db": round(float(np.median(floor_db)), 1) if floor_db is not None else None,
+        "frames": detector.frames,
+        "signals": signals,
+    })
+
+
+def _scanner_tune(center):
+    state["center_freq"] = center
+
+
+def _scanner_lock(name, freq, mode, center, iq):
+    state.update(freq=freq, mode=mode, muted=False)
+    # The stream picks the channel up from its next block; the capture that
+    # tripped the squelch goes out at once so the first syllable isn't lost.
+    # It goes through the same streaming demodulator as the stream, not the
+    # peak-normalized one-shot, so the level doesn't jump between the two
+    demod = create_demodulator(mode, state["sample_rate"], state["audio_rate"], freq - center)
+    audio = demod.process(iq)
+    pcm = PCM_TAG + (np.clip(audio, -1, 1) * 32767).astype(np.int16).tobytes()
+    for loop, pending in list(_scanner_listeners):
+        loop.call_soon_threadsafe(pending.put_nowait, pcm)
+
+
+def _scanner_release(transmission):
+    state["muted"] = True
+
+
+def _stop_scanner():
+    scanner.stop()
+    state["muted"] = False
+
+
+async def scanner_start(request):
+    global scanner
+    body = await request.json()
+    if MOCK:
+        return JSONResponse({"error": "The scanner needs a receiver (not available with --mock)"}, status_code=400)
+    if not state["running"]:
+        return JSONResponse({"error": "Start the receiver first"}, status_code=400)
+    if scanner and scanner.running:
+        return JSONResponse({"error": "The scanner is already running"}, status_code=409)
+    try:
+        channels = resolve_channels(body["channels"]) if body.get("channels") else None
+        # Reads come off the live stream's ring: the block straddling each
+        # retune is dropped and the dwell comes from the next one, so a
+        # window takes about two blocks (~260 ms at 256k samples) whatever
+        # dwell_ms is
+        scanner = ConventionalScanner(
+            radio,
+            channels,
+            snr_db=body.get("snr_db", 10.0),
+            hang_time=body.get("hang_time", 2.0),
+            dwell_ms=body.get("dwell_ms", 30),
+            audio_rate=state["audio_rate"],
+            on_tune=_scanner_tune,
+            on_lock=_scanner_lock,
+            on_release=_scanner_release,
+        )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    state["muted"] = True
+    scanner.start()
+    return JSONResponse({"status": "started", **scanner.status()})
+
+
+async def scanner_stop(request):
+    if scanner is None:
+        return JSONResponse({"error": "No scanner running"}, status_code=400)
+    await asyncio.to_thread(_stop_scanner)
+    return JSONResponse({"status": "stopped", **scanner.status()})
+
+
+async def scanner_status(request):
+    if scanner is None:
+        return JSONResponse({"running": False})
+    return JSONResponse(scanner.status())
+
+
+async def get_devices(request):
+    return JSONResponse(pool.status())
+
+
 # --- Digital decoder endpoints ---
 
 
@@ -245,7 +809,9 @@ async def digital_start(request):
     gain = body.get("gain", state["gain"])
     squelch = body.get("squelch", 0)
 
-    # Stop webui streaming if active
+    # Stop webui streaming (and the scanner steering it) if active
+    if scanner and scanner.running:
+        await asyncio.to_thread(_stop_scanner)
     if state["running"]:
         state["running"] = False
         await asyncio.sleep(0.3)
@@ -253,18 +819,21 @@ async def digital_start(request):
             radio.close()
             release_device("webui")
 
+    lease = None
     if not MOCK:
-        if not acquire_device("digital"):
+        lease = acquire_device("digital", freq_hz)
+        if not lease:
             owner = device_owner()
             return JSONResponse(
-                {"error": f"Device in use by {owner}."}, status_code=409
+                {"error": f"No free device (in use by {owner})."}, status_code=409
             )
 
     try:
         if not MOCK:
-            await asyncio.to_thread(decoder.start, freq_hz, mode, gain, squelch)
+            await asyncio.to_thread(decoder.start, freq_hz, mode, gain, squelch, lease.index)
         state["digital_active"] = True
         state["freq"] = freq_hz
+        state["center_freq"] = freq_hz
         return JSONResponse({
             "status": "started",
             "freq_mhz": freq_hz / 1e6,
@@ -324,10 +893,15 @@ async def record(request):
         if not radio.device:
             return JSONResponse({"error": "Device not open. Start streaming first."}, status_code=400)
         num_samples = int(state["sample_rate"] * duration)
-        iq = await asyncio.to_thread(radio.read_samples, num_samples)
+        # Taps the same gap-free stream the spectrum/audio WebSocket reads
+        with radio.subscribe("record") as sub:
+            iq = await asyncio.to_thread(
+                sub.read_samples, num_samples, None, state["center_freq"]
+            )
 
     audio = await asyncio.to_thread(
-        demodulate, iq, mode, state["sample_rate"], state["audio_rate"]
+        demodulate, iq, mode, state["sample_rate"], state["audio_rate"],
+        state["freq"] - state["center_freq"],
     )
     pcm = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
 
@@ -377,55 +951,308 @@ async def ws_stream(websocket):
         await websocket.close()
         return
 
+    # Per-connection view settings sent by the browser
+    client = {"viewport": None}
+    receiver = asyncio.create_task(_ws_receive(websocket, client))
+    lock_audio = asyncio.create_task(_ws_scanner_audio(websocket))
     try:
         if state["digital_active"]:
             await _ws_digital_stream(websocket)
         else:
-            await _ws_spectrum_stream(websocket, num_samples)
+            await _ws_spectrum_stream(websocket, num_samples, client)
     except WebSocketDisconnect:
         pass
     except Exception as e:
         log.error(f"WebSocket error: {e}")
+    finally:
+        receiver.cancel()
+        lock_audio.cancel()
 
 
-async def _ws_spectrum_stream(websocket, num_samples):
-    """Stream spectrum + demodulated audio from pyrtlsdr."""
-    while state["running"]:
+async def _ws_receive(websocket, client):
+    """Apply control messages from the browser, e.g.
+    {"type": "viewport", "start_hz": ..., "end_hz": ..., "width": 1200}
+    or {"type": "viewport", "reset": true} for the full capture.
+    """
+    while True:
         try:
-            if MOCK:
-                iq = mock_samples(num_samples)
-            else:
-                iq = await asyncio.to_thread(radio.read_samples, num_samples)
-        except Exception as e:
-            log.error(f"SDR read error: {e}")
-            await asyncio.sleep(0.5)
+            msg = await websocket.receive_json()
+        except (WebSocketDisconnect, RuntimeError):
+            return
+        except ValueError:
             continue
+        if msg.get("type") == "viewport":
+            if msg.get("reset"):
+                client["viewport"] = None
+            elif {"start_hz", "end_hz", "width"} <= msg.keys():
+                client["viewport"] = {k: msg[k] for k in ("start_hz", "end_hz", "width")}
 
-        freqs_mhz, power_db = compute_spectrum(
-            iq, state["sample_rate"], state["freq"], state["fft_size"]
-        )
 
-        audio = await asyncio.to_thread(
-            demodulate, iq, state["mode"], state["sample_rate"], state["audio_rate"]
+async def _ws_scanner_audio(websocket):
+    """Send the conventional scanner's lock audio as soon as it stops on a channel."""
+    listener = (asyncio.get_running_loop(), asyncio.Queue())
+    _scanner_listeners.add(listener)
+    try:
+        while True:
+            pcm = await listener[1].get()
+            try:
+                await websocket.send_bytes(pcm)
+            except (WebSocketDisconnect, RuntimeError):
+                return
+            if scanner:
+                scanner.audio_started()
+    finally:
+        _scanner_listeners.discard(listener)
+
+
+# Binary WebSocket messages start with a 4-byte tag
+PCM_TAG = b"PCM0"
+SPECTRUM_TAG = b"SPEC"
+# tag, sequence, capture center Hz, capture span Hz, tuned Hz, first and
+# end frequency of the bins, dB offset, dB step, peak dB, bins, waterfall
+# rows, encoding, flags; bins follow row by row: the trace, the per-pixel
+# minimum if FLAG_LOW, then the waterfall rows
+SPECTRUM_HEADER = struct.Struct("<4sIdddddfffIHBB")
+SPECTRUM_ENCODINGS = {"u8": 1, "f16": 2}
+FLAG_LOW = 1  # a per-pixel minimum row follows the (maximum) trace
+FLAG_VIEWPORT = 2  # bins cover the client's viewport, already reduced to pixels
+
+
+def pack_spectrum(seq, center, span, tuned_freq, start, stop, power_db,
+                  low_db=None, rows_db=None, encoding="u8", viewport=False):
+    """Spectrum trace plus optional min row and waterfall rows as one binary message.
+
+    u8 quantizes every value to offset + q * step over the frame's own
+    range (plenty for display); f16 sends half floats with offset 0, step 1.
+    The frequency axis is implied by start, stop and bins.
+    """
+    parts = [power_db[np.newaxis]]
+    flags = FLAG_VIEWPORT if viewport else 0
+    if low_db is not None:
+        parts.append(low_db[np.newaxis])
+        flags |= FLAG_LOW
+    if rows_db is not None:
+        parts.append(rows_db)
+    values = np.vstack(parts) if len(parts) > 1 else parts[0]
+    if encoding == "f16":
+        offset, step = 0.0, 1.0
+        payload = values.astype(np.float16)
+    else:
+        offset = float(values.min())
+        step = max(float(values.max()) - offset, 1e-3) / 255
+        payload = np.rint((values - offset) / step).astype(np.uint8)
+    header = SPECTRUM_HEADER.pack(
+        SPECTRUM_TAG, seq & 0xFFFFFFFF, center, span, tuned_freq, start, stop,
+        offset, step, float(power_db.max()), len(power_db),
+        0 if rows_db is None else len(rows_db), SPECTRUM_ENCODINGS[encoding], flags,
+    )
+    return header + payload.tobytes()
+
+
+def clamp_viewport(viewport, center, sample_rate):
+    """(start, stop, width) of a client viewport inside the capture, or None."""
+    if not viewport:
+        return None
+    start = max(float(viewport["start_hz"]), center - sample_rate / 2)
+    stop = min(float(viewport["end_hz"]), center + sample_rate / 2)
+    width = int(min(max(int(viewport["width"]), 16), 8192))
+    # A few Hz of span is below any useful resolution
+    if stop - start < 100:
+        return None
+    return start, stop, width
+
+
+class _BlockProcessor:
+    """Spectrum, streaming demodulation and frame encoding for one IQ block."""
+
+    def __init__(self):
+        self.demod = None
+        self.demod_key = None
+        self.demod_offset = None
+        self.seq = 0
+        self.zoom = None
+        self.zoom_key = None
+
+    def process(self, iq, center, settings, viewport=None):
+        """Returns (binary spectrum frame, tagged PCM bytes).
+
+        With a viewport (start_hz, end_hz, width in pixels) the spectrum is
+        a zoom FFT of that sub-band reduced to min/max per pixel, and the
+        client draws its waterfall from the trace.
+        """
+        rate = settings["sample_rate"]
+        view = clamp_viewport(viewport, center, rate)
+        if view:
+            key = (center, rate, settings["overlap"], *view)
+            if key != self.zoom_key:
+                self.zoom = ZoomSpectrum(rate, center, *view, overlap=settings["overlap"])
+                self.zoom_key = key
+            low_db, high_db = self.zoom.process(iq)
+            frame = pack_spectrum(
+                self.seq, center, rate, settings["freq"], view[0], view[1], high_db, low_db,
+                encoding=settings["spectrum_encoding"], viewport=True,
+            )
+        else:
+            self.zoom = self.zoom_key = None
+            frame = self._full_spectrum(iq, center, settings)
+        self.seq += 1
+        if settings["muted"]:
+            # Start afresh on the next channel the scanner stops on
+            self.demod_key = None
+            pcm = np.zeros(round(len(iq) * settings["audio_rate"] / rate), dtype=np.int16)
+        else:
+            pcm = (np.clip(self._demodulate(iq, center, settings), -1, 1) * 32767).astype(np.int16)
+        return frame, PCM_TAG + pcm.tobytes()
+
+    def _full_spectrum(self, iq, center, settings):
+        rate = settings["sample_rate"]
+        plan = spectrum_engine.plan(settings["fft_size"], rate, center)
+        rows = None
+        if settings["waterfall_rate"]:
+            num_rows = round(settings["waterfall_rate"] * len(iq) / rate)
+            rows = spectrum_engine.waterfall_power(iq, plan, num_rows, settings["overlap"])
+        if rows is not None and not settings["averages"] and not settings["max_hold"]:
+            # The rows already cover the whole block; their mean is its Welch average
+            power_db = 10 * np.log10(rows.mean(axis=0) + 1e-10)
+        else:
+            power_db = spectrum_engine.power_db(
+                iq, plan, settings["averages"], settings["overlap"], settings["max_hold"]
+            )
+        rows_db = None if rows is None else 10 * np.log10(rows + 1e-10)
+        return pack_spectrum(
+            self.seq, center, rate, settings["freq"], center - rate / 2, center + rate / 2,
+            power_db, rows_db=rows_db, encoding=settings["spectrum_encoding"],
         )
 
-        peak_idx = int(np.argmax(power_db))
-        await websocket.send_json(
-            {
-                "type": "spectrum",
-                "freqs": freqs_mhz.tolist(),
-                "power": power_db.tolist(),
-                "peak_freq": round(float(freqs_mhz[peak_idx]), 4),
-                "peak_power": round(float(power_db[peak_idx]), 1),
-                "center_freq": state["freq"] / 1e6,
-            }
-        )
+    def _demodulate(self, iq, center, settings):
+        # Keep filter state across blocks; start fresh on a hardware retune
+        # or mode change, and just move the DDC for in-span tuning.
+        offset = settings["freq"] - center
+        key = (settings["mode"], center)
+        if key != self.demod_key:
+            self.demod = create_demodulator(
+                settings["mode"], settings["sample_rate"], settings["audio_rate"], offset
+            )
+            self.demod_key = key
+            self.demod_offset = offset
+        elif offset != self.demod_offset:
+            self.demod.set_offset(offset)
+            self.demod_offset = offset
+        return self.demod.process(iq)
+
+
+# State the spectrum worker process needs, pushed to it whenever it changes
+_WORKER_SETTINGS = (
+    "freq", "mode", "sample_rate", "audio_rate", "fft_size", "averages", "overlap", "max_hold",
+    "waterfall_rate", "spectrum_encoding", "muted",
+)
 
-        pcm = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
-        await websocket.send_bytes(pcm.tobytes())
 
-        if MOCK:
-            await asyncio.sleep(0.128)
+def _spectrum_worker(ring_name, settings, updates, results):
+    """Worker process for --shm: reads the shared ring, returns encoded frames."""
+    ring = SharedIQRing.attach(ring_name)
+    sub = ring.subscribe("spectrum")
+    processor = _BlockProcessor()
+    iq = None
+    try:
+        while True:
+            try:
+                while True:
+                    update = updates.get_nowait()
+                    if update is None:
+                        return
+                    settings.update(update)
+            except queue.Empty:
+                pass
+            iq = sub.read()
+            if iq is None:
+                if ring.closed:
+                    return
+                continue
+            frame = processor.process(iq, sub.center_freq, settings, settings.get("viewport"))
+            if not sub.intact():
+                continue  # the capture process lapped us mid-block; the frame mixes two captures
+            try:
+                results.put_nowait(frame)
+            except queue.Full:
+                pass  # the browser is slower than the stream; drop the frame
+    finally:
+        iq = None  # drop the block view so the mapping can close
+        sub.close()
+        ring.release()
+
+
+async def _ws_spectrum_stream(websocket, num_samples, client):
+    """Stream spectrum + demodulated audio from the shared capture ring."""
+    if SHM and not MOCK:
+        await _ws_shm_stream(websocket, client)
+        return
+    sub = None
+    processor = _BlockProcessor()
+    try:
+        while state["running"]:
+            try:
+                if MOCK:
+                    iq = mock_samples(num_samples)
+                    center = state["center_freq"]
+                else:
+                    # Resubscribe if the device was reopened under us
+                    if sub is None or sub.ring is not radio.ring:
+                        if sub:
+                            sub.close()
+                        sub = radio.subscribe("ws")
+                    # Zero-copy view into the ring, valid for the rest of this pass
+                    iq = await asyncio.to_thread(sub.read)
+                    if iq is None:
+                        continue
+                    center = sub.center_freq
+            except Exception as e:
+                log.error(f"SDR read error: {e}")
+                await asyncio.sleep(0.5)
+                continue
+
+            msg, pcm = await asyncio.to_thread(
+                processor.process, iq, center, state, client["viewport"]
+            )
+            await websocket.send_bytes(msg)
+            await websocket.send_bytes(pcm)
+
+            if MOCK:
+                await asyncio.sleep(0.128)
+    finally:
+        if sub:
+            sub.close()
+
+
+async def _ws_shm_stream(websocket, client):
+    """Forward frames from a spectrum worker process attached to the shared ring."""
+    updates = radio.ctx.Queue()
+    results = radio.ctx.Queue(maxsize=4)
+    sent = {**{k: state[k] for k in _WORKER_SETTINGS}, "viewport": client["viewport"]}
+    worker = radio.ctx.Process(
+        target=_spectrum_worker,
+        args=(radio.ring.name, dict(sent), updates, results),
+        daemon=True,
+        name="sdr-spectrum",
+    )
+    worker.start()
+    try:
+        while state["running"] and radio.streaming:
+            current = {**{k: state[k] for k in _WORKER_SETTINGS}, "viewport": client["viewport"]}
+            if current != sent:
+                updates.put(current)
+                sent = current
+            try:
+                msg, pcm = await asyncio.to_thread(results.get, True, 1.0)
+            except queue.Empty:
+                continue
+            await websocket.send_bytes(msg)
+            await websocket.send_bytes(pcm)
+    finally:
+        updates.put(None)
+        await asyncio.to_thread(worker.join, 2)
+        if worker.is_alive():
+            worker.terminate()
 
 
 async def _ws_digital_stream(websocket):
@@ -442,7 +1269,7 @@ async def _ws_digital_stream(websocket):
         # Read decoded audio and forward to browser
         audio_bytes = await asyncio.to_thread(decoder.read_audio, 9600)
         if audio_bytes:
-            await websocket.send_bytes(audio_bytes)
+            await websocket.send_bytes(PCM_TAG + audio_bytes)
 
         await asyncio.sleep(0.1)
 
@@ -454,12 +1281,22 @@ app = Starlette(
         Route("/api/tune", tune, methods=["POST"]),
         Route("/api/mode", set_mode, methods=["POST"]),
         Route("/api/gain", set_gain, methods=["POST"]),
+        Route("/api/spectrum", set_spectrum, methods=["POST"]),
         Route("/api/bands", get_bands, methods=["GET"]),
         Route("/api/preset", set_preset, methods=["POST"]),
         Route("/api/phonebook", get_phonebook, methods=["GET"]),
         Route("/api/smart-tune", web_smart_tune, methods=["POST"]),
         Route("/api/scan", run_scan, methods=["POST"]),
+        Route("/api/channels", monitor_channels, methods=["POST"]),
         Route("/api/state", get_state, methods=["GET"]),
+        Route("/api/devices", get_devices, methods=["GET"]),
+        Route("/api/waterfall", get_waterfall, methods=["GET"]),
+        Route("/api/signals", get_signals, methods=["GET"]),
+        Route("/api/scan/history", scan_history, methods=["GET"]),
+        Route("/api/survey", get_survey, methods=["GET"]),
+        Route("/api/scanner/start", scanner_start, methods=["POST"]),
+        Route("/api/scanner/stop", scanner_stop, methods=["POST"]),
+        Route("/api/scanner/status", scanner_status, methods=["GET"]),
         Route("/api/digital/start", digital_start, methods=["POST"]),
         Route("/api/digital/stop", digital_stop, methods=["POST"]),
         Route("/api/digital/status", digital_status, methods=["GET"]),
@@ -467,6 +1304,7 @@ app = Starlette(
         Route("/api/record", record, methods=["POST"]),
         Route("/api/recordings", list_recordings, methods=["GET"]),
         WebSocketRoute("/ws", ws_stream),
+        WebSocketRoute("/ws/scan", ws_scan),
         Mount("/", StaticFiles(directory=os.path.join(BASE_DIR, "static"), html=True)),
     ],
 )
@@ -475,6 +1313,11 @@ if __name__ == "__main__":
     import uvicorn
 
     port = 8080
-    mode_str = "MOCK" if MOCK else "LIVE"
+    if MOCK:
+        mode_str = "MOCK"
+    elif IQ_FILE:
+        mode_str = f"REPLAY {IQ_FILE}"
+    else:
+        mode_str = "LIVE (shared-memory capture)" if SHM else "LIVE"
     print(f"SDR Lab Web UI ({mode_str}) — http://localhost:{port}")
     uvicorn.run(app, host="0.0.0.0", port=port)